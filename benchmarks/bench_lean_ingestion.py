@@ -0,0 +1,75 @@
+"""Benchmark: lean ingestion vs full Statement validation
+
+Builds a corpus of large statements (the BRAF test statement padded with extra
+genomic members) and times decode + convert for each ingestion path.
+
+Run with `python benchmarks/bench_lean_ingestion.py [statements] [members]`.
+"""
+
+import copy
+import json
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from ga4gh.va_spec.base.core import Statement
+
+from biocommons.gks_conversion_tool.converter import (
+    clear_caches,
+    configure_caches,
+    convert_gks_to_hl7_v2,
+)
+from biocommons.gks_conversion_tool.lean import iter_mmap_lines, load_lean_statement, orjson
+
+STATEMENT_PATH = Path(__file__).parents[1] / "tests" / "data" / "braf_v600e_statement.json"
+
+
+def make_corpus(path: Path, statements: int, members: int) -> None:
+    template = json.loads(STATEMENT_PATH.read_text())
+    genomic = template["proposition"]["subjectVariant"]["members"][0]
+    with path.open("w") as fh:
+        for i in range(statements):
+            statement = copy.deepcopy(template)
+            extra = []
+            for j in range(members):
+                member = copy.deepcopy(genomic)
+                member["id"] = f"ga4gh:VA.bench{i}x{j}"
+                member["location"]["start"] += j
+                member["location"]["end"] += j
+                extra.append(member)
+            statement["proposition"]["subjectVariant"]["members"][1:1] = extra
+            fh.write(json.dumps(statement) + "\n")
+
+
+def main(statements: int = 200, members: int = 100) -> None:
+    # every statement has a distinct genomic allele id, but make sure nothing is reused anyway
+    configure_caches(hgvs_g_maxsize=0, allele_maxsize=0)
+    with tempfile.TemporaryDirectory() as tmp:
+        corpus = Path(tmp) / "corpus.ndjson"
+        make_corpus(corpus, statements, members)
+        print(f"{statements} statements x {members + 3} members, {corpus.stat().st_size / 1e6:.1f} MB")
+
+        def full() -> None:
+            with corpus.open("rb") as fh:
+                for line in fh:
+                    convert_gks_to_hl7_v2(Statement.model_validate_json(line))
+
+        def lean() -> None:
+            for line in iter_mmap_lines(corpus):
+                convert_gks_to_hl7_v2(load_lean_statement(line))
+
+        baseline = None
+        for name, func in (("full", full), ("lean", lean)):
+            clear_caches()
+            start = time.perf_counter()
+            func()
+            rate = statements / (time.perf_counter() - start)
+            baseline = baseline or rate
+            print(f"{name:>5}: {rate:10,.0f} statements/s  ({rate / baseline:.1f}x)")
+        print(f"decoder: {'orjson' if orjson else 'json'}")
+
+
+if __name__ == "__main__":
+    args = [int(arg) for arg in sys.argv[1:3]]
+    main(*args)
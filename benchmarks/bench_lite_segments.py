@@ -0,0 +1,42 @@
+"""Microbenchmark: pydantic vs __slots__ segment groups per variant
+
+Run with `python benchmarks/bench_lite_segments.py [variants]`.
+"""
+
+import sys
+import timeit
+import tracemalloc
+
+from biocommons.gks_conversion_tool.obx_templates import generate_all_obx_for_variants_templated
+from biocommons.gks_conversion_tool.var_concept_creator import (
+    createVARSegmentsGroups,
+    createVARSegmentsGroupsLite,
+    variant_information,
+)
+
+
+def _bytes_per_variant(builder, variants: int) -> float:
+    tracemalloc.start()
+    groups = [builder(variant_information, "a") for _ in range(variants)]
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del groups
+    return current / variants
+
+
+def main(variants: int = 1000, repeat: int = 5) -> None:
+    for name, builder in (("pydantic", createVARSegmentsGroups), ("lite", createVARSegmentsGroupsLite)):
+
+        def build_and_generate(builder=builder) -> None:
+            for _ in range(variants):
+                generate_all_obx_for_variants_templated(builder(variant_information, "a"))
+
+        best = min(timeit.repeat(build_and_generate, number=1, repeat=repeat))
+        print(
+            f"{name:>9}: {best / variants * 1e6:8.1f} us/variant  "
+            f"{_bytes_per_variant(builder, variants):8.0f} bytes/variant"
+        )
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1000)
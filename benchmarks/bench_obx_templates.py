@@ -0,0 +1,49 @@
+"""Microbenchmark: templated OBX generation vs obx_segment_generator
+
+Run with `python benchmarks/bench_obx_templates.py [variants]`.
+"""
+
+import io
+import sys
+import timeit
+
+from biocommons.gks_conversion_tool.obx_segment_generator import generate_all_obx_for_variants
+from biocommons.gks_conversion_tool.obx_templates import (
+    generate_all_obx_for_variants_templated,
+    write_obx_segments,
+)
+from biocommons.gks_conversion_tool.var_concept_creator import (
+    createVARSegmentsGroups,
+    variant_information,
+)
+
+
+def main(variants: int = 1000, repeat: int = 5) -> None:
+    segment_groups = [
+        createVARSegmentsGroups(variant_information, variant_identifier="a") for _ in range(variants)
+    ]
+    segments = sum(len(group.segments) for groups in segment_groups for group in groups)
+
+    def reference() -> None:
+        for groups in segment_groups:
+            generate_all_obx_for_variants(groups)
+
+    def templated() -> None:
+        for groups in segment_groups:
+            generate_all_obx_for_variants_templated(groups)
+
+    def buffered() -> None:
+        buffer = io.StringIO()
+        for groups in segment_groups:
+            write_obx_segments(groups, buffer)
+
+    baseline = None
+    for name, func in (("reference", reference), ("templated", templated), ("StringIO", buffered)):
+        best = min(timeit.repeat(func, number=1, repeat=repeat))
+        rate = segments / best
+        baseline = baseline or rate
+        print(f"{name:>10}: {rate:12,.0f} segments/s  ({rate / baseline:.2f}x)")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1000)
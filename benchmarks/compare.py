@@ -0,0 +1,61 @@
+"""Compare a pytest-benchmark JSON report against a stored baseline
+
+Run with `python benchmarks/compare.py BASELINE.json CURRENT.json [--threshold PERCENT]`.
+
+Mean time, peak memory and allocations per variant are compared for every
+benchmark found in both reports. Exits with status 1 if any of them got worse
+by more than the threshold (default 10%).
+"""
+
+import argparse
+import json
+import sys
+from pathlib import Path
+
+# (label, how to read it from a benchmark entry, smallest absolute change that counts)
+METRICS = (
+    ("mean time", lambda bench: bench["stats"]["mean"], 0.0),
+    ("peak memory", lambda bench: bench["extra_info"].get("peak_bytes"), 1024),
+    ("allocations/variant", lambda bench: bench["extra_info"].get("allocations_per_variant"), 1.0),
+)
+
+
+def load_benchmarks(path: Path) -> dict[str, dict]:
+    return {bench["fullname"]: bench for bench in json.loads(path.read_text())["benchmarks"]}
+
+
+def compare(baseline: dict[str, dict], current: dict[str, dict], threshold: float) -> list[str]:
+    """Print a line per benchmark and metric; return the ones that regressed beyond threshold percent."""
+    regressions = []
+    for name in sorted(baseline.keys() & current.keys()):
+        for label, read, min_delta in METRICS:
+            before = read(baseline[name])
+            after = read(current[name])
+            if not before or after is None:
+                continue
+            change = (after - before) / before * 100
+            regressed = change > threshold and after - before > min_delta
+            print(f"{'REGRESSION' if regressed else 'ok':>10}  {change:+7.1f}%  {label:<19}  {name}")
+            if regressed:
+                regressions.append(f"{name}: {label} {change:+.1f}%")
+    for name in sorted(baseline.keys() - current.keys()):
+        print(f"{'missing':>10}  {name}")
+    return regressions
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("baseline", type=Path)
+    parser.add_argument("current", type=Path)
+    parser.add_argument("--threshold", type=float, default=10.0, help="allowed slowdown in percent (default: 10)")
+    args = parser.parse_args(argv)
+
+    regressions = compare(load_benchmarks(args.baseline), load_benchmarks(args.current), args.threshold)
+    if regressions:
+        print(f"\n{len(regressions)} regression(s) beyond {args.threshold}%:", *regressions, sep="\n  ")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,156 @@
+"""Synthetic corpora and memory measurement for the pytest-benchmark suite
+
+Corpora of 1, 1k and 100k variants are built from the BRAF V600E test statement
+by shifting its positions. At most DISTINCT_VARIANTS different objects are built
+and larger corpora repeat them, which keeps a 100k corpus of validated
+Statements in memory without needing gigabytes.
+"""
+
+import copy
+import gc
+import json
+import sys
+import tracemalloc
+from collections.abc import Callable
+from functools import cache
+from pathlib import Path
+from typing import Any
+
+import pytest
+from ga4gh.va_spec.base.core import Statement
+
+from biocommons.gks_conversion_tool.converter import convert_gks_to_hl7_v2
+from biocommons.gks_conversion_tool.var_concept_creator import createVARSegmentsGroups
+
+STATEMENT_PATH = Path(__file__).parent.parent / "tests" / "data" / "braf_v600e_statement.json"
+
+CORPUS_SIZES = (
+    pytest.param(1, id="1"),
+    pytest.param(1_000, id="1k"),
+    pytest.param(100_000, id="100k", marks=pytest.mark.slow),
+)
+
+DISTINCT_VARIANTS = 1_000
+
+
+@cache
+def _statement_records() -> list[dict[str, Any]]:
+    template = json.loads(STATEMENT_PATH.read_text())
+    records = []
+    for i in range(DISTINCT_VARIANTS):
+        record = copy.deepcopy(template)
+        record["id"] = f"stmt:{i}"
+        genomic = record["proposition"]["subjectVariant"]["members"][0]
+        genomic["id"] = f"ga4gh:VA.synthetic{i:027d}"
+        genomic["location"]["start"] += i
+        genomic["location"]["end"] += i
+        genomic["expressions"][0]["value"] = f"NC_000007.13:g.{140453136 + i}A>T"
+        records.append(record)
+    return records
+
+
+@cache
+def _statements() -> list[Statement]:
+    return [Statement.model_validate(record) for record in _statement_records()]
+
+
+@cache
+def _variant_informations() -> list[dict[str, str]]:
+    informations = []
+    for statement in _statements():
+        fields = convert_gks_to_hl7_v2(statement)
+        informations.append(
+            {
+                "DNA_CHANGE": fields["518"],
+                "TRANSCRIPT_REFERENCE_SEQUENCE": fields["516"],
+                "GENE_STUDIED": "BRAF",
+                "GENE_ID": "HGNC:1097",
+                "GENOMIC_REFERENCE_SEQUENCE_ID": fields["524"],
+                "AMINO_ACID_CHANGE": fields["520"],
+                "PROTEIN_REFERENCE_SEQUENCE": fields["522"],
+                "GENOMIC_DNA_CHANGE": fields["528"],
+                "VARIANT_CLASSIFICATION": "Likely Pathogenic",
+            }
+        )
+    return informations
+
+
+@cache
+def _segment_groups() -> list[list]:
+    return [createVARSegmentsGroups(information, "a") for information in _variant_informations()]
+
+
+def _repeat(items: list, size: int) -> list:
+    return [items[i % len(items)] for i in range(size)]
+
+
+@pytest.fixture(params=CORPUS_SIZES)
+def corpus_size(request) -> int:
+    return request.param
+
+
+@pytest.fixture
+def statement_texts(corpus_size) -> list[str]:
+    return _repeat([json.dumps(record) for record in _statement_records()], corpus_size)
+
+
+@pytest.fixture
+def statements(corpus_size) -> list[Statement]:
+    return _repeat(_statements(), corpus_size)
+
+
+@pytest.fixture
+def variant_informations(corpus_size) -> list[dict[str, str]]:
+    return _repeat(_variant_informations(), corpus_size)
+
+
+@pytest.fixture
+def segment_groups(corpus_size) -> list[list]:
+    return _repeat(_segment_groups(), corpus_size)
+
+
+def measure_memory(func: Callable[[Any], Any], items: list) -> dict[str, float]:
+    """
+    Report the peak traced memory of one pass of func over items, and the number of
+    allocated blocks each result holds on to (measured on up to DISTINCT_VARIANTS items).
+    """
+    gc.collect()
+    tracemalloc.start()
+    try:
+        for item in items:
+            func(item)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    sample = items[:DISTINCT_VARIANTS]
+    gc.collect()
+    blocks_before = sys.getallocatedblocks()
+    results = [func(item) for item in sample]
+    blocks = sys.getallocatedblocks() - blocks_before
+    del results
+    return {
+        "peak_bytes": peak,
+        "allocations_per_variant": max(blocks, 0) / len(sample),
+    }
+
+
+@pytest.fixture
+def run_benchmark(benchmark):
+    """
+    Benchmark one pass of func over items and record throughput and memory in the
+    benchmark's extra_info, which ends up in --benchmark-json output. Results are
+    dropped as they are produced, so a 100k corpus does not hold 100k outputs.
+    """
+
+    def run(func: Callable[[Any], Any], items: list) -> None:
+        def one_pass() -> None:
+            for item in items:
+                func(item)
+
+        benchmark.extra_info.update(measure_memory(func, items))
+        benchmark.pedantic(one_pass, rounds=max(3, 10_000 // len(items)), iterations=1, warmup_rounds=1)
+        benchmark.extra_info["variants"] = len(items)
+        benchmark.extra_info["variants_per_second"] = len(items) / benchmark.stats.stats.mean
+
+    return run
@@ -0,0 +1,151 @@
+"""Benchmarks for conversion and OBX segment generation
+
+Run with `make bench`, or `pytest benchmarks --benchmark-only --no-cov` and
+`-m "not slow"` to leave out the 100k corpus.
+"""
+
+import io
+import random
+import time
+from collections.abc import Callable
+from typing import Any
+
+import pytest
+
+from biocommons.gks_conversion_tool import obx_templates
+from biocommons.gks_conversion_tool.converter import configure_caches, convert_gks_to_hl7_v2
+from biocommons.gks_conversion_tool.obx_segment_generator import (
+    generate_all_obx_for_variants,
+    generate_obx5,
+)
+from biocommons.gks_conversion_tool.obx_templates import generate_all_obx_for_variants_templated
+from biocommons.gks_conversion_tool.preflight import check_chunk
+from biocommons.gks_conversion_tool.reference import ReferenceIndex, build_reference_index
+from biocommons.gks_conversion_tool.sinks import HL7Sink
+from biocommons.gks_conversion_tool.streaming import stream_obx_segments
+from biocommons.gks_conversion_tool.var_concept_creator import createVARSegmentsGroups
+from biocommons.models import OBXSegmentCWE, OBXSegmentNM, OBXSegmentNR, OBXSegmentST
+
+
+@pytest.fixture
+def no_caches():
+    # Every variant is converted from scratch, as if the corpus had no repeated alleles
+    configure_caches(hgvs_g_maxsize=0, allele_maxsize=0)
+    yield
+    configure_caches(hgvs_g_maxsize=4096, allele_maxsize=4096)
+
+
+@pytest.mark.usefixtures("no_caches")
+def test_convert_gks_to_hl7_v2(run_benchmark, statements):
+    run_benchmark(convert_gks_to_hl7_v2, statements)
+
+
+def test_create_var_segments_groups(run_benchmark, variant_informations):
+    run_benchmark(lambda information: createVARSegmentsGroups(information, "a"), variant_informations)
+
+
+def test_generate_all_obx_for_variants(run_benchmark, segment_groups):
+    run_benchmark(generate_all_obx_for_variants, segment_groups)
+
+
+def test_convert_table_batch(benchmark, variant_informations):
+    pa = pytest.importorskip("pyarrow")
+    from biocommons.gks_conversion_tool.columnar import convert_batch, plan_columns  # noqa: PLC0415
+
+    batch = pa.RecordBatch.from_pylist(variant_informations)
+    benchmark(convert_batch, batch, plan_columns())
+    benchmark.extra_info["variants"] = batch.num_rows
+    benchmark.extra_info["variants_per_second"] = batch.num_rows / benchmark.stats.stats.mean
+
+
+@pytest.mark.parametrize("compression", [None, "gzip"])
+def test_sink_write(benchmark, tmp_path, segment_groups, compression):
+    messages = [generate_all_obx_for_variants(groups) for groups in segment_groups]
+
+    def write_all() -> int:
+        with HL7Sink(tmp_path / "out.hl7", compression=compression, envelope=True) as sink:
+            for segments in messages:
+                sink.write_message(segments)
+        return sink.stats.bytes
+
+    written = benchmark(write_all)
+    benchmark.extra_info["variants"] = len(messages)
+    benchmark.extra_info["megabytes_per_minute"] = written / benchmark.stats.stats.mean * 60 / 1e6
+
+
+def test_affected_exons(benchmark, tmp_path):
+    """Structural variant exon lookups against 20k transcripts of 10 exons each on one chromosome."""
+    rows = ["transcript\taccession\texon\tstart\tend"]
+    for transcript in range(20_000):
+        start = transcript * 10_000
+        rows += [
+            f"NM_{transcript}.1\tNC_000001.11\t{exon + 1}\t{start + exon * 1000}\t{start + exon * 1000 + 200}"
+            for exon in range(10)
+        ]
+    (tmp_path / "exons.tsv").write_text("\n".join(rows) + "\n")
+    rng = random.Random(0)  # noqa: S311 - reproducible test data
+    intervals = []
+    for _ in range(10_000):
+        start = rng.randrange(200_000_000)
+        intervals.append((start, start + rng.randrange(100, 50_000)))
+
+    with ReferenceIndex(build_reference_index(tmp_path / "exons.idx", exons=tmp_path / "exons.tsv")) as index:
+
+        def lookup_all() -> None:
+            for start, end in intervals:
+                index.affected_exons("NC_000001.11", start, end)
+
+        benchmark(lookup_all)
+    benchmark.extra_info["lookups_per_second"] = len(intervals) / benchmark.stats.stats.mean
+
+
+@pytest.mark.parametrize("escaping", [True, False], ids=["escaped", "unescaped"])
+def test_escape_overhead(benchmark, monkeypatch, segment_groups, escaping):
+    """OBX generation for clean values with escaping, and with the escaping checks replaced by no-ops."""
+    if not escaping:
+        monkeypatch.setattr(obx_templates, "escape", lambda value: value)
+        monkeypatch.setattr(obx_templates, "needs_escaping_except_components", lambda _: False)
+
+    def generate_all() -> None:
+        for groups in segment_groups:
+            generate_all_obx_for_variants_templated(groups)
+
+    benchmark(generate_all)
+    benchmark.extra_info["variants"] = len(segment_groups)
+
+
+def _best_time(func: Callable[[], Any], rounds: int = 3) -> float:
+    best = float("inf")
+    for _ in range(rounds):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+@pytest.mark.usefixtures("no_caches")
+@pytest.mark.parametrize("lean", [True, False], ids=["lean", "full"])
+def test_preflight(benchmark, statement_texts, lean):
+    """
+    Preflight of a corpus of Statement JSON texts. extra_info has its speedup over
+    converting the same texts to OBX lines in the same mode (full validation, or --lean).
+    """
+    conversion = _best_time(lambda: stream_obx_segments(statement_texts, io.StringIO(), lean=lean))
+    benchmark(check_chunk, 0, statement_texts, lean)
+    mean = benchmark.stats.stats.mean
+    benchmark.extra_info["variants"] = len(statement_texts)
+    benchmark.extra_info["variants_per_second"] = len(statement_texts) / mean
+    benchmark.extra_info["speedup_over_conversion"] = conversion / mean
+
+
+OBX5_SEGMENTS = {
+    "ST": OBXSegmentST(value="NP_004324.2"),
+    "NM": OBXSegmentNM(value=2.0),
+    "NR": OBXSegmentNR(lower_bound=140453135, upper_bound=140453136),
+    "CWE": OBXSegmentCWE(code="c.1799T>A", label="c.1799T>A", coding_system="HGVS.c"),
+}
+
+
+@pytest.mark.parametrize("observation_type", OBX5_SEGMENTS)
+def test_generate_obx5(run_benchmark, corpus_size, observation_type):
+    run_benchmark(generate_obx5, [OBX5_SEGMENTS[observation_type]] * corpus_size)
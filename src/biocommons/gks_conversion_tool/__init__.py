@@ -0,0 +1,168 @@
+"""Conversion of GA4GH GKS objects (VA-Spec Statements, VRS Alleles) to and from HL7 v2
+
+The public API is importable from this package. Submodules are loaded on first
+attribute access, so importing the package does no work, and the GA4GH models
+are only imported by the functions that build or validate them.
+"""
+
+import importlib
+from typing import TYPE_CHECKING, Any
+
+# public name -> submodule defining it
+_EXPORTS = {
+    "stream_table_obx_segments": "columnar",
+    "HL7V2": "converter",
+    "cache_stats": "converter",
+    "configure_caches": "converter",
+    "configure_reference": "converter",
+    "convert_gks_to_hl7_v2": "converter",
+    "escape": "escaping",
+    "unescape": "escaping",
+    "build_allele": "hl7_parser",
+    "build_categorical_variant": "hl7_parser",
+    "build_statement": "hl7_parser",
+    "ParsedVariant": "hl7_parser",
+    "parse_hl7": "hl7_parser",
+    "parse_hl7_file": "hl7_parser",
+    "ResultStore": "incremental",
+    "stream_obx_segments_incremental": "incremental",
+    "LeanStatement": "lean",
+    "MLLPClient": "mllp",
+    "generate_all_obx_for_variants": "obx_segment_generator",
+    "generate_all_obx_for_variants_templated": "obx_templates",
+    "build_oru_r01": "oru",
+    "stream_obx_segments_parallel": "parallel",
+    "stream_to_sink_parallel": "parallel",
+    "PreflightReport": "preflight",
+    "preflight": "preflight",
+    "ReferenceIndex": "reference",
+    "build_reference_index": "reference",
+    "ReportBuilder": "report",
+    "variant_identifier": "report",
+    "write_report": "report",
+    "HL7Sink": "sinks",
+    "stream_to_sink": "sinks",
+    "StreamStats": "streaming",
+    "convert_statement_record": "streaming",
+    "iter_lean_statements": "streaming",
+    "iter_oru_messages": "streaming",
+    "iter_statement_records": "streaming",
+    "stream_obx_segments": "streaming",
+    "createVARSegmentsGroups": "var_concept_creator",
+    "createVARSegmentsGroupsLite": "var_concept_creator",
+    "serve_stream": "worker",
+    "serve_unix": "worker",
+}
+
+__all__ = [
+    "HL7V2",
+    "HL7Sink",
+    "LeanStatement",
+    "MLLPClient",
+    "ParsedVariant",
+    "PreflightReport",
+    "ReferenceIndex",
+    "ReportBuilder",
+    "ResultStore",
+    "StreamStats",
+    "build_allele",
+    "build_categorical_variant",
+    "build_oru_r01",
+    "build_reference_index",
+    "build_statement",
+    "cache_stats",
+    "configure_caches",
+    "configure_reference",
+    "convert_gks_to_hl7_v2",
+    "convert_statement_record",
+    "createVARSegmentsGroups",
+    "createVARSegmentsGroupsLite",
+    "escape",
+    "generate_all_obx_for_variants",
+    "generate_all_obx_for_variants_templated",
+    "iter_lean_statements",
+    "iter_oru_messages",
+    "iter_statement_records",
+    "parse_hl7",
+    "parse_hl7_file",
+    "preflight",
+    "serve_stream",
+    "serve_unix",
+    "stream_obx_segments",
+    "stream_obx_segments_incremental",
+    "stream_obx_segments_parallel",
+    "stream_table_obx_segments",
+    "stream_to_sink",
+    "stream_to_sink_parallel",
+    "unescape",
+    "variant_identifier",
+    "write_report",
+]
+
+
+def __getattr__(name: str) -> Any:
+    module_name = _EXPORTS.get(name)
+    if module_name is None:
+        msg = f"module {__name__!r} has no attribute {name!r}"
+        raise AttributeError(msg)
+    value = getattr(importlib.import_module(f"{__name__}.{module_name}"), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__() -> list[str]:
+    return sorted({*globals(), *__all__})
+
+
+if TYPE_CHECKING:
+    from biocommons.gks_conversion_tool.columnar import stream_table_obx_segments
+    from biocommons.gks_conversion_tool.converter import (
+        HL7V2,
+        cache_stats,
+        configure_caches,
+        configure_reference,
+        convert_gks_to_hl7_v2,
+    )
+    from biocommons.gks_conversion_tool.escaping import escape, unescape
+    from biocommons.gks_conversion_tool.hl7_parser import (
+        ParsedVariant,
+        build_allele,
+        build_categorical_variant,
+        build_statement,
+        parse_hl7,
+        parse_hl7_file,
+    )
+    from biocommons.gks_conversion_tool.incremental import (
+        ResultStore,
+        stream_obx_segments_incremental,
+    )
+    from biocommons.gks_conversion_tool.lean import LeanStatement
+    from biocommons.gks_conversion_tool.mllp import MLLPClient
+    from biocommons.gks_conversion_tool.obx_segment_generator import generate_all_obx_for_variants
+    from biocommons.gks_conversion_tool.obx_templates import generate_all_obx_for_variants_templated
+    from biocommons.gks_conversion_tool.oru import build_oru_r01
+    from biocommons.gks_conversion_tool.parallel import (
+        stream_obx_segments_parallel,
+        stream_to_sink_parallel,
+    )
+    from biocommons.gks_conversion_tool.preflight import PreflightReport, preflight
+    from biocommons.gks_conversion_tool.reference import ReferenceIndex, build_reference_index
+    from biocommons.gks_conversion_tool.report import (
+        ReportBuilder,
+        variant_identifier,
+        write_report,
+    )
+    from biocommons.gks_conversion_tool.sinks import HL7Sink, stream_to_sink
+    from biocommons.gks_conversion_tool.streaming import (
+        StreamStats,
+        convert_statement_record,
+        iter_lean_statements,
+        iter_oru_messages,
+        iter_statement_records,
+        stream_obx_segments,
+    )
+    from biocommons.gks_conversion_tool.var_concept_creator import (
+        createVARSegmentsGroups,
+        createVARSegmentsGroupsLite,
+    )
+    from biocommons.gks_conversion_tool.worker import serve_stream, serve_unix
@@ -0,0 +1,418 @@
+"""Command line entry point for GKS -> HL7 v2 conversion"""
+
+import argparse
+import logging
+import sys
+from contextlib import ExitStack
+from pathlib import Path
+from typing import TYPE_CHECKING, TextIO
+
+from biocommons.gks_conversion_tool import instrumentation
+from biocommons.gks_conversion_tool.converter import (
+    cache_stats,
+    configure_caches,
+    configure_reference,
+)
+from biocommons.gks_conversion_tool.oru import hl7_timestamp
+from biocommons.gks_conversion_tool.parallel import (
+    DEFAULT_CHUNK_SIZE,
+    stream_obx_segments_parallel,
+    stream_to_sink_parallel,
+)
+from biocommons.gks_conversion_tool.reference import ReferenceIndex
+from biocommons.gks_conversion_tool.streaming import (
+    DEFAULT_TABLE_BATCH_SIZE,
+    TABLE_SUFFIXES,
+    StreamStats,
+    iter_oru_messages,
+    iter_statement_data,
+    iter_statement_texts,
+    stream_obx_segments,
+)
+
+if TYPE_CHECKING:
+    from biocommons.gks_conversion_tool.mllp import SendStats
+    from biocommons.gks_conversion_tool.report import ReportStats
+
+_logger = logging.getLogger(__name__)
+
+_SIZE_UNITS = {"K": 1 << 10, "M": 1 << 20, "G": 1 << 30}
+
+# -o suffixes that turn on compression (see sinks.COMPRESSION_SUFFIXES)
+_COMPRESSED_SUFFIXES = (".gz", ".zst")
+
+
+def _parse_size(value: str) -> int:
+    """A byte count with an optional K, M or G suffix, e.g. 500M."""
+    multiplier = _SIZE_UNITS.get(value[-1:].upper())
+    number = value[:-1] if multiplier else value
+    try:
+        return int(number) * (multiplier or 1)
+    except ValueError:
+        msg = f"invalid size {value!r}"
+        raise argparse.ArgumentTypeError(msg) from None
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="gks-to-hl7v2",
+        description="Convert VA-Spec Statements (NDJSON or a directory of JSON files) to HL7 v2 OBX segments.",
+    )
+    parser.add_argument(
+        "input",
+        nargs="?",
+        default="-",
+        help="NDJSON file, directory of *.json Statements, variant table (.parquet, .arrow, .csv, .tsv), or '-' for stdin (default)",
+    )
+    parser.add_argument(
+        "-o",
+        "--output",
+        default="-",
+        help="file to write OBX segments to, or '-' for stdout (default)",
+    )
+    parser.add_argument(
+        "-j",
+        "--workers",
+        type=int,
+        default=1,
+        help="number of worker processes; 0 means one per CPU (default: 1, no pool)",
+    )
+    parser.add_argument(
+        "--chunk-size",
+        type=int,
+        default=DEFAULT_CHUNK_SIZE,
+        help=f"statements per work unit in parallel mode (default: {DEFAULT_CHUNK_SIZE})",
+    )
+    parser.add_argument(
+        "--errors",
+        help="write one JSON error record per failed statement to this file instead of logging it"
+        " (the exit status is 1 if any statement failed)",
+    )
+    parser.add_argument(
+        "--cache-size",
+        type=int,
+        help="entries kept in each of the HGVS and allele caches (per worker); 0 disables caching",
+    )
+    parser.add_argument(
+        "--reference",
+        metavar="FILE",
+        help="offline reference index (see biocommons.gks_conversion_tool.reference) for chromosome names,"
+        " assemblies, HGNC IDs, cytobands and the exons covered by structural variants",
+    )
+    parser.add_argument(
+        "--lean",
+        action="store_true",
+        help="read only the fields the converter needs instead of validating each full Statement",
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=DEFAULT_TABLE_BATCH_SIZE,
+        help=f"rows per record batch for variant table input (default: {DEFAULT_TABLE_BATCH_SIZE})",
+    )
+    incremental = parser.add_argument_group(
+        "incremental", "reuse conversions from earlier runs (single process only)"
+    )
+    incremental.add_argument(
+        "--store",
+        metavar="FILE",
+        help="SQLite result store; variants converted before are taken from it instead of being converted again",
+    )
+    incremental.add_argument(
+        "--changed-only",
+        action="store_true",
+        help="with --store, write only statements whose output changed since the last run",
+    )
+    output = parser.add_argument_group(
+        "output files", "buffered, compressed or rotating output with -o FILE; segments end in carriage returns"
+    )
+    output.add_argument(
+        "--compress",
+        choices=("gzip", "zstd"),
+        help="compress the output (default: from the -o suffix, .gz or .zst)",
+    )
+    output.add_argument(
+        "--rotate-messages", type=int, metavar="N", help="start a new numbered file after N messages"
+    )
+    output.add_argument(
+        "--rotate-size",
+        type=_parse_size,
+        metavar="SIZE",
+        help="start a new numbered file after SIZE bytes before compression, e.g. 500M",
+    )
+    output.add_argument(
+        "--envelope",
+        action="store_true",
+        help="write each statement as an ORU^R01 message, in one FHS/BHS batch per file",
+    )
+    parser.add_argument(
+        "--preflight",
+        action="store_true",
+        help="only check that every statement would convert; write one JSON line per issue and exit 1 if any fails",
+    )
+    report = parser.add_argument_group(
+        "report", "write all statements as one patient's report: a single ORU^R01 message with variants a, b, ..."
+    )
+    report.add_argument("--report", action="store_true", help="write one ORU^R01 report instead of bare OBX segments")
+    report.add_argument("--patient-id", default="", help="PID-3 of the report")
+    report.add_argument("--patient-name", default="", help="PID-5 of the report, e.g. 'DOE^JANE'")
+    worker = parser.add_argument_group(
+        "worker", "stay running and convert one statement per request line (see biocommons.gks_conversion_tool.worker)"
+    )
+    worker.add_argument(
+        "--worker", action="store_true", help="read requests from stdin and write responses to stdout"
+    )
+    worker.add_argument("--socket", metavar="PATH", help="accept requests on a Unix socket at PATH")
+    diagnostics = parser.add_argument_group("diagnostics")
+    diagnostics.add_argument(
+        "--metrics",
+        metavar="FILE",
+        help="record per-stage timings and errors and write them to FILE (Prometheus text if it ends in .prom, else JSON)",
+    )
+    diagnostics.add_argument(
+        "--profile",
+        metavar="FILE",
+        help="profile the conversion in this process (all of it with -j 1) and write the report to FILE",
+    )
+    diagnostics.add_argument(
+        "--profiler",
+        choices=("cprofile", "pyinstrument"),
+        default="cprofile",
+        help="profiler for --profile: cprofile writes pstats, pyinstrument writes HTML (default: cprofile)",
+    )
+    mllp = parser.add_argument_group("MLLP", "send each statement as an ORU^R01 message instead of writing OBX segments")
+    mllp.add_argument("--mllp", metavar="HOST:PORT", help="address of the MLLP receiver")
+    mllp.add_argument("--connections", type=int, default=2, help="persistent connections to open (default: 2)")
+    mllp.add_argument("--in-flight", type=int, default=16, help="maximum unacknowledged messages (default: 16)")
+    mllp.add_argument("--attempts", type=int, default=3, help="attempts per message before giving up (default: 3)")
+    parser.add_argument("-v", "--verbose", action="store_true", help="log progress at DEBUG level")
+    return parser
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    _check_arguments(parser, args)
+    logging.basicConfig(
+        level=logging.DEBUG if args.verbose else logging.INFO,
+        format="%(levelname)s %(name)s: %(message)s",
+        stream=sys.stderr,
+    )
+
+    if args.cache_size is not None:
+        configure_caches(hgvs_g_maxsize=args.cache_size, allele_maxsize=args.cache_size)
+    if args.reference:
+        # worker processes open the same index (see parallel.iter_chunk_results)
+        configure_reference(ReferenceIndex(args.reference))
+
+    source = sys.stdin if args.input == "-" else Path(args.input)
+
+    if args.metrics:
+        instrumentation.enable()
+    try:
+        with ExitStack() as stack:
+            if args.profile:
+                stack.enter_context(instrumentation.profile_batch(Path(args.profile), args.profiler))
+            return _convert(args, source)
+    finally:
+        if args.metrics:
+            instrumentation.disable()
+            instrumentation.write_snapshot(Path(args.metrics))
+
+
+def _check_arguments(parser: argparse.ArgumentParser, args: argparse.Namespace) -> None:
+    """Exit with a usage error if options that cannot be combined are given together."""
+    table = Path(args.input).suffix.lower() in TABLE_SUFFIXES
+    if args.changed_only and not args.store:
+        parser.error("--changed-only requires --store")
+    if args.store and (args.workers != 1 or args.mllp):
+        parser.error("--store cannot be combined with -j or --mllp")
+    if table and (args.store or args.mllp or args.report or args.workers != 1):
+        parser.error("variant tables cannot be combined with -j, --store, --mllp or --report")
+    if args.report and (args.store or args.mllp or args.workers != 1 or args.worker or args.socket):
+        parser.error("--report cannot be combined with -j, --store, --mllp, --worker or --socket")
+    if args.preflight and (args.store or args.mllp or args.report or args.worker or args.socket or table):
+        parser.error(
+            "--preflight cannot be combined with --store, --mllp, --report, --worker, --socket or variant tables"
+        )
+    if _uses_sink(args):
+        if args.output == "-":
+            parser.error("--compress, --rotate-messages, --rotate-size and --envelope require -o FILE")
+        if args.store or args.mllp or args.report or args.preflight or args.worker or args.socket or table:
+            parser.error(
+                "output file options cannot be combined with --store, --mllp, --report, --preflight,"
+                " --worker, --socket or variant tables"
+            )
+    if (args.worker or args.socket) and (args.store or args.mllp or args.workers != 1):
+        parser.error("--worker and --socket cannot be combined with -j, --store or --mllp")
+    if args.errors and (args.preflight or args.worker or args.socket or table):
+        parser.error("--errors cannot be combined with --preflight, --worker, --socket or variant tables")
+
+
+def _convert(args: argparse.Namespace, source: Path | TextIO) -> int:
+    # Modes import what only they need, to keep startup short
+    if args.worker or args.socket:
+        from biocommons.gks_conversion_tool import worker  # noqa: PLC0415
+
+        if args.socket:
+            worker.serve_unix(args.socket, lean=args.lean)
+        else:
+            worker.preload(args.lean)
+            worker.serve_stream(sys.stdin.buffer, sys.stdout.buffer, lean=args.lean)
+        return 0
+
+    if args.mllp:
+        import asyncio  # noqa: PLC0415
+
+        stats = StreamStats()
+        with ExitStack() as stack:
+            errors_out = stack.enter_context(Path(args.errors).open("w")) if args.errors else None
+            send_stats = asyncio.run(_send_mllp(args, source, stats, errors_out))
+        _logger.info(
+            "Sent %d messages (%d retries, %d failed, %d statements not converted)",
+            send_stats.sent,
+            send_stats.retries,
+            send_stats.failed,
+            stats.errors,
+        )
+        return 1 if send_stats.failed or stats.errors else 0
+
+    if args.preflight:
+        from biocommons.gks_conversion_tool.preflight import preflight  # noqa: PLC0415
+
+        with ExitStack() as stack:
+            out = sys.stdout if args.output == "-" else stack.enter_context(Path(args.output).open("w"))
+            report = preflight(
+                iter_statement_texts(source),
+                out,
+                workers=args.workers,
+                chunk_size=args.chunk_size,
+                lean=args.lean,
+            )
+            out.flush()
+        return 1 if report.failed else 0
+
+    if _uses_sink(args):
+        stats = _write_sink(args, source)
+    else:
+        with ExitStack() as stack:
+            out = sys.stdout if args.output == "-" else stack.enter_context(Path(args.output).open("w"))
+            errors_out = stack.enter_context(Path(args.errors).open("w")) if args.errors else None
+            stats = _run(args, source, out, errors_out)
+            out.flush()
+
+    # a run that skipped statements did not convert its whole input
+    return 1 if stats.errors else 0
+
+
+def _run(
+    args: argparse.Namespace, source: Path | TextIO, out: TextIO, errors_out: TextIO | None
+) -> "StreamStats | ReportStats":
+    if isinstance(source, Path) and source.suffix.lower() in TABLE_SUFFIXES:
+        from biocommons.gks_conversion_tool.columnar import (  # noqa: PLC0415
+            stream_table_obx_segments,
+        )
+
+        return stream_table_obx_segments(source, out, batch_size=args.batch_size)
+    if args.report:
+        from biocommons.gks_conversion_tool.report import write_report  # noqa: PLC0415
+
+        return write_report(
+            iter_statement_data(source),
+            out,
+            message_control_id=hl7_timestamp()[2:],
+            patient_id=args.patient_id,
+            patient_name=args.patient_name,
+            errors_out=errors_out,
+            lean=args.lean,
+        )
+    if args.store:
+        from biocommons.gks_conversion_tool.incremental import (  # noqa: PLC0415
+            ResultStore,
+            stream_obx_segments_incremental,
+        )
+
+        with ResultStore(args.store) as store:
+            return stream_obx_segments_incremental(
+                iter_statement_data(source),
+                out,
+                store,
+                changed_only=args.changed_only,
+                errors_out=errors_out,
+                lean=args.lean,
+            )
+    if args.workers == 1:
+        stats = stream_obx_segments(iter_statement_data(source), out, errors_out=errors_out, lean=args.lean)
+        _logger.debug("Cache statistics: %s", cache_stats())
+        return stats
+    return stream_obx_segments_parallel(
+        iter_statement_texts(source),
+        out,
+        workers=args.workers or None,
+        chunk_size=args.chunk_size,
+        errors_out=errors_out,
+        lean=args.lean,
+        metrics=bool(args.metrics),
+    )
+
+
+def _uses_sink(args: argparse.Namespace) -> bool:
+    return bool(
+        args.compress
+        or args.rotate_messages
+        or args.rotate_size
+        or args.envelope
+        or args.output.lower().endswith(_COMPRESSED_SUFFIXES)
+    )
+
+
+def _write_sink(args: argparse.Namespace, source: Path | TextIO) -> StreamStats:
+    from biocommons.gks_conversion_tool.sinks import HL7Sink, stream_to_sink  # noqa: PLC0415
+
+    control_id_prefix = hl7_timestamp()[2:] + "." if args.envelope else None
+    with ExitStack() as stack:
+        sink = stack.enter_context(
+            HL7Sink(
+                args.output,
+                compression=args.compress,
+                max_messages=args.rotate_messages,
+                max_bytes=args.rotate_size,
+                envelope=args.envelope,
+            )
+        )
+        errors_out = stack.enter_context(Path(args.errors).open("w")) if args.errors else None
+        if args.workers == 1:
+            return stream_to_sink(
+                iter_statement_data(source), sink, control_id_prefix, errors_out=errors_out, lean=args.lean
+            )
+        return stream_to_sink_parallel(
+            iter_statement_texts(source),
+            sink,
+            workers=args.workers or None,
+            chunk_size=args.chunk_size,
+            errors_out=errors_out,
+            lean=args.lean,
+            metrics=bool(args.metrics),
+            control_id_prefix=control_id_prefix,
+        )
+
+
+async def _send_mllp(
+    args: argparse.Namespace, source: Path | TextIO, stats: StreamStats, errors_out: TextIO | None
+) -> "SendStats":
+    from biocommons.gks_conversion_tool.mllp import MLLPClient  # noqa: PLC0415
+
+    host, _, port = args.mllp.rpartition(":")
+    messages = iter_oru_messages(iter_statement_data(source), stats=stats, errors_out=errors_out, lean=args.lean)
+    async with MLLPClient(
+        host or "localhost",
+        int(port),
+        connections=args.connections,
+        max_in_flight=args.in_flight,
+        max_attempts=args.attempts,
+    ) as client:
+        return await client.send_all(messages)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
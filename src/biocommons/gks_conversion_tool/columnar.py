@@ -0,0 +1,291 @@
+"""Vectorized conversion of variant tables (Parquet, Arrow, CSV, TSV) to HL7 v2 OBX segments
+
+Annotated variant tables have one row per variant and columns named like the
+variant information keys (GENE_STUDIED, DNA_CHANGE, ...). Rather than building
+segment groups row by row, each record batch becomes one string column per VAR
+concept, computed with pyarrow.compute: OBX-1 from a running count of the
+concepts present so far in the row, OBX-2 to OBX-4 from the concept's template,
+and OBX-5 from the value columns. The lines are then joined row-wise, leaving
+out the concepts a row has no value for, and each batch is written as a single
+string.
+
+The output matches createVARSegmentsGroupsLite + generate_all_obx_for_variants_templated
+applied to each row, with empty cells treated as missing. Text is escaped as by
+escaping.escape, column by column and only if some value needs it; NM and NR
+values are formatted as floats ("12.0"), as the segment classes do.
+
+Requires pyarrow (pip install 'biocommons-example[columnar]').
+"""
+
+import csv
+import time
+from collections.abc import Iterator
+from dataclasses import dataclass
+from pathlib import Path
+from typing import TextIO
+
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from biocommons.gks_conversion_tool.escaping import ESCAPE_SEQUENCES, NEEDS_ESCAPING_PATTERN, escape
+from biocommons.gks_conversion_tool.instrumentation import instrumented
+from biocommons.gks_conversion_tool.obx_segment_generator import carat_separator, pipe_separator
+from biocommons.gks_conversion_tool.obx_templates import template_for_group
+from biocommons.gks_conversion_tool.streaming import (
+    DEFAULT_TABLE_BATCH_SIZE,
+    TABLE_SUFFIXES,
+    StreamStats,
+    log_stats,
+    segment_terminator,
+)
+from biocommons.gks_conversion_tool.var_concept_registry import (
+    CWE,
+    NM,
+    NR,
+    VAR_CONCEPT_REGISTRY,
+    VARConceptMapping,
+)
+from biocommons.models import OBXSegmentGroupLite
+
+# Float text from pyarrow that may differ from Python's str(float): exponent
+# notation, values below 1e-4 and integers of 17 digits or more
+_NOT_LIKE_PYTHON_PATTERN = r"e|^-?0\.0000|\d{17}"
+
+
+@dataclass(frozen=True)
+class _ColumnPlan:
+    """The constant parts of one VAR concept's OBX lines, resolved once per table."""
+
+    mapping: VARConceptMapping
+    # whether a row without a value is an error
+    required: bool
+    # "OBX|"
+    prefix: pa.Scalar
+    # "|<OBX-2>|<OBX-3>|<OBX-4>|"
+    middle: pa.Scalar
+    # the separators in front of the empty OBX-6..OBX-21, and the terminator
+    suffix: pa.Scalar
+
+
+def plan_columns(
+    variant_identifier: str = "a", terminator: str = segment_terminator, use_required: bool = False
+) -> list[_ColumnPlan]:
+    """
+    One plan per registry entry, in OBX order. Like variant information dicts,
+    table rows need not have the registry's required concepts unless use_required is set.
+    """
+    plans = []
+    for mapping in VAR_CONCEPT_REGISTRY:
+        # an empty group, only for its defaults (segment type, variant type, identifier system)
+        group = OBXSegmentGroupLite([], mapping.observation_type, variant_identifier, mapping.concept)
+        template = template_for_group(group)
+        obx4 = str(group.variant_type) + group.variant_identifier
+        plans.append(
+            _ColumnPlan(
+                mapping=mapping,
+                required=mapping.required and use_required,
+                prefix=pa.scalar(template.prefix),
+                middle=pa.scalar(template.middle + obx4 + pipe_separator),
+                suffix=pa.scalar(template.suffix + terminator),
+            )
+        )
+    return plans
+
+
+# --- Input -------------------------------------------------------------------
+
+
+def iter_record_batches(path: Path, batch_size: int = DEFAULT_TABLE_BATCH_SIZE) -> Iterator[pa.RecordBatch]:
+    """
+    Read a table in record batches of about `batch_size` rows.
+
+    CSV and TSV columns are all read as strings, so text is sent exactly as
+    written and type inference cannot differ from one block to the next.
+    """
+    suffix = path.suffix.lower()
+    if suffix == ".parquet":
+        import pyarrow.parquet as pq  # noqa: PLC0415
+
+        yield from pq.ParquetFile(path).iter_batches(batch_size=batch_size)
+    elif suffix in (".arrow", ".feather"):
+        import pyarrow.ipc  # noqa: PLC0415
+
+        with pa.memory_map(str(path)) as source:
+            reader = pyarrow.ipc.open_file(source)
+            for i in range(reader.num_record_batches):
+                yield from _slices(reader.get_batch(i), batch_size)
+    elif suffix in (".csv", ".tsv"):
+        import pyarrow.csv  # noqa: PLC0415
+
+        delimiter = "\t" if suffix == ".tsv" else ","
+        with path.open(newline="") as f:
+            header = next(csv.reader(f, delimiter=delimiter), [])
+        reader = pyarrow.csv.open_csv(
+            path,
+            parse_options=pyarrow.csv.ParseOptions(delimiter=delimiter),
+            convert_options=pyarrow.csv.ConvertOptions(column_types=dict.fromkeys(header, pa.string())),
+        )
+        for batch in reader:
+            yield from _slices(batch, batch_size)
+    else:
+        msg = f"Unsupported table format {path.suffix!r}; expected one of {', '.join(sorted(TABLE_SUFFIXES))}"
+        raise ValueError(msg)
+
+
+def _slices(batch: pa.RecordBatch, batch_size: int) -> Iterator[pa.RecordBatch]:
+    """Zero-copy slices of at most batch_size rows."""
+    for offset in range(0, batch.num_rows, batch_size):
+        yield batch.slice(offset, batch_size)
+
+
+# --- Conversion --------------------------------------------------------------
+
+
+def _string_column(batch: pa.RecordBatch, name: str) -> pa.Array:
+    """Column `name` as strings, with empty cells as nulls."""
+    column = batch.column(name)
+    if column.type != pa.string():
+        column = pc.cast(column, pa.string())
+    return pc.if_else(pc.equal(column, ""), pa.scalar(None, pa.string()), column)
+
+
+def _escaped(values: pa.Array) -> pa.Array:
+    """A string column with the HL7 delimiters in its values escaped; the column itself if none has any."""
+    if not pc.any(pc.match_substring_regex(values, NEEDS_ESCAPING_PATTERN)).as_py():
+        return values
+    # the escape character comes first, so that it is not escaped again in the sequences added after it
+    for character, sequence in ESCAPE_SEQUENCES.items():
+        values = pc.replace_substring(values, character, sequence)
+    return values
+
+
+def _float_column(batch: pa.RecordBatch, name: str) -> pa.Array:
+    """Column `name` as floats formatted like Python's str(float), with empty cells as nulls."""
+    floats = pc.cast(_string_column(batch, name), pa.float64())
+    text = pc.cast(floats, pa.string())
+    # pyarrow leaves out the ".0" of integral values
+    text = pc.if_else(pc.match_substring_regex(text, r"^-?\d+$"), pc.binary_join_element_wise(text, ".0", ""), text)
+    # and switches between fixed and exponent notation at other exponents than Python, so
+    # the few values in exponent notation or close to it are formatted by Python
+    differs = pc.fill_null(pc.match_substring_regex(text, _NOT_LIKE_PYTHON_PATTERN), False)
+    if not pc.any(differs).as_py():
+        return text
+    python_text = pa.array([str(value) for value in pc.filter(floats, differs).to_pylist()], pa.string())
+    return pc.replace_with_mask(text, differs, python_text)
+
+
+def _value_name(mapping: VARConceptMapping, names: set[str]) -> str | None:
+    for name in (mapping.source, *mapping.aliases):
+        if name in names:
+            return name
+    return None
+
+
+def _obx5_column(mapping: VARConceptMapping, batch: pa.RecordBatch, names: set[str]) -> pa.Array | None:
+    """OBX-5 of one VAR concept for every row, null where the row has no value; None if no row can have one."""
+    if mapping.observation_type is NR:
+        start, end = mapping.source
+        if start not in names or end not in names:
+            return None
+        # null if either bound is missing
+        return pc.binary_join_element_wise(_float_column(batch, start), _float_column(batch, end), carat_separator)
+
+    name = _value_name(mapping, names)
+    if name is not None:
+        values = _float_column(batch, name) if mapping.observation_type is NM else _string_column(batch, name)
+        if mapping.default is not None:
+            values = pc.fill_null(values, str(mapping.default))
+    elif mapping.default is not None:
+        values = pa.array([str(mapping.default)] * batch.num_rows, pa.string())
+    else:
+        return None
+
+    if mapping.observation_type is NM:
+        return values
+    values = _escaped(values)
+    if mapping.observation_type is not CWE:
+        return values
+    return _cwe_column(mapping, values, batch, names)
+
+
+def _cwe_column(mapping: VARConceptMapping, values: pa.Array, batch: pa.RecordBatch, names: set[str]) -> pa.Array:
+    """CWE OBX-5 from escaped label `values`: code^label^system where the row has a code, ^label otherwise."""
+    label_only = pc.binary_join_element_wise(pa.scalar(""), values, carat_separator)
+    if mapping.coding_system is None:
+        return label_only
+    coding_system = pa.scalar(escape(mapping.coding_system))
+    if mapping.code_source is None:
+        return pc.binary_join_element_wise(values, values, coding_system, carat_separator)
+    if mapping.code_source not in names:
+        return label_only
+    codes = _escaped(_string_column(batch, mapping.code_source))
+    coded = pc.binary_join_element_wise(codes, values, coding_system, carat_separator)
+    return pc.if_else(pc.is_valid(codes), coded, label_only)
+
+
+@instrumented("convert_table_batch")
+def convert_batch(batch: pa.RecordBatch, plans: list[_ColumnPlan]) -> tuple[str, int]:
+    """
+    Return the OBX segments of every row of `batch`, as one string with each line
+    terminated, and the number of segments.
+
+    Raises ValueError if a required VAR concept is missing from a row.
+    """
+    names = set(batch.schema.names)
+    rows = batch.num_rows
+    # OBX-1 of the next line in each row
+    set_ids = pa.array([1] * rows, pa.int64())
+    lines = []
+    segments = 0
+
+    for plan in plans:
+        obx5 = _obx5_column(plan.mapping, batch, names)
+        present = pc.is_valid(obx5) if obx5 is not None else None
+        if plan.required and (present is None or not pc.all(present).as_py()):
+            row = 0 if present is None else pc.index(present, False).as_py()
+            msg = f"{plan.mapping.concept.name}: required value {plan.mapping.source!r} is missing in row {row}"
+            raise ValueError(msg)
+        if obx5 is None:
+            continue
+        lines.append(
+            pc.binary_join_element_wise(
+                plan.prefix, pc.cast(set_ids, pa.string()), plan.middle, obx5, plan.suffix, ""
+            )
+        )
+        present_count = pc.cast(present, pa.int64())
+        set_ids = pc.add(set_ids, present_count)
+        segments += pc.sum(present_count).as_py() or 0
+
+    if not lines:
+        return "", 0
+    # absent concepts are null lines; each line already ends with the terminator
+    row_texts = pc.binary_join_element_wise(*lines, "", null_handling="replace", null_replacement="")
+    text = pc.binary_join(pa.ListArray.from_arrays(pa.array([0, rows], pa.int32()), row_texts), "")
+    return text[0].as_py(), segments
+
+
+def stream_table_obx_segments(
+    path: Path,
+    out: TextIO,
+    batch_size: int = DEFAULT_TABLE_BATCH_SIZE,
+    variant_identifier: str = "a",
+    terminator: str = segment_terminator,
+) -> StreamStats:
+    """
+    Convert every row of a variant table and write its OBX segments to `out`, one
+    record batch at a time. Each row counts as one statement in the returned stats.
+    """
+    stats = StreamStats()
+    start = time.perf_counter()
+    plans = plan_columns(variant_identifier, terminator)
+
+    for batch in iter_record_batches(path, batch_size):
+        text, segments = convert_batch(batch, plans)
+        out.write(text)
+        stats.statements += batch.num_rows
+        stats.segments += segments
+
+    stats.elapsed = time.perf_counter() - start
+    log_stats(stats)
+    return stats
+
@@ -0,0 +1,495 @@
+"""Converter for GKS <-> HL7 v2"""
+
+import logging
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Any
+
+from biocommons.gks_conversion_tool.cache import LRUCache
+from biocommons.gks_conversion_tool.instrumentation import instrumented
+from biocommons.gks_conversion_tool.reference import ReferenceIndex
+from biocommons.gks_conversion_tool.structural import (
+    affected_exons,
+    exon_fields,
+    is_structural,
+    structural_fields,
+)
+
+if TYPE_CHECKING:
+    # Only for annotations: the converter reads attributes and never builds
+    # GA4GH objects, so the models are not imported at runtime.
+    from ga4gh.va_spec.base.core import Statement
+    from ga4gh.vrs.models import Allele, Expression, SequenceLocation
+
+_logger = logging.getLogger(__name__)
+
+
+class ConversionError(ValueError):
+    """A Statement cannot be converted. `field` is the HL7 field identifier the problem is with, if known."""
+
+    def __init__(self, message: str, field: str | None = None):
+        super().__init__(message)
+        self.field = field
+
+
+# Parsed hgvs.g expressions, keyed by the expression string
+_hgvs_g_cache = LRUCache(maxsize=4096)
+
+# Allele-derived HL7 fields, keyed by the genomic Allele's VRS id (digest) and its
+# hgvs.g expression, which the id does not cover and lean input does not check
+_allele_cache = LRUCache(maxsize=4096)
+
+# Offline lookups (see configure_reference); without them, fields are taken from the statement as is
+_reference: ReferenceIndex | None = None
+
+# TODO: make this a pydantic class to enforce required vs optional fields and types for the values
+HL7V2 = {
+    "VARIANT_TYPE": "503",
+    "VARIANT_NAME": "504",
+    "DISCRETE_VARIANT": "505",
+    "GENOME_ASSEMBLY": "509",
+    "CHROMOSOME": "510",
+    "ALLELE_START": "511.1",
+    "ALLELE_END": "511.2",
+    "DNA_REGION": "513",
+    "GENE_STUDIED": "514",
+    "TRANSCRIPT_REFERENCE_SEQUENCE_ID": "516",
+    "DNA_CHANGE": "518",
+    "AMINO_ACID_CHANGE": "520",
+    "MOLECULAR_CONSEQUENCE": "521",
+    "PROTEIN_REFERENCE_SEQUENCE": "522",
+    "GENOMIC_REFERENCE_SEQUENCE_ID": "524",
+    # "AMPLIFICATION": "525", TODO: I don't think we can go from GKS to this yet / no guarantee this is in extensions
+    "REFERENCE_ALLELE": "526",
+    "OBSERVED_ALLELE": "527",
+    "GENOMIC_DNA_CHANGE": "528",
+    "CYTOGENETIC_LOCATION": "532",
+    "PENETRANCE": "534",
+    "GENETIC_VARIANT_SOURCE": "535",
+    "ALLELE_LENGTH": "545",
+    "STRUCTURAL_INNER_START": "546.1",
+    "STRUCTURAL_INNER_END": "546.2",
+    "STRUCTURAL_OUTER_START": "547.1",
+    "STRUCTURAL_OUTER_END": "547.2",
+    "COPY_NUMBER": "550",
+    # "FUSED_GENES": "551", Not supported until Cat-VRS 2.0
+    "VARIANT_CLASSIFICATION": "553",
+    "INTERPRETATION": "554",
+    "MODE_OF_INHERITANCE": "560",
+    # This one has a dashed arrow but I can't remember why :(
+    "FUNCTIONAL_EFFECT": "561",
+    "REPEAT_NUCLEOTIDES": "564",
+    "REPEAT_NUMBER": "565",
+    "AFFECTED_EXON_START": "572.1",
+    "AFFECTED_EXON_END": "572.2",
+    "AFFECTED_INTRON_START": "573.1",
+    "AFFECTED_INTRON_END": "573.2",
+    "INTERPRETATION_NOTE": "575",
+}
+
+
+@instrumented("convert")
+def convert_gks_to_hl7_v2(statement: "Statement") -> dict[str, Any]:
+    """
+    Convert a VA-Spec Statement to an HL7 v2-compatible dictionary of fields.
+
+    Returns a dict keyed by HL7 field identifiers (see HL7V2 constants).
+    Raises ConversionError (a ValueError) if required data are missing or malformed.
+    """
+    proposition = statement.proposition
+    subject_variant = proposition.subjectVariant
+
+    # 504 - Variant Name (required)
+    variant_name = subject_variant.name
+    if not variant_name:
+        msg = "subjectVariant.name is missing or empty; it is required for the variant name (504)"
+        raise ConversionError(msg, field=HL7V2["VARIANT_NAME"])
+
+    # 505 - Discrete Genetic Variant (placeholder until models solidify)
+    # TODO: need to wait for models for this or find out what expected format is
+
+    # One pass over the members; every field below reads from this index
+    member_index = build_member_index(subject_variant.members or [])
+    found = _find_genomic_allele_and_location(member_index)
+    if found is None:
+        msg = "subjectVariant has no genomic allele (a member with a genomic location or an hgvs.g expression)"
+        raise ConversionError(msg, field=HL7V2["ALLELE_START"])
+    genomic_allele, genomic_location = found
+
+    # Repeated alleles (e.g. hotspots) reuse the fields derived from them
+    expression = _find_expression(member_index, genomic_allele, syntax="hgvs.g")
+    cache_key = (genomic_allele.id, expression.value if expression is not None else None)
+    allele_fields = _allele_cache.get(cache_key) if genomic_allele.id else None
+    if allele_fields is None:
+        allele_fields = _convert_allele(genomic_allele, genomic_location, expression)
+        if genomic_allele.id:
+            _allele_cache.put(cache_key, allele_fields)
+    (
+        chromosome,
+        allele_start,
+        allele_end,
+        genomic_reference,
+        genomic_dna_change,
+        genome_assembly,
+        cytogenetic_location,
+        structural,
+    ) = allele_fields
+
+    # 513 - DNA Region
+
+    # 514 - Gene Studied (HGNC ID from the reference index)
+    gene = getattr(proposition, "geneContextQualifier", None)
+    gene_studied = getattr(gene, "name", None) if gene is not None else None
+    gene_id = _reference.hgnc_id(gene_studied) if _reference is not None and gene_studied else None
+
+    # 516 - Transcript Reference Sequence ID / 518 - DNA Change
+    transcript_reference, dna_change = _split_first_expression(member_index, "hgvs.c", "c.")
+    if transcript_reference is None and _reference is not None:
+        transcript_reference = _reference_accession(member_index, "mRNA")
+
+    # 520 - Amino Acid Change / 522 - Protein Reference Sequence
+    protein_reference, amino_acid_change = _split_first_expression(member_index, "hgvs.p", "p.")
+    if protein_reference is None and _reference is not None:
+        protein_reference = _reference_accession(member_index, "protein")
+
+    # 572 - Affected Exon Start/End / 573 - Affected Intron Start/End (structural variants)
+    if structural is not None and _reference is not None:
+        hit = affected_exons(_reference, genomic_reference, allele_start, allele_end, transcript_reference)
+        if hit is not None:
+            # without a transcript expression, 516 is the transcript the exons were found on
+            transcript_reference = transcript_reference or hit.transcript
+            structural = structural | exon_fields(hit)
+
+    # 521 - Molecular Consequence
+
+    # 524 - Genomic Reference Sequence ID (derived with the allele fields above)
+
+    # 526 - Reference Allele
+
+    # 527 - Observed Allele
+
+    # 528 - Genomic DNA Change (derived with the allele fields above)
+
+    # 532 - Cytogenetic Location (derived with the allele fields above)
+
+    # 534 - Penetrance
+
+    # 535 - Genetic Variant Source
+
+    # 503 - Variant Type, 545 - Allele Length, 546 - Structural Inner Start/End,
+    # 547 - Structural Outer Start/End, 550 - Copy Number (derived with the allele fields above)
+
+    # 553 - Variant Classification
+
+    # 554 - Interpretation
+
+    # 560 - Mode of Inheritance
+
+    # 561 - Functional Effect
+
+    # 564 - Repeat Nucleotides
+
+    # 565 - Repeat Number
+
+    # 575 - Interpretation Note
+
+    result: dict[str, Any] = {}
+    result[HL7V2["VARIANT_NAME"]] = variant_name
+    result[HL7V2["CHROMOSOME"]] = chromosome
+    result[HL7V2["ALLELE_START"]] = allele_start
+    result[HL7V2["ALLELE_END"]] = allele_end
+    result[HL7V2["TRANSCRIPT_REFERENCE_SEQUENCE_ID"]] = transcript_reference
+    result[HL7V2["DNA_CHANGE"]] = dna_change
+    result[HL7V2["AMINO_ACID_CHANGE"]] = amino_acid_change
+    result[HL7V2["PROTEIN_REFERENCE_SEQUENCE"]] = protein_reference
+    result[HL7V2["GENOMIC_REFERENCE_SEQUENCE_ID"]] = genomic_reference
+    result[HL7V2["GENOMIC_DNA_CHANGE"]] = genomic_dna_change
+    # Fields only some statements (or a reference index) provide are left out when unknown
+    for name, value in (
+        ("GENOME_ASSEMBLY", genome_assembly),
+        ("GENE_STUDIED", gene_studied),
+        ("GENE_ID", gene_id),
+        ("CYTOGENETIC_LOCATION", cytogenetic_location),
+    ):
+        if value is not None:
+            # GENE_ID is the code of 514 and has no HL7 field of its own
+            result[HL7V2.get(name, name)] = value
+    if structural is not None:
+        for name, value in structural.items():
+            result[HL7V2[name]] = value
+
+    return result
+
+
+def configure_caches(hgvs_g_maxsize: int | None = None, allele_maxsize: int | None = None) -> None:
+    """
+    Resize the conversion caches. A size of 0 disables that cache.
+    Arguments left as None keep their current size.
+    """
+    if hgvs_g_maxsize is not None:
+        _hgvs_g_cache.resize(hgvs_g_maxsize)
+    if allele_maxsize is not None:
+        _allele_cache.resize(allele_maxsize)
+
+
+def configure_reference(reference: ReferenceIndex | None) -> None:
+    """
+    Use a reference.ReferenceIndex for chromosome names, genome assemblies, HGNC
+    IDs, cytobands, RefSeq accessions of refget-only alleles and the exons that
+    structural variants cover; None stops using one.
+    """
+    global _reference  # noqa: PLW0603
+    _reference = reference
+    # cached allele fields were derived with the previous index
+    _allele_cache.clear()
+
+
+def worker_configuration() -> tuple[int, int, str | None]:
+    """
+    This process's cache sizes and reference index path, as the arguments of
+    configure_worker, so that worker processes can be set up the same way
+    whatever their start method.
+    """
+    reference_path = str(_reference.path) if _reference is not None else None
+    return _hgvs_g_cache.maxsize, _allele_cache.maxsize, reference_path
+
+
+def configure_worker(hgvs_g_maxsize: int, allele_maxsize: int, reference_path: str | None) -> None:
+    """Process pool initializer that applies a worker_configuration() of the parent process."""
+    configure_caches(hgvs_g_maxsize=hgvs_g_maxsize, allele_maxsize=allele_maxsize)
+    if reference_path is None:
+        configure_reference(None)
+    else:
+        configure_reference(ReferenceIndex(reference_path))
+
+
+def reference_fingerprint() -> str | None:
+    """Fingerprint of the configured reference index (see ReferenceIndex.fingerprint), or None without one."""
+    return _reference.fingerprint if _reference is not None else None
+
+
+def cache_stats() -> dict[str, dict[str, int]]:
+    """Return hit/miss/size statistics for the conversion caches."""
+    return {"hgvs_g": _hgvs_g_cache.stats(), "allele": _allele_cache.stats()}
+
+
+def clear_caches() -> None:
+    _hgvs_g_cache.clear()
+    _allele_cache.clear()
+
+
+def _convert_allele(
+    allele: "Allele", location: "SequenceLocation", expression: "Expression | None"
+) -> tuple[str | None, int, int, str | None, str | None, str | None, str | None, dict[str, Any] | None]:
+    """
+    Derive the fields that depend only on the genomic allele and its hgvs.g
+    `expression`: (510 chromosome, 511.1 start, 511.2 end, 524 genomic reference,
+    528 genomic DNA change, 509 genome assembly, 532 cytogenetic location, structural fields).
+
+    The structural fields (see structural.structural_fields) are None unless the
+    allele is a copy-number variant or has an imprecise end. Raises
+    ConversionError if the start or end is missing or the start is after the end.
+    """
+    # hgvs.g expression of the allele (e.g., 'NC_000007.13:g.140453136A>T')
+    if expression is not None:
+        genomic_reference, genomic_dna_change = _split_hgvs(expression.value, "g.")
+        chromosome = _parse_hgvs_g(expression.value)[0]
+    else:
+        chromosome = genomic_reference = genomic_dna_change = None
+
+    # 511 - Allele start/end
+    if is_structural(allele, location):
+        allele_start, allele_end, structural = structural_fields(allele, location)
+    else:
+        allele_start, allele_end = _get_location_interval(location)
+        structural = None
+    if allele_start is None or allele_end is None:
+        msg = "Allele location has no start or end; both are required for the allele position (511)"
+        raise ConversionError(msg, field=HL7V2["ALLELE_START"])
+    if isinstance(allele_start, int) and isinstance(allele_end, int) and allele_start > allele_end:
+        msg = f"Allele start {allele_start} is after its end {allele_end}"
+        raise ConversionError(msg, field=HL7V2["ALLELE_START"])
+
+    genome_assembly = cytogenetic_location = None
+    if _reference is not None:
+        if genomic_reference is None:
+            genomic_reference = _reference.accession_for_refget(_refget_accession(location) or "")
+        sequence = _reference.sequence(genomic_reference) if genomic_reference else None
+        if sequence is not None:
+            chromosome = sequence.chromosome or chromosome
+            genome_assembly = sequence.assembly or None
+            if isinstance(allele_start, int):
+                cytogenetic_location = _reference.cytoband(sequence.assembly, sequence.chromosome, allele_start)
+
+    return (
+        chromosome,
+        allele_start,
+        allele_end,
+        genomic_reference,
+        genomic_dna_change,
+        genome_assembly,
+        cytogenetic_location,
+        structural,
+    )
+
+
+# --- Helpers: extract from VA objects -------------------------------------
+
+
+@dataclass
+class MemberIndex:
+    """
+    The members of a categorical variant, bucketed in a single pass so that each
+    field extractor is a dict lookup instead of another scan over the members.
+    """
+
+    # moleculeType -> [(allele, location)], in member order
+    by_molecule_type: "dict[str, list[tuple[Allele, SequenceLocation]]]" = field(default_factory=dict)
+
+    # expression syntax -> [(allele, expression)], in member order
+    by_syntax: "dict[str, list[tuple[Allele, Expression]]]" = field(default_factory=dict)
+
+    # (id(allele), syntax) -> the allele's first expression with that syntax
+    by_allele_syntax: "dict[tuple[int, str], Expression]" = field(default_factory=dict)
+
+
+@instrumented("index_members")
+def build_member_index(members: "list[Allele]") -> MemberIndex:
+    """
+    Index a categorical variant's members by location moleculeType and their expressions by syntax.
+    Runs in time linear in the number of members plus expressions.
+    """
+    index = MemberIndex()
+    by_molecule_type = index.by_molecule_type
+    by_syntax = index.by_syntax
+    by_allele_syntax = index.by_allele_syntax
+
+    for member in members:
+        # cat-vrs wraps members in a Variation RootModel
+        allele = getattr(member, "root", member)
+
+        location = getattr(allele, "location", None)
+        seq_ref = getattr(location, "sequenceReference", None) if location is not None else None
+        molecule_type = getattr(seq_ref, "moleculeType", None) if seq_ref is not None else None
+        if molecule_type is not None:
+            by_molecule_type.setdefault(molecule_type, []).append((allele, location))
+
+        for expr in getattr(allele, "expressions", None) or []:
+            by_syntax.setdefault(expr.syntax, []).append((allele, expr))
+            by_allele_syntax.setdefault((id(allele), expr.syntax), expr)
+
+    return index
+
+
+@instrumented("find_genomic_allele")
+def _find_genomic_allele_and_location(
+    member_index: MemberIndex,
+) -> "tuple[Allele, SequenceLocation] | None":
+    """
+    Return the first (allele, location) whose location.sequenceReference.moleculeType == 'genomic'.
+
+    Falls back to the first allele with an hgvs.g expression and a location, for
+    alleles whose location has no sequenceReference (e.g. those parsed back from OBX).
+    """
+    candidates = member_index.by_molecule_type.get("genomic")
+    if candidates:
+        return candidates[0]
+    for allele, _ in member_index.by_syntax.get("hgvs.g", ()):
+        location = getattr(allele, "location", None)
+        if location is not None and getattr(location, "start", None) is not None:
+            return allele, location
+    return None
+
+
+def _find_expression(member_index: MemberIndex, allele: "Allele", syntax: str) -> "Expression | None":
+    """
+    Find the first expression with a given syntax (e.g., 'hgvs.g') from allele.expressions.
+    """
+    # TODO: raise error?
+    return member_index.by_allele_syntax.get((id(allele), syntax))
+
+
+def _split_first_expression(member_index: MemberIndex, syntax: str, change_prefix: str) -> tuple[str | None, str | None]:
+    """
+    Split the first expression with the given syntax across all members into
+    (reference sequence, change), or (None, None) if there is none.
+    """
+    candidates = member_index.by_syntax.get(syntax)
+    if not candidates:
+        return None, None
+    return _split_hgvs(candidates[0][1].value, change_prefix)
+
+
+def _refget_accession(location: "SequenceLocation") -> str | None:
+    seq_ref = getattr(location, "sequenceReference", None)
+    return getattr(seq_ref, "refgetAccession", None) if seq_ref is not None else None
+
+
+def _reference_accession(member_index: MemberIndex, molecule_type: str) -> str | None:
+    """RefSeq accession of the first member located on a sequence of `molecule_type`, from the reference index."""
+    for _, location in member_index.by_molecule_type.get(molecule_type, ()):
+        refget_accession = _refget_accession(location)
+        if refget_accession:
+            return _reference.accession_for_refget(refget_accession)
+    return None
+
+
+def _get_location_interval(location: "SequenceLocation") -> tuple[int, int]:
+    """
+    Extract (start, end) from a SequenceLocation.
+    """
+    start = location.start
+    end = location.end
+    return start, end
+
+
+# --- Helpers: transformation / parsing ---------------------------------------
+
+
+# HL7 field of the change part of an HGVS expression, by prefix
+_CHANGE_FIELDS = {"c.": HL7V2["DNA_CHANGE"], "p.": HL7V2["AMINO_ACID_CHANGE"], "g.": HL7V2["GENOMIC_DNA_CHANGE"]}
+
+
+@instrumented("split_hgvs")
+def _split_hgvs(hgvs_value: str, change_prefix: str) -> tuple[str, str]:
+    """
+    Split an HGVS expression such as 'NM_004333.6:c.1799T>A' into its reference
+    sequence and change ('NM_004333.6', 'c.1799T>A').
+
+    Raises ConversionError if the change does not start with `change_prefix` (e.g. 'c.').
+    """
+    reference, sep, change = hgvs_value.partition(":")
+    if not sep or not reference or not change.startswith(change_prefix):
+        msg = f"Not a {change_prefix[:-1]}. HGVS expression: {hgvs_value!r}"
+        raise ConversionError(msg, field=_CHANGE_FIELDS.get(change_prefix))
+    return reference, change
+
+
+@instrumented("parse_hgvs_g")
+def _parse_hgvs_g(hgvs_g_value: str) -> tuple[str, str]:
+    """
+    Parse an hgvs.g expression. Results are cached by expression string.
+
+    Accepted styles:
+      - 'NC_000007.13:g.140453136A>T'
+      - 'chr7:g.140453136A>T'
+      - '7:g.140453136A>T'
+
+    Returns:
+      (chromosome, g_dot) where chromosome is the left of ':' (without any 'chr' prefix),
+      and g_dot includes 'g.' onwards.
+    Raises ConversionError if the expression is not of the form '<sequence>:g.<change>'.
+    """
+    parsed = _hgvs_g_cache.get(hgvs_g_value)
+    if parsed is not None:
+        return parsed
+
+    chromosome, sep, g_dot = hgvs_g_value.partition(":")
+    if not sep or not chromosome or not g_dot.startswith("g."):
+        msg = f"Not an hgvs.g expression: {hgvs_g_value!r}"
+        raise ConversionError(msg, field=HL7V2["GENOMIC_DNA_CHANGE"])
+    if chromosome.startswith("chr"):
+        chromosome = chromosome[3:]
+
+    parsed = (chromosome, g_dot)
+    _hgvs_g_cache.put(hgvs_g_value, parsed)
+    return parsed
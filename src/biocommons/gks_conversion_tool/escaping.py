@@ -0,0 +1,76 @@
+"""HL7 v2 escape sequences for field values
+
+OBX lines are split on the delimiters declared in MSH-2, so a delimiter inside a
+value (e.g. a "|" in a label, or the "^" and "&" that HGVS delins and insertion
+syntax can contain) would shift every field after it. escape() replaces each of
+them by its escape sequence, and unescape() restores them after a line has been
+split:
+
+    |  \\F\\    ^  \\S\\    &  \\T\\    ~  \\R\\    \\  \\E\\
+
+Carriage returns and line feeds would end the segment; they are sent as the hex
+escapes \\X0D\\ and \\X0A\\.
+
+Most values contain none of these characters. Both functions test for that first
+and then return the value itself, without building a copy; only values that need
+it go through str.translate or re.sub. The test is a chain of substring checks,
+which CPython runs as memchr scans; for the short values in OBX-5 that is about
+twice as fast as a regex character class.
+"""
+
+import re
+
+ESCAPE_CHARACTER = "\\"
+
+# Delimiter -> escape sequence, with the standard encoding characters (MSH-2 "^~\&")
+ESCAPE_SEQUENCES: dict[str, str] = {
+    "\\": "\\E\\",
+    "|": "\\F\\",
+    "^": "\\S\\",
+    "&": "\\T\\",
+    "~": "\\R\\",
+    "\r": "\\X0D\\",
+    "\n": "\\X0A\\",
+}
+
+_ESCAPE_TABLE = str.maketrans(ESCAPE_SEQUENCES)
+# A character class of the keys above, in syntax that both re and pyarrow's RE2 accept
+NEEDS_ESCAPING_PATTERN = r"[\\|^&~\r\n]"
+
+_UNESCAPE = {"F": "|", "S": "^", "T": "&", "R": "~", "E": "\\"}
+_ESCAPE_SEQUENCE = re.compile(r"\\(?:([FSTRE])|X((?:[0-9A-Fa-f]{2})+))\\")
+
+
+def escape(value: str) -> str:
+    """Escape the HL7 delimiters in a field or component value; clean values are returned as is."""
+    if not (
+        "\\" in value or "|" in value or "^" in value or "&" in value or "~" in value or "\r" in value or "\n" in value
+    ):
+        return value
+    return value.translate(_ESCAPE_TABLE)
+
+
+def needs_escaping_except_components(value: str) -> bool:
+    """Whether `value` has a character to escape other than the component separator "^"."""
+    return "\\" in value or "|" in value or "&" in value or "~" in value or "\r" in value or "\n" in value
+
+
+def _replace(match: re.Match) -> str:
+    character = match.group(1)
+    if character is not None:
+        return _UNESCAPE[character]
+    data = bytes.fromhex(match.group(2))
+    try:
+        return data.decode()
+    except UnicodeDecodeError:
+        return data.decode("latin-1")
+
+
+def unescape(value: str) -> str:
+    """
+    Undo escape() on a value split out of a field. Escape sequences other than
+    \\F\\ \\S\\ \\T\\ \\R\\ \\E\\ and \\Xhh..\\ (e.g. the formatting ones) are left as they are.
+    """
+    if ESCAPE_CHARACTER not in value:
+        return value
+    return _ESCAPE_SEQUENCE.sub(_replace, value)
@@ -0,0 +1,355 @@
+"""Parsing of HL7 v2 OBX segments back into GKS objects
+
+The reverse of convert_gks_to_hl7_v2 + create_segment_groups. Input is read one
+segment at a time, so batch files (FHS/BHS ... BTS/FTS around any number of
+ORU^R01 messages) of any size are parsed in constant memory. Each OBX line is
+split once on "|"; OBX-3 is looked up in a table built from VARConcepts and
+HL7V2, and OBX-5 is decoded straight into the value stored under the HL7 field
+identifier, so a parsed variant is one dict with the same keys that
+convert_gks_to_hl7_v2 returns. Escape sequences (\\F\\, \\S\\, ...) in text values
+are undone after the value has been split into its components.
+
+Turning those dicts into VRS Alleles and VA-Spec Statements is a separate step
+(build_allele, build_categorical_variant, build_statement) that callers only pay
+for when they need the objects; the GA4GH models are only imported then.
+"""
+
+import re
+from collections.abc import Iterable, Iterator
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, TextIO
+
+from biocommons.gks_conversion_tool.converter import HL7V2
+from biocommons.gks_conversion_tool.escaping import unescape
+from biocommons.gks_conversion_tool.obx_segment_generator import (
+    carat_separator,
+    period_separator,
+    pipe_separator,
+)
+from biocommons.gks_conversion_tool.var_concept_registry import VAR_CONCEPT_REGISTRY
+from biocommons.models import ObservationTypes, VARConcepts
+
+if TYPE_CHECKING:
+    from ga4gh.cat_vrs.models import CategoricalVariant
+    from ga4gh.core.models import MappableConcept, iriReference
+    from ga4gh.va_spec.base.core import Statement
+    from ga4gh.va_spec.base.domain_entities import Condition
+    from ga4gh.vrs.models import Allele
+
+repetition_separator: str = "~"
+
+# Batch and file envelope segments; they carry nothing that maps to GKS
+_ENVELOPE_SEGMENTS = frozenset({"FHS", "BHS", "BTS", "FTS"})
+
+# MLLP framing characters that show up in captured message logs
+_MLLP_CHARACTERS = "\x0b\x1c"
+
+
+def _build_concept_table() -> dict[str, str]:
+    """Map both the code (VARCONCEPT514) and the label (Gene Studied) of each concept to its number (514)."""
+    table: dict[str, str] = {}
+    for concept in VARConcepts:
+        number = concept.name.removeprefix("VARCONCEPT")
+        table[concept.name] = number
+        table[concept.value] = number
+    return table
+
+
+def _build_range_fields() -> dict[str, tuple[str, str]]:
+    """Concepts sent as a range (511 Allele Start/end) -> the two HL7V2 field identifiers (511.1, 511.2)."""
+    ranges: dict[str, list[str]] = {}
+    for identifier in HL7V2.values():
+        number, sep, _ = identifier.partition(period_separator)
+        if sep:
+            ranges.setdefault(number, []).append(identifier)
+    return {number: (low, high) for number, (low, high) in ranges.items()}
+
+
+def _build_code_keys() -> dict[str, str]:
+    """CWE concepts whose code is a value of its own (514) -> the key of that value (GENE_ID)."""
+    return {
+        mapping.concept.name.removeprefix("VARCONCEPT"): mapping.code_source
+        for mapping in VAR_CONCEPT_REGISTRY
+        if mapping.code_source is not None
+    }
+
+
+_CONCEPT_NUMBERS: dict[str, str] = _build_concept_table()
+_RANGE_FIELDS: dict[str, tuple[str, str]] = _build_range_fields()
+_CODE_KEYS: dict[str, str] = _build_code_keys()
+
+
+@dataclass(slots=True)
+class ParsedVariant:
+    """
+    The OBX values of one variant (one OBX-4 identifier) in one message.
+
+    `fields` is keyed by HL7 field identifier like the dict from convert_gks_to_hl7_v2.
+    Concepts without an HL7V2 constant are keyed by their number (e.g. "503").
+    A CWE value is its text component; a code that is a value of its own is
+    stored under its own key, as the converter returns it (GENE_ID for 514).
+    A repeated OBX-5 (a~b) is stored as a list.
+    """
+
+    message_control_id: str | None
+    variant_identifier: str
+    fields: dict[str, Any] = field(default_factory=dict)
+
+
+# --- Tokenizing --------------------------------------------------------------
+
+
+def iter_segments(lines: Iterable[str]) -> Iterator[str]:
+    """
+    Yield the non-empty segments of HL7 v2 text given as lines or chunks.
+
+    Segments may be terminated by "\\r" (the standard), "\\n" or "\\r\\n", so both
+    wire-format messages and files with one segment per line work.
+    """
+    for line in lines:
+        if "\r" in line:
+            for part in line.split("\r"):
+                if segment := part.strip("\n" + _MLLP_CHARACTERS):
+                    yield segment
+            continue
+        segment = line.rstrip("\n")
+        if segment and segment[0] in _MLLP_CHARACTERS:
+            segment = segment.strip(_MLLP_CHARACTERS)
+        if segment:
+            yield segment
+
+
+def _number(text: str) -> int | float:
+    value = float(text)
+    return int(value) if value.is_integer() else value
+
+
+def _decode_value(observation_type: str, value: str) -> Any:
+    """Decode one OBX-5 repetition by its OBX-2 value type."""
+    if observation_type == "CWE":
+        # code^text^system; the converter always sends the value as the text, but
+        # other senders may send a code alone
+        code, _, rest = value.partition(carat_separator)
+        text = rest.partition(carat_separator)[0]
+        return unescape(text or code)
+    if observation_type == "NM":
+        return _number(value)
+    if observation_type == "NR":
+        low, _, high = value.partition(carat_separator)
+        return (_number(low) if low else None, _number(high) if high else None)
+    return unescape(value)
+
+
+def _cwe_code(value: str) -> str | None:
+    """The code component of one CWE repetition, or None if it has none."""
+    code = value.partition(carat_separator)[0]
+    return unescape(code) if code else None
+
+
+def _store(fields: dict[str, Any], number: str, observation_type: str, obx5: str) -> None:
+    code_key = _CODE_KEYS.get(number) if observation_type == "CWE" else None
+    if repetition_separator in obx5:
+        repetitions = obx5.split(repetition_separator)
+        fields[number] = [_decode_value(observation_type, v) for v in repetitions]
+        if code_key is not None:
+            fields[code_key] = [_cwe_code(v) for v in repetitions]
+        return
+    if code_key is not None:
+        code = _cwe_code(obx5)
+        if code is not None:
+            fields[code_key] = code
+    value = _decode_value(observation_type, obx5)
+    range_fields = _RANGE_FIELDS.get(number)
+    if range_fields is not None and type(value) is tuple:
+        fields[range_fields[0]], fields[range_fields[1]] = value
+    else:
+        fields[number] = value
+
+
+# --- Parsing -----------------------------------------------------------------
+
+
+def parse_obx_segments(lines: Iterable[str]) -> Iterator[ParsedVariant]:
+    """
+    Parse HL7 v2 text into one ParsedVariant per variant per message.
+
+    MSH starts a new message; FHS/BHS/BTS/FTS are skipped. In a bare stream of OBX
+    lines with no MSH (e.g. the output of stream_obx_segments), each OBX with set
+    ID 1 starts a new record. OBX lines whose OBX-3 is not a VAR concept and all
+    other segments are ignored. Variants are yielded in order of first appearance
+    as soon as their message ends.
+    """
+    concept_numbers = _CONCEPT_NUMBERS
+    variants: dict[str, ParsedVariant] = {}
+    control_id: str | None = None
+    in_message = False
+
+    for segment in iter_segments(lines):
+        segment_type = segment[:3]
+
+        if segment_type == "OBX":
+            obx = segment.split(pipe_separator, 6)
+            if len(obx) < 6:  # noqa: PLR2004 - OBX-0..OBX-5
+                continue
+            if not in_message and obx[1] == "1" and variants:
+                yield from variants.values()
+                variants = {}
+
+            obx3 = obx[3]
+            code, _, rest = obx3.partition(carat_separator)
+            number = concept_numbers.get(code) or concept_numbers.get(rest.partition(carat_separator)[0])
+            if number is None or not obx[5]:
+                continue
+
+            # OBX-4 is <variant type><identifier>[.<line>], e.g. 2a or 2a.1
+            identifier = obx[4].partition(period_separator)[0][1:]
+            variant = variants.get(identifier)
+            if variant is None:
+                variant = variants[identifier] = ParsedVariant(control_id, identifier)
+            _store(variant.fields, number, obx[2] or ObservationTypes.STRING.value, obx[5])
+
+        elif segment_type == "MSH":
+            if variants:
+                yield from variants.values()
+                variants = {}
+            msh = segment.split(pipe_separator, 10)
+            # msh[0] is "MSH" and msh[1] is MSH-2, so MSH-10 is msh[9]
+            control_id = msh[9] if len(msh) > 9 else None  # noqa: PLR2004
+            in_message = True
+
+        elif segment_type in _ENVELOPE_SEGMENTS:
+            if variants:
+                yield from variants.values()
+                variants = {}
+            control_id = None
+            in_message = False
+
+    yield from variants.values()
+
+
+def parse_hl7_file(path: Path) -> Iterator[ParsedVariant]:
+    """
+    Parse an HL7 v2 file line by line.
+
+    The file is opened with universal newlines left untranslated, so "\\r"
+    terminated segments are split by the file reader itself.
+    """
+    with path.open(newline="") as fh:
+        yield from parse_obx_segments(fh)
+
+
+def parse_hl7(source: Path | TextIO | str) -> Iterator[ParsedVariant]:
+    """Parse HL7 v2 text from a file path, an open text stream or a string."""
+    if isinstance(source, Path):
+        return parse_hl7_file(source)
+    if isinstance(source, str):
+        return parse_obx_segments(source.splitlines())
+    return parse_obx_segments(source)
+
+
+# --- Building GKS objects ----------------------------------------------------
+
+# Allele state from a simple genomic change: substitution, delins, deletion, insertion
+_G_CHANGE_STATE = re.compile(r"g\.\d+(?:_\d+)?(?:[ACGTN]+>(?P<sub>[ACGTN]+)|delins(?P<delins>[ACGTN]+)|del[ACGTN]*$|ins(?P<ins>[ACGTN]+))")
+
+_DIRECTION_BY_CLASSIFICATION = {
+    "pathogenic": "supports",
+    "likely pathogenic": "supports",
+    "benign": "disputes",
+    "likely benign": "disputes",
+}
+
+
+def _allele_state(fields: dict[str, Any]) -> str:
+    observed = fields.get(HL7V2["OBSERVED_ALLELE"])
+    if observed is not None:
+        return observed
+    genomic_change = fields.get(HL7V2["GENOMIC_DNA_CHANGE"])
+    match = _G_CHANGE_STATE.match(genomic_change) if genomic_change else None
+    if match is None:
+        msg = f"Cannot derive the allele state from {genomic_change!r}; no observed allele (527) was sent"
+        raise ValueError(msg)
+    return match["sub"] or match["delins"] or match["ins"] or ""
+
+
+def build_allele(fields: dict[str, Any]) -> "Allele":
+    """
+    Build the genomic VRS Allele of a parsed variant.
+
+    The location comes from 511 and the state from 527, or from a simple 528 change
+    (substitution, deletion, insertion or delins). OBX carries reference sequence
+    accessions but not refget digests, so the location has no sequenceReference;
+    the HGVS expressions (hgvs.g from 524 + 528, hgvs.c from 516 + 518, hgvs.p
+    from 522 + 520) identify the sequences instead.
+
+    Raises ValueError if the location or state cannot be determined.
+    """
+    from ga4gh.vrs.models import (  # noqa: PLC0415
+        Allele,
+        Expression,
+        LiteralSequenceExpression,
+        SequenceLocation,
+    )
+
+    start = fields.get(HL7V2["ALLELE_START"])
+    end = fields.get(HL7V2["ALLELE_END"])
+    if start is None or end is None:
+        msg = "Allele start/end (511) is required to build an allele"
+        raise ValueError(msg)
+
+    expressions = []
+    genomic_reference = fields.get(HL7V2["GENOMIC_REFERENCE_SEQUENCE_ID"]) or fields.get(HL7V2["CHROMOSOME"])
+    for reference, change, syntax in (
+        (genomic_reference, fields.get(HL7V2["GENOMIC_DNA_CHANGE"]), "hgvs.g"),
+        (fields.get(HL7V2["TRANSCRIPT_REFERENCE_SEQUENCE_ID"]), fields.get(HL7V2["DNA_CHANGE"]), "hgvs.c"),
+        (fields.get(HL7V2["PROTEIN_REFERENCE_SEQUENCE"]), fields.get(HL7V2["AMINO_ACID_CHANGE"]), "hgvs.p"),
+    ):
+        if reference and change:
+            expressions.append(Expression(syntax=syntax, value=f"{reference}:{change}"))
+
+    return Allele(
+        location=SequenceLocation(start=start, end=end),
+        state=LiteralSequenceExpression(sequence=_allele_state(fields)),
+        expressions=expressions or None,
+    )
+
+
+def build_categorical_variant(fields: dict[str, Any]) -> "CategoricalVariant":
+    """Wrap the allele of a parsed variant in a CategoricalVariant named by 504 (or its hgvs.g)."""
+    from ga4gh.cat_vrs.models import CategoricalVariant  # noqa: PLC0415
+
+    allele = build_allele(fields)
+    name = fields.get(HL7V2["VARIANT_NAME"]) or (allele.expressions[0].value if allele.expressions else None)
+    if not name:
+        msg = "Variant name (504) is required to build a categorical variant"
+        raise ValueError(msg)
+    return CategoricalVariant(name=name, members=[allele])
+
+
+def build_statement(
+    fields: dict[str, Any],
+    object_condition: "Condition | MappableConcept | iriReference | dict[str, Any] | str",
+) -> "Statement":
+    """
+    Build a VariantPathogenicityProposition Statement for a parsed variant.
+
+    The OBX VAR concepts say nothing about the condition, so the caller supplies it.
+    553 (Variant Classification), if present, becomes the classification and sets
+    the direction: supports for (likely) pathogenic, disputes for (likely) benign,
+    neutral otherwise.
+    """
+    from ga4gh.core.models import MappableConcept  # noqa: PLC0415
+    from ga4gh.va_spec.base.core import Statement, VariantPathogenicityProposition  # noqa: PLC0415
+
+    classification = fields.get(HL7V2["VARIANT_CLASSIFICATION"])
+    direction = _DIRECTION_BY_CLASSIFICATION.get(str(classification).lower(), "neutral")
+    return Statement(
+        proposition=VariantPathogenicityProposition(
+            subjectVariant=build_categorical_variant(fields),
+            predicate="isCausalFor",
+            objectCondition=object_condition,
+        ),
+        direction=direction,
+        classification=MappableConcept(name=classification) if classification else None,
+    )
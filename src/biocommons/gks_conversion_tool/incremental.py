@@ -0,0 +1,240 @@
+"""Incremental re-conversion backed by a persistent SQLite result store
+
+The HL7 fields convert_gks_to_hl7_v2 produces are derived from the statement's
+subjectVariant, its geneContextQualifier (514) and, when one is configured, the
+reference index (see converter.configure_reference). These rarely change when a
+statement is re-issued (e.g. for a new classification). The store keys the
+converted fields by a hash of the canonical JSON of the subjectVariant and the
+geneContextQualifier together with the fingerprint of the reference index, so on
+a re-run an unchanged variant skips conversion and only its OBX lines are
+regenerated from the stored fields. Every statement is still validated, so a
+statement is rejected or accepted no matter what the store holds.
+
+The store also remembers a digest of the OBX output of each statement id, so a
+run can emit only the statements whose output changed since the last run.
+"""
+
+import functools
+import hashlib
+import json
+import logging
+import sqlite3
+import time
+from collections.abc import Iterable
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, TextIO
+
+from biocommons.gks_conversion_tool.converter import convert_gks_to_hl7_v2, reference_fingerprint
+from biocommons.gks_conversion_tool.lean import LeanStatement
+from biocommons.gks_conversion_tool.obx_templates import generate_all_obx_for_variants_templated
+from biocommons.gks_conversion_tool.streaming import (
+    StreamStats,
+    create_segment_groups,
+    iter_converted_statements,
+    log_stats,
+    segment_terminator,
+    validate_statement,
+)
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - depends on the environment
+    orjson = None
+
+_logger = logging.getLogger(__name__)
+
+# Bump whenever convert_gks_to_hl7_v2 would produce different fields for the
+# same input; a store written with another version is emptied when opened.
+CONVERSION_VERSION = "2"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS fields (key BLOB PRIMARY KEY, hl7_fields TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS outputs (statement_id TEXT PRIMARY KEY, digest BLOB NOT NULL);
+"""
+
+
+def canonical_json(data: Any) -> bytes:
+    """Serialize with sorted keys and no whitespace, so equal objects give equal bytes."""
+    if orjson is not None:
+        return orjson.dumps(data, option=orjson.OPT_SORT_KEYS)
+    return json.dumps(data, sort_keys=True, separators=(",", ":")).encode()  # pragma: no cover
+
+
+def content_key(data: Any) -> bytes:
+    return hashlib.blake2b(canonical_json(data), digest_size=16).digest()
+
+
+def conversion_key(proposition: dict[str, Any]) -> bytes:
+    """Hash of everything convert_gks_to_hl7_v2 reads, for the configured reference index."""
+    return content_key(
+        {
+            "subjectVariant": proposition["subjectVariant"],
+            "geneContextQualifier": proposition.get("geneContextQualifier"),
+            "reference": reference_fingerprint(),
+        }
+    )
+
+
+@dataclass
+class StoreStats:
+    """What an incremental run reused and emitted."""
+
+    # conversion inputs whose fields came from the store / had to be converted
+    reused: int = 0
+    converted: int = 0
+    # statements written out / left out because their output had not changed
+    emitted: int = 0
+    unchanged: int = 0
+
+
+class ResultStore:
+    """
+    Converted HL7 fields by conversion input hash (see conversion_key), and the
+    last output digest by statement id, in one SQLite file.
+
+    Writes are committed every `commit_every` changes and on close(). Use as a
+    context manager to make sure the last batch is committed.
+    """
+
+    def __init__(self, path: Path | str, commit_every: int = 1000):
+        self.path = path
+        self.commit_every = commit_every
+        self.stats = StoreStats()
+        self._pending = 0
+        self._db = sqlite3.connect(path)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(_SCHEMA)
+        self._check_version()
+
+    def __enter__(self) -> "ResultStore":
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
+
+    def _check_version(self) -> None:
+        row = self._db.execute("SELECT value FROM meta WHERE name = 'conversion_version'").fetchone()
+        if row is not None and row[0] == CONVERSION_VERSION:
+            return
+        if row is not None:
+            _logger.info("Result store %s was written by conversion version %s; starting over", self.path, row[0])
+        with self._db:
+            self._db.execute("DELETE FROM fields")
+            self._db.execute("DELETE FROM outputs")
+            self._db.execute(
+                "INSERT OR REPLACE INTO meta (name, value) VALUES ('conversion_version', ?)", (CONVERSION_VERSION,)
+            )
+
+    def get_fields(self, key: bytes) -> dict[str, Any] | None:
+        row = self._db.execute("SELECT hl7_fields FROM fields WHERE key = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row is not None else None
+
+    def put_fields(self, key: bytes, hl7_fields: dict[str, Any]) -> None:
+        self._db.execute("INSERT OR REPLACE INTO fields (key, hl7_fields) VALUES (?, ?)", (key, json.dumps(hl7_fields)))
+        self._changed()
+
+    def output_changed(self, statement_id: str, digest: bytes) -> bool:
+        """Record `digest` as the latest output of `statement_id`; return whether it differs from the last one."""
+        row = self._db.execute("SELECT digest FROM outputs WHERE statement_id = ?", (statement_id,)).fetchone()
+        if row is not None and row[0] == digest:
+            return False
+        self._db.execute(
+            "INSERT OR REPLACE INTO outputs (statement_id, digest) VALUES (?, ?)", (statement_id, digest)
+        )
+        self._changed()
+        return True
+
+    def _changed(self) -> None:
+        self._pending += 1
+        if self._pending >= self.commit_every:
+            self.commit()
+
+    def commit(self) -> None:
+        self._db.commit()
+        self._pending = 0
+
+    def close(self) -> None:
+        self.commit()
+        self._db.close()
+
+
+def convert_with_store(
+    record: dict[str, Any] | LeanStatement, store: ResultStore, variant_identifier: str = "a"
+) -> list[str]:
+    """
+    Return the OBX segments for one Statement, reusing stored fields when its
+    subjectVariant and gene have been converted before with the same reference index.
+
+    A raw dict is validated as a full ga4gh Statement first, whether or not its
+    fields are reused, and a LeanStatement is used as is, as in
+    streaming.convert_statement_record.
+    """
+    raw = record.raw if isinstance(record, LeanStatement) else record
+    try:
+        key = conversion_key(raw["proposition"])
+    except (KeyError, TypeError, AttributeError) as e:
+        msg = "Statement has no proposition.subjectVariant"
+        raise ValueError(msg) from e
+
+    statement = record if isinstance(record, LeanStatement) else validate_statement(record)
+    hl7_fields = store.get_fields(key)
+    if hl7_fields is None:
+        hl7_fields = convert_gks_to_hl7_v2(statement)
+        store.put_fields(key, hl7_fields)
+        store.stats.converted += 1
+    else:
+        store.stats.reused += 1
+    return generate_all_obx_for_variants_templated(create_segment_groups(hl7_fields, variant_identifier))
+
+
+def stream_obx_segments_incremental(
+    records: Iterable[Any],
+    out: TextIO,
+    store: ResultStore,
+    changed_only: bool = False,
+    errors_out: TextIO | None = None,
+    lean: bool = False,
+) -> StreamStats:
+    """
+    Like streaming.stream_obx_segments, reusing converted fields from `store`.
+
+    With `changed_only`, a statement is written only if its id is new or its OBX
+    output differs from what was emitted for that id last time. Statements
+    without an id are always written. A statement that fails is skipped and
+    reported as in streaming.stream_obx_segments.
+    """
+    stats = StreamStats()
+    start = time.perf_counter()
+
+    convert = functools.partial(convert_with_store, store=store)
+    for _, statement_id, segments in iter_converted_statements(records, stats, errors_out, lean, convert):
+        if statement_id is not None:
+            digest = hashlib.blake2b("\r".join(segments).encode(), digest_size=16).digest()
+            changed = store.output_changed(statement_id, digest)
+            if changed_only and not changed:
+                store.stats.unchanged += 1
+                continue
+        for segment in segments:
+            out.write(segment)
+            out.write(segment_terminator)
+        stats.segments += len(segments)
+        store.stats.emitted += 1
+
+    store.commit()
+    stats.elapsed = time.perf_counter() - start
+    log_stats(stats)
+    log_store_stats(store.stats)
+    return stats
+
+
+def log_store_stats(stats: StoreStats) -> None:
+    _logger.info(
+        "Result store: %d variants reused, %d converted; %d statements emitted, %d unchanged",
+        stats.reused,
+        stats.converted,
+        stats.emitted,
+        stats.unchanged,
+    )
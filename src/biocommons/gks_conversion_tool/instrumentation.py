@@ -0,0 +1,266 @@
+"""Opt-in per-stage timing and error metrics for the conversion hot path
+
+Functions on the hot path are registered with the @instrumented(stage) decorator,
+which returns them unchanged. Nothing is timed until enable() is called: it then
+replaces every reference to a registered function in the loaded biocommons
+modules with a timing wrapper, and disable() puts the originals back. While
+disabled the code runs exactly as if this module did not exist.
+
+For each stage a latency histogram (Prometheus-style cumulative buckets), a call
+count and error tallies by VAR concept are kept. snapshot() returns them as a
+plain dict; to_json() and to_prometheus() format it for export.
+
+References held outside module globals (e.g. in dicts or closures) are not
+rewired, and neither are modules imported after enable().
+"""
+
+import cProfile
+import functools
+import json
+import pstats
+import re
+import sys
+import time
+from bisect import bisect_left
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from pathlib import Path
+from types import FunctionType
+from typing import Any
+
+# Histogram bucket upper bounds, in seconds
+BUCKETS: tuple[float, ...] = (
+    1e-6, 2.5e-6, 5e-6, 1e-5, 2.5e-5, 5e-5, 1e-4, 2.5e-4, 5e-4,
+    1e-3, 2.5e-3, 5e-3, 1e-2, 2.5e-2, 5e-2, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)  # fmt: skip
+
+_VAR_CONCEPT = re.compile(r"VARCONCEPT\d+")
+
+# stage -> functions registered under it
+_registry: dict[str, list[Callable]] = {}
+
+# original function -> its timing wrapper, while enabled
+_wrappers: dict[Callable, Callable] = {}
+
+
+class StageMetrics:
+    """Latency histogram, call count and error tallies of one stage."""
+
+    __slots__ = ("bucket_counts", "count", "errors", "total")
+
+    def __init__(self):
+        self.clear()
+
+    def clear(self) -> None:
+        # one count per bucket in BUCKETS plus one for +Inf; not cumulative
+        self.bucket_counts = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.total = 0.0
+        # VAR concept (or "unknown") -> errors
+        self.errors: dict[str, int] = {}
+
+    def observe(self, seconds: float) -> None:
+        self.bucket_counts[bisect_left(BUCKETS, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+
+    def count_error(self, var_concept: str) -> None:
+        self.errors[var_concept] = self.errors.get(var_concept, 0) + 1
+
+
+_stages: dict[str, StageMetrics] = {}
+
+
+def instrumented(stage: str) -> Callable[[Callable], Callable]:
+    """Register a function to be timed under `stage` while instrumentation is enabled."""
+
+    def register(func: Callable) -> Callable:
+        _registry.setdefault(stage, []).append(func)
+        return func
+
+    return register
+
+
+def enabled() -> bool:
+    return bool(_wrappers)
+
+
+def enable() -> None:
+    """Start timing every registered function. Metrics recorded so far are kept."""
+    if _wrappers:
+        return
+    for stage, funcs in _registry.items():
+        metrics = _stages.setdefault(stage, StageMetrics())
+        for func in funcs:
+            _wrappers[func] = _timed(func, metrics)
+    _rebind(_wrappers)
+
+
+def disable() -> None:
+    """Restore the original functions. Recorded metrics are kept until reset()."""
+    if not _wrappers:
+        return
+    originals = {wrapper: func for func, wrapper in _wrappers.items()}
+    _wrappers.clear()
+    _rebind(originals)
+
+
+def reset() -> None:
+    for metrics in _stages.values():
+        metrics.clear()
+
+
+def _timed(func: Callable, metrics: StageMetrics) -> Callable:
+    perf_counter = time.perf_counter
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        start = perf_counter()
+        try:
+            return func(*args, **kwargs)
+        except Exception as e:
+            metrics.count_error(_var_concept_of(args, kwargs, e))
+            raise
+        finally:
+            metrics.observe(perf_counter() - start)
+
+    return wrapper
+
+
+def _var_concept_of(args: tuple, kwargs: dict, error: Exception) -> str:
+    """
+    The VAR concept an error is about: from the HL7 field of a ConversionError,
+    a segment group argument, or else the message.
+    """
+    hl7_field = getattr(error, "field", None)
+    if hl7_field:
+        return "VARCONCEPT" + hl7_field.partition(".")[0]
+    for arg in (*args, *kwargs.values()):
+        concept = getattr(arg, "segment_identifier", None)
+        if concept is not None:
+            return concept.name
+    match = _VAR_CONCEPT.search(str(error))
+    return match.group() if match else "unknown"
+
+
+def _rebind(replacements: dict[Callable, Callable]) -> None:
+    """Replace module-level references to the keys of `replacements` in every loaded biocommons module."""
+    for name, module in list(sys.modules.items()):
+        if module is None or not name.startswith("biocommons"):
+            continue
+        namespace = vars(module)
+        for attr, value in list(namespace.items()):
+            if type(value) is FunctionType and value in replacements:
+                namespace[attr] = replacements[value]
+
+
+# --- Export ------------------------------------------------------------------
+
+
+def snapshot() -> dict[str, dict[str, Any]]:
+    """
+    Return the recorded metrics by stage: count, sum (seconds), cumulative bucket
+    counts keyed by upper bound ("+Inf" last) and errors by VAR concept.
+    """
+    result = {}
+    for stage, metrics in sorted(_stages.items()):
+        cumulative = 0
+        buckets = {}
+        for bound, count in zip((*map(str, BUCKETS), "+Inf"), metrics.bucket_counts, strict=True):
+            cumulative += count
+            buckets[bound] = cumulative
+        result[stage] = {
+            "count": metrics.count,
+            "sum": metrics.total,
+            "buckets": buckets,
+            "errors": dict(metrics.errors),
+        }
+    return result
+
+
+def merge(other: dict[str, dict[str, Any]]) -> None:
+    """Add a snapshot (e.g. from a worker process) to the metrics recorded here."""
+    for stage, data in other.items():
+        metrics = _stages.setdefault(stage, StageMetrics())
+        metrics.count += data["count"]
+        metrics.total += data["sum"]
+        previous = 0
+        for i, cumulative in enumerate(data["buckets"].values()):
+            metrics.bucket_counts[i] += cumulative - previous
+            previous = cumulative
+        for var_concept, count in data["errors"].items():
+            metrics.errors[var_concept] = metrics.errors.get(var_concept, 0) + count
+
+
+def to_json(data: dict[str, dict[str, Any]] | None = None) -> str:
+    return json.dumps(snapshot() if data is None else data, indent=2)
+
+
+def to_prometheus(data: dict[str, dict[str, Any]] | None = None, prefix: str = "gks_conversion") -> str:
+    """Format a snapshot in the Prometheus text exposition format."""
+    data = snapshot() if data is None else data
+    lines = [
+        f"# HELP {prefix}_stage_duration_seconds Time spent in each conversion stage.",
+        f"# TYPE {prefix}_stage_duration_seconds histogram",
+    ]
+    for stage, metrics in data.items():
+        for bound, count in metrics["buckets"].items():
+            lines.append(f'{prefix}_stage_duration_seconds_bucket{{stage="{stage}",le="{bound}"}} {count}')
+        lines.append(f'{prefix}_stage_duration_seconds_sum{{stage="{stage}"}} {metrics["sum"]}')
+        lines.append(f'{prefix}_stage_duration_seconds_count{{stage="{stage}"}} {metrics["count"]}')
+    lines += [
+        f"# HELP {prefix}_stage_errors_total Errors raised in each conversion stage, by VAR concept.",
+        f"# TYPE {prefix}_stage_errors_total counter",
+    ]
+    for stage, metrics in data.items():
+        for var_concept, count in metrics["errors"].items():
+            lines.append(f'{prefix}_stage_errors_total{{stage="{stage}",var_concept="{var_concept}"}} {count}')
+    return "\n".join(lines) + "\n"
+
+
+def write_snapshot(path: Path) -> None:
+    """Write the metrics to `path`, as Prometheus text if it ends in .prom and as JSON otherwise."""
+    path.write_text(to_prometheus() if path.suffix == ".prom" else to_json())
+
+
+# --- Profiling ---------------------------------------------------------------
+
+
+@contextmanager
+def profile_batch(output: Path | None = None, profiler: str = "cprofile") -> Iterator[Any]:
+    """
+    Profile the code in the with block, e.g. the conversion of one batch.
+
+    With profiler="cprofile" the stats are dumped to `output` (readable with
+    pstats or snakeviz) or, without an output, printed sorted by cumulative time.
+    With profiler="pyinstrument" (a sampling profiler; pip install pyinstrument)
+    an HTML report is written to `output`, or a text report printed.
+    """
+    if profiler == "pyinstrument":
+        from pyinstrument import Profiler  # noqa: PLC0415 - optional dependency
+
+        sampler = Profiler()
+        sampler.start()
+        try:
+            yield sampler
+        finally:
+            sampler.stop()
+            if output is not None:
+                output.write_text(sampler.output_html())
+            else:
+                print(sampler.output_text(), file=sys.stderr)
+        return
+
+    if profiler != "cprofile":
+        msg = f"Unknown profiler: {profiler!r}"
+        raise ValueError(msg)
+    tracer = cProfile.Profile()
+    tracer.enable()
+    try:
+        yield tracer
+    finally:
+        tracer.disable()
+        if output is not None:
+            tracer.dump_stats(output)
+        else:
+            pstats.Stats(tracer, stream=sys.stderr).sort_stats("cumulative").print_stats(25)
@@ -0,0 +1,188 @@
+"""Lean ingestion of VA-Spec Statements
+
+Full pydantic validation of a Statement (Statement.model_validate_json) builds
+and checks every object in it, while convert_gks_to_hl7_v2 only reads a handful
+of fields. The classes here are a minimal read-only view with the same attribute
+names as the ga4gh models for just those fields, so the converter accepts either.
+
+Decoding uses orjson when it is installed (pip install 'biocommons-example[fast]')
+and falls back to the standard json module otherwise.
+"""
+
+import json
+import mmap
+from collections.abc import Iterator
+from pathlib import Path
+from typing import Any, NamedTuple
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - depends on the environment
+    orjson = None
+
+if orjson is not None:
+    loads = orjson.loads
+else:  # pragma: no cover - depends on the environment
+
+    def loads(data: bytes | bytearray | memoryview | str) -> Any:
+        if isinstance(data, memoryview):
+            data = data.tobytes()
+        return json.loads(data)
+
+
+class LeanExpression(NamedTuple):
+    syntax: str
+    value: str
+
+
+class LeanSequenceReference(NamedTuple):
+    moleculeType: str | None  # noqa: N815 - mirrors the VRS attribute name
+    refgetAccession: str | None  # noqa: N815
+
+
+class LeanSequenceLocation(NamedTuple):
+    sequenceReference: LeanSequenceReference | None  # noqa: N815
+    start: Any
+    end: Any
+
+
+class LeanAllele(NamedTuple):
+    """An Allele, or a CopyNumberCount/CopyNumberChange with their `copies`/`copyChange`."""
+
+    id: str | None
+    type: str | None
+    location: LeanSequenceLocation | None
+    expressions: list[LeanExpression]
+    copies: Any
+    copyChange: str | None  # noqa: N815
+
+
+class LeanCategoricalVariant(NamedTuple):
+    name: str | None
+    members: list[LeanAllele]
+
+
+class LeanMappableConcept(NamedTuple):
+    name: str | None
+
+
+class LeanProposition(NamedTuple):
+    subjectVariant: LeanCategoricalVariant  # noqa: N815
+    geneContextQualifier: LeanMappableConcept | None  # noqa: N815
+
+
+class LeanStatement:
+    """
+    The fields of a Statement that the converter reads.
+
+    The decoded JSON is kept so the full ga4gh Statement can be built on demand
+    with to_statement(), e.g. to check a statement that failed in lean mode.
+    """
+
+    __slots__ = ("id", "proposition", "raw")
+
+    def __init__(self, raw: dict[str, Any]):
+        self.raw = raw
+        self.id = raw.get("id")
+        try:
+            proposition = raw["proposition"]
+            subject_variant = proposition["subjectVariant"]
+        except (KeyError, TypeError) as e:
+            msg = "Statement has no proposition.subjectVariant"
+            raise ValueError(msg) from e
+        try:
+            gene = proposition.get("geneContextQualifier")
+            self.proposition = LeanProposition(
+                LeanCategoricalVariant(
+                    name=subject_variant.get("name"),
+                    members=[_lean_allele(member) for member in subject_variant.get("members") or ()],
+                ),
+                LeanMappableConcept(gene.get("name")) if type(gene) is dict else None,
+            )
+        except (AttributeError, TypeError) as e:
+            # an object where the JSON has another value, e.g. a member or expression that is a string
+            msg = f"Statement has a malformed proposition: {e}"
+            raise ValueError(msg) from e
+
+    def to_statement(self):
+        """Validate the original JSON as a full ga4gh Statement."""
+        # lean input loads the VA-Spec models only if it has to
+        from ga4gh.va_spec.base.core import Statement  # noqa: PLC0415
+
+        return Statement.model_validate(self.raw)
+
+
+# tuple.__new__ skips the Python-level __new__ that NamedTuple generates; this runs once per member
+_new = tuple.__new__
+
+
+def _lean_allele(member: dict[str, Any]) -> LeanAllele:
+    location = member.get("location")
+    if type(location) is dict:
+        seq_ref = location.get("sequenceReference")
+        location = _new(
+            LeanSequenceLocation,
+            (
+                _new(LeanSequenceReference, (seq_ref.get("moleculeType"), seq_ref.get("refgetAccession")))
+                if type(seq_ref) is dict
+                else None,
+                location.get("start"),
+                location.get("end"),
+            ),
+        )
+    else:
+        # an IRI reference or missing; the converter treats both as "no location"
+        location = None
+    expressions = member.get("expressions")
+    return _new(
+        LeanAllele,
+        (
+            member.get("id"),
+            member.get("type"),
+            location,
+            [_new(LeanExpression, (e.get("syntax"), e.get("value"))) for e in expressions] if expressions else [],
+            member.get("copies"),
+            member.get("copyChange"),
+        ),
+    )
+
+
+def load_lean_statement(data: bytes | bytearray | memoryview | str | dict[str, Any]) -> LeanStatement:
+    """Decode (if needed) one Statement into a LeanStatement."""
+    return LeanStatement(data if isinstance(data, dict) else loads(data))
+
+
+_WHITESPACE = frozenset(b" \t\r")
+
+
+def iter_mmap_lines(path: Path) -> Iterator[memoryview]:
+    """
+    Yield the non-blank lines of an NDJSON file as memoryviews into a read-only
+    memory map, so no line is copied before it is decoded.
+
+    Each view is only valid until the next one is requested.
+    """
+    with path.open("rb") as fh:
+        if fh.seek(0, 2) == 0:
+            return
+        with mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            view = memoryview(mm)
+            try:
+                start = 0
+                size = len(mm)
+                while start < size:
+                    end = mm.find(b"\n", start)
+                    if end == -1:
+                        end = size
+                    line_start = start
+                    start = end + 1
+                    # JSON lines start with "{"; only look closer at lines that start with whitespace
+                    if end == line_start or (mm[line_start] in _WHITESPACE and not mm[line_start:end].strip()):
+                        continue
+                    line = view[line_start:end]
+                    try:
+                        yield line
+                    finally:
+                        line.release()
+            finally:
+                view.release()
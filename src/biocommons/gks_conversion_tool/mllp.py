@@ -0,0 +1,301 @@
+"""Asyncio MLLP client for sending HL7 v2 messages to an interface engine
+
+Messages are framed as <VT> message <FS><CR> (the Minimal Lower Layer Protocol).
+MLLPClient keeps a pool of persistent connections. Several messages can be in
+flight on each connection at once (pipelining); each ACK is matched to its
+message by MSA-2, the message control ID. The number of unacknowledged messages
+is bounded, so a producer calling send() waits whenever the receiver falls behind.
+"""
+
+import asyncio
+import itertools
+import logging
+from collections.abc import AsyncIterable, Iterable
+from dataclasses import dataclass
+
+from biocommons.gks_conversion_tool.oru import (
+    message_control_id,
+    pipe_separator,
+    segment_terminator,
+)
+
+_logger = logging.getLogger(__name__)
+
+START_BLOCK: bytes = b"\x0b"
+END_BLOCK: bytes = b"\x1c\r"
+
+# MSA-1 acknowledgment codes (original and enhanced mode)
+ACCEPT_CODES = frozenset({"AA", "CA"})
+# Errors that may succeed if the message is sent again; rejects (AR/CR) are final
+RETRYABLE_CODES = frozenset({"AE", "CE"})
+
+
+class MLLPError(Exception):
+    """A message could not be delivered."""
+
+
+class MLLPNackError(MLLPError):
+    """The receiver answered with a negative acknowledgment."""
+
+    def __init__(self, ack: "Ack"):
+        super().__init__(f"Message {ack.control_id} was not accepted: {ack.code} {ack.text}".rstrip())
+        self.ack = ack
+
+
+@dataclass(frozen=True)
+class Ack:
+    control_id: str
+    code: str
+    text: str = ""
+
+    @property
+    def accepted(self) -> bool:
+        return self.code in ACCEPT_CODES
+
+
+# --- Framing -----------------------------------------------------------------
+
+
+def encode_frame(message: str) -> bytes:
+    return START_BLOCK + message.encode() + END_BLOCK
+
+
+async def read_frame(reader: asyncio.StreamReader) -> str:
+    """
+    Read one MLLP frame and return the message inside it.
+    Raises asyncio.IncompleteReadError when the connection closes.
+    """
+    data = await reader.readuntil(END_BLOCK)
+    start = data.find(START_BLOCK)
+    if start == -1:
+        msg = "MLLP frame without a start block"
+        raise MLLPError(msg)
+    return data[start + 1 : -len(END_BLOCK)].decode()
+
+
+def parse_ack(message: str) -> Ack:
+    """Extract MSA-1 (code), MSA-2 (control id) and MSA-3 (text) from an ACK message."""
+    for segment in message.split(segment_terminator):
+        if segment.startswith("MSA" + pipe_separator):
+            fields = segment.split(pipe_separator)
+            fields += [""] * (4 - len(fields))
+            return Ack(control_id=fields[2], code=fields[1], text=fields[3])
+    msg = "Acknowledgment has no MSA segment"
+    raise MLLPError(msg)
+
+
+# --- Connections -------------------------------------------------------------
+
+
+class MLLPConnection:
+    """
+    One persistent connection. send() may be called concurrently: frames are
+    written as they come and a background task resolves each caller's future
+    when the ACK with its control ID arrives.
+    """
+
+    def __init__(self, host: str, port: int, ack_timeout: float = 30.0):
+        self.host = host
+        self.port = port
+        self.ack_timeout = ack_timeout
+        self._reader: asyncio.StreamReader | None = None
+        self._writer: asyncio.StreamWriter | None = None
+        self._ack_task: asyncio.Task | None = None
+        self._pending: dict[str, asyncio.Future[Ack]] = {}
+        self._connect_lock = asyncio.Lock()
+        self._write_lock = asyncio.Lock()
+
+    @property
+    def connected(self) -> bool:
+        return self._writer is not None and not self._writer.is_closing()
+
+    async def connect(self) -> None:
+        self._reader, self._writer = await asyncio.open_connection(self.host, self.port)
+        self._ack_task = asyncio.create_task(self._read_acks())
+
+    async def send(self, message: str, control_id: str | None = None) -> Ack:
+        if not self.connected:
+            async with self._connect_lock:
+                if not self.connected:
+                    await self.connect()
+        control_id = control_id or message_control_id(message)
+        if control_id in self._pending:
+            msg = f"Message {control_id} is already in flight on this connection"
+            raise MLLPError(msg)
+
+        future: asyncio.Future[Ack] = asyncio.get_running_loop().create_future()
+        self._pending[control_id] = future
+        try:
+            async with self._write_lock:
+                # the ACK reader drops the writer if the connection closed meanwhile
+                writer = self._writer
+                if writer is None:
+                    msg = f"Connection to {self.host}:{self.port} closed"
+                    raise MLLPError(msg)
+                writer.write(encode_frame(message))
+                await writer.drain()
+            return await asyncio.wait_for(future, self.ack_timeout)
+        finally:
+            self._pending.pop(control_id, None)
+
+    async def _read_acks(self) -> None:
+        error: BaseException = MLLPError(f"Connection to {self.host}:{self.port} closed")
+        try:
+            while True:
+                ack = parse_ack(await read_frame(self._reader))
+                future = self._pending.get(ack.control_id)
+                if future is None or future.done():
+                    _logger.warning("Unexpected acknowledgment for %s", ack.control_id)
+                    continue
+                future.set_result(ack)
+        except asyncio.CancelledError:
+            raise
+        except (OSError, asyncio.IncompleteReadError, MLLPError) as e:
+            error = e
+        finally:
+            # whatever is still waiting will not get an ACK on this connection
+            for future in self._pending.values():
+                if not future.done():
+                    future.set_exception(MLLPError(f"Connection lost: {error}"))
+            self._close_writer()
+
+    def _close_writer(self) -> None:
+        if self._writer is not None:
+            self._writer.close()
+        self._writer = None
+
+    async def close(self) -> None:
+        if self._ack_task is not None:
+            self._ack_task.cancel()
+            await asyncio.gather(self._ack_task, return_exceptions=True)
+            self._ack_task = None
+        writer = self._writer
+        self._close_writer()
+        if writer is not None:
+            await asyncio.gather(writer.wait_closed(), return_exceptions=True)
+
+
+# --- Client ------------------------------------------------------------------
+
+
+@dataclass
+class SendStats:
+    sent: int = 0
+    retries: int = 0
+    failed: int = 0
+
+
+class MLLPClient:
+    """
+    A pool of `connections` MLLP connections to one receiver.
+
+    At most `max_in_flight` messages are unacknowledged at any time across the
+    pool. A message whose send fails with a connection error, ACK timeout or a
+    retryable NACK (AE/CE) is sent again, up to `max_attempts` times (at least
+    1), waiting backoff * 2**attempt seconds between attempts.
+
+    Use as an async context manager:
+
+        async with MLLPClient("localhost", 2575) as client:
+            await client.send(message)
+    """
+
+    def __init__(
+        self,
+        host: str,
+        port: int,
+        connections: int = 2,
+        max_in_flight: int = 16,
+        max_attempts: int = 3,
+        backoff: float = 0.5,
+        ack_timeout: float = 30.0,
+    ):
+        if max_attempts < 1:
+            msg = f"max_attempts must be at least 1, got {max_attempts}"
+            raise ValueError(msg)
+        self.host = host
+        self.port = port
+        self.max_in_flight = max_in_flight
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.stats = SendStats()
+        self._connections = [MLLPConnection(host, port, ack_timeout) for _ in range(connections)]
+        self._next_connection = itertools.cycle(self._connections)
+        self._in_flight = asyncio.Semaphore(max_in_flight)
+
+    async def __aenter__(self) -> "MLLPClient":
+        return self
+
+    async def __aexit__(self, *exc_info: object) -> None:
+        await self.close()
+
+    async def close(self) -> None:
+        await asyncio.gather(*(connection.close() for connection in self._connections))
+
+    async def send(self, message: str, control_id: str | None = None) -> Ack:
+        """
+        Send one message and wait for it to be accepted.
+
+        Waits first if max_in_flight messages are already unacknowledged.
+        Raises MLLPNackError on a reject or when a retryable NACK outlasts the
+        attempts, and MLLPError when the message could not be delivered at all.
+        """
+        control_id = control_id or message_control_id(message)
+        async with self._in_flight:
+            for attempt in range(self.max_attempts):
+                if attempt:
+                    self.stats.retries += 1
+                    await asyncio.sleep(self.backoff * 2 ** (attempt - 1))
+                connection = next(self._next_connection)
+                try:
+                    ack = await connection.send(message, control_id)
+                except (OSError, asyncio.TimeoutError, MLLPError) as e:
+                    _logger.warning("Sending %s failed (attempt %d): %s", control_id, attempt + 1, e)
+                    error: MLLPError = e if isinstance(e, MLLPError) else MLLPError(str(e) or type(e).__name__)
+                    await connection.close()
+                    continue
+                if ack.accepted:
+                    self.stats.sent += 1
+                    return ack
+                error = MLLPNackError(ack)
+                if ack.code not in RETRYABLE_CODES:
+                    break
+            self.stats.failed += 1
+            raise error
+
+    async def send_all(self, messages: Iterable[str] | AsyncIterable[str]) -> SendStats:
+        """
+        Send every message, pipelined up to max_in_flight at a time.
+
+        The messages are pulled from the iterable only as capacity frees up, so a
+        lazy producer is throttled to the receiver's pace. Failures are logged and
+        counted in the returned stats rather than raised.
+        """
+        capacity = asyncio.Semaphore(self.max_in_flight)
+        tasks: set[asyncio.Task] = set()
+
+        async def send_one(message: str) -> None:
+            try:
+                await self.send(message)
+            except MLLPError as e:
+                # the error says why; a traceback would only show the retry loop
+                _logger.error("Giving up on message %s: %s", message_control_id(message), e)  # noqa: TRY400
+            finally:
+                capacity.release()
+
+        async def dispatch(message: str) -> None:
+            await capacity.acquire()
+            task = asyncio.create_task(send_one(message))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+
+        if isinstance(messages, AsyncIterable):
+            async for message in messages:
+                await dispatch(message)
+        else:
+            for message in messages:
+                await dispatch(message)
+
+        if tasks:
+            await asyncio.gather(*tasks)
+        return self.stats
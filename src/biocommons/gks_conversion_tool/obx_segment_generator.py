@@ -1,4 +1,17 @@
-from models import *
+from biocommons.gks_conversion_tool.escaping import escape
+from biocommons.gks_conversion_tool.instrumentation import instrumented
+from biocommons.models import (
+    OBXSegmentBase,
+    OBXSegmentCWE,
+    OBXSegmentCWELite,
+    OBXSegmentGroup,
+    OBXSegmentNM,
+    OBXSegmentNMLite,
+    OBXSegmentNR,
+    OBXSegmentNRLite,
+    OBXSegmentST,
+    OBXSegmentSTLite,
+)
 
 pipe_separator: str = "|"
 
@@ -13,6 +26,7 @@ def print_obx_segments(segment_groups: list[OBXSegmentGroup]):
         print(segment)
 
 
+@instrumented("generate_obx")
 def generate_all_obx_for_variants(segment_groups: list[OBXSegmentGroup]) -> list[str]:
     '''Generates all the OBX segments for a variant given a list of segment groups'''
     all_segments: list[str] = []
@@ -46,6 +60,7 @@ def generate_obx_segments(segment_group: OBXSegmentGroup, current_line_number: i
     return all_final_segments
 
 
+@instrumented("generate_obx_segment")
 def generate_obx_segment(segment_group: OBXSegmentGroup, segment_line: OBXSegmentBase, segment_array: list[str], line_number: int) -> str:
     '''Generates a single OBX segment for one member of the OBXSegmentGroup'''
     # Line number
@@ -62,7 +77,7 @@ def generate_obx_segment(segment_group: OBXSegmentGroup, segment_line: OBXSegmen
 
 def generate_obx3(segment_group: OBXSegmentGroup) -> str:
     '''Generates the OBX-3 value which details the VAR concept and its name'''
-    return str(segment_group.segment_identifier.name) + carat_separator + str(segment_group.segment_identifier.value) + carat_separator + segment_group.segment_identifier_system
+    return str(segment_group.segment_identifier.name) + carat_separator + escape(str(segment_group.segment_identifier.value)) + carat_separator + escape(segment_group.segment_identifier_system)
 
 
 def generate_obx4(segment_group: OBXSegmentGroup, segment: OBXSegmentBase) -> str:
@@ -73,19 +88,20 @@ def generate_obx4(segment_group: OBXSegmentGroup, segment: OBXSegmentBase) -> st
 
 
 def generate_obx5(segment: OBXSegmentBase) -> str:
-    '''Generates OBX-5 which is the actual value being sent. Each data type will be handled slightly differently'''
-    if isinstance(segment, OBXSegmentST):
-        return segment.value
-    elif isinstance(segment, OBXSegmentNM):
+    '''Generates OBX-5 which is the actual value being sent. Each data type will be handled slightly differently.
+    Text values are escaped (see escaping.escape) so that delimiters inside them cannot break the segment'''
+    if isinstance(segment, (OBXSegmentST, OBXSegmentSTLite)):
+        return escape(segment.value)
+    if isinstance(segment, (OBXSegmentNM, OBXSegmentNMLite)):
         return str(segment.value)
-    elif isinstance(segment, OBXSegmentNR):
+    if isinstance(segment, (OBXSegmentNR, OBXSegmentNRLite)):
         return str(segment.lower_bound) + carat_separator + str(segment.upper_bound)
-    elif isinstance(segment, OBXSegmentCWE):
+    if isinstance(segment, (OBXSegmentCWE, OBXSegmentCWELite)):
         if all(value is None for value in (segment.code, segment.label, segment.coding_system)):
-            raise ValueError("Codeable concepts must have either a code and coding system or a label")
-        elif (segment.code is None or segment.coding_system is None) and segment.label is not None:
-            return carat_separator + segment.label
-        else:
-            return segment.code + carat_separator + (segment.label if segment.label is not None else "") + carat_separator + segment.coding_system  
-    else:
-        raise ValueError("Segment is not an instance of any supported segments")
\ No newline at end of file
+            msg = "Codeable concepts must have either a code and coding system or a label"
+            raise ValueError(msg)
+        if (segment.code is None or segment.coding_system is None) and segment.label is not None:
+            return carat_separator + escape(segment.label)
+        return escape(segment.code) + carat_separator + (escape(segment.label) if segment.label is not None else "") + carat_separator + escape(segment.coding_system)
+    msg = "Segment is not an instance of any supported segments"
+    raise ValueError(msg)
\ No newline at end of file
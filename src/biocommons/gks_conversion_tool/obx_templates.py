@@ -0,0 +1,193 @@
+"""Precompiled OBX segment templates
+
+generate_obx_segments rebuilds every field of every OBX line. Most of a line is
+fixed by its group though: OBX-2 and OBX-3 depend only on the observation type,
+VAR concept and coding system, and OBX-6 to OBX-21 are always empty. A template
+holds those fixed parts as ready-made strings, so a line only needs OBX-1, OBX-4
+and OBX-5 filled in. Text in OBX-3 and OBX-5 is escaped as in generate_obx5.
+"""
+
+from collections.abc import Callable
+from dataclasses import dataclass
+from functools import cache
+from typing import TextIO
+
+from biocommons.gks_conversion_tool.escaping import escape, needs_escaping_except_components
+from biocommons.gks_conversion_tool.instrumentation import instrumented
+from biocommons.gks_conversion_tool.obx_segment_generator import (
+    carat_separator,
+    generate_obx5,
+    period_separator,
+    pipe_separator,
+)
+from biocommons.gks_conversion_tool.oru import segment_terminator
+from biocommons.models import (
+    ObservationTypes,
+    OBXSegmentBase,
+    OBXSegmentCWE,
+    OBXSegmentCWELite,
+    OBXSegmentGroup,
+    OBXSegmentNM,
+    OBXSegmentNMLite,
+    OBXSegmentNR,
+    OBXSegmentNRLite,
+    OBXSegmentST,
+    OBXSegmentSTLite,
+    VARConcepts,
+)
+
+# generate_obx_segments joins 22 fields, of which only OBX-0..OBX-5 are set
+OBX_FIELD_COUNT: int = 22
+
+
+@dataclass(frozen=True)
+class OBXTemplate:
+    """The constant parts of every OBX line in a group."""
+
+    # "OBX|"
+    prefix: str
+
+    # "|<OBX-2>|<OBX-3>|"
+    middle: str
+
+    # the separators in front of the empty OBX-6..OBX-21
+    suffix: str
+
+
+@cache
+def get_obx_template(
+    segment_type: str,
+    observation_type: ObservationTypes,
+    segment_identifier: VARConcepts,
+    segment_identifier_system: str,
+) -> OBXTemplate:
+    """Return the (cached) template for one combination of OBX-0, OBX-2 and OBX-3."""
+    obx3 = (
+        str(segment_identifier.name)
+        + carat_separator
+        + escape(str(segment_identifier.value))
+        + carat_separator
+        + escape(segment_identifier_system)
+    )
+    return OBXTemplate(
+        prefix=segment_type + pipe_separator,
+        middle=pipe_separator + str(observation_type.value) + pipe_separator + obx3 + pipe_separator,
+        suffix=pipe_separator * (OBX_FIELD_COUNT - 6),
+    )
+
+
+def _cwe_obx5(segment: OBXSegmentCWE) -> str:
+    code = segment.code
+    label = segment.label
+    coding_system = segment.coding_system
+    if code is None or coding_system is None:
+        if label is not None:
+            return carat_separator + escape(label)
+        if code is None and coding_system is None:
+            msg = "Codeable concepts must have either a code and coding system or a label"
+            raise ValueError(msg)
+    obx5 = code + carat_separator + (label if label is not None else "") + carat_separator + coding_system
+    # one check of the joined components instead of one per component
+    if obx5.count(carat_separator) == 2 and not needs_escaping_except_components(obx5):  # noqa: PLR2004
+        return obx5
+    return escape(code) + carat_separator + (escape(label) if label is not None else "") + carat_separator + escape(coding_system)
+
+
+# OBX-5 by exact segment class; the same rules as generate_obx5 without its isinstance chain
+def _st_obx5(segment: OBXSegmentST) -> str:
+    return escape(segment.value)
+
+
+def _nm_obx5(segment: OBXSegmentNM) -> str:
+    return str(segment.value)
+
+
+def _nr_obx5(segment: OBXSegmentNR) -> str:
+    return str(segment.lower_bound) + carat_separator + str(segment.upper_bound)
+
+
+_OBX5_FORMATTERS: dict[type, Callable[[OBXSegmentBase], str]] = {
+    OBXSegmentST: _st_obx5,
+    OBXSegmentSTLite: _st_obx5,
+    OBXSegmentNM: _nm_obx5,
+    OBXSegmentNMLite: _nm_obx5,
+    OBXSegmentNR: _nr_obx5,
+    OBXSegmentNRLite: _nr_obx5,
+    OBXSegmentCWE: _cwe_obx5,
+    OBXSegmentCWELite: _cwe_obx5,
+}
+
+
+def format_obx5(segment: OBXSegmentBase) -> str:
+    """Same result as obx_segment_generator.generate_obx5, dispatched by segment class."""
+    formatter = _OBX5_FORMATTERS.get(type(segment))
+    return formatter(segment) if formatter is not None else generate_obx5(segment)
+
+
+def template_for_group(segment_group: OBXSegmentGroup) -> OBXTemplate:
+    return get_obx_template(
+        segment_group.segment_type,
+        segment_group.observation_type,
+        segment_group.segment_identifier,
+        segment_group.segment_identifier_system,
+    )
+
+
+@instrumented("generate_obx_templated")
+def generate_all_obx_for_variants_templated(segment_groups: list[OBXSegmentGroup]) -> list[str]:
+    """
+    Template-based equivalent of obx_segment_generator.generate_all_obx_for_variants.
+
+    Produces identical strings.
+    """
+    all_segments: list[str] = []
+    line_number = 1
+
+    for segment_group in segment_groups:
+        template = template_for_group(segment_group)
+        head = template.prefix
+        middle = template.middle
+        suffix = template.suffix
+        obx4_base = str(segment_group.variant_type) + segment_group.variant_identifier
+
+        for segment in segment_group.segments:
+            line_id = segment.variant_identifier_line
+            obx4 = obx4_base if line_id is None else obx4_base + period_separator + line_id
+            all_segments.append(
+                head + str(line_number) + middle + obx4 + pipe_separator + format_obx5(segment) + suffix
+            )
+            line_number += 1
+
+    return all_segments
+
+
+def write_obx_segments(
+    segment_groups: list[OBXSegmentGroup],
+    out: TextIO,
+    terminator: str = segment_terminator,
+    start_line: int = 1,
+) -> int:
+    """
+    Write the OBX segments for `segment_groups` to `out` (e.g. an io.StringIO or a file),
+    each followed by `terminator`, without building an intermediate list.
+
+    Returns the line number the next segment would get, so consecutive calls can
+    continue the OBX-1 numbering.
+    """
+    write = out.write
+    line_number = start_line
+
+    for segment_group in segment_groups:
+        template = template_for_group(segment_group)
+        head = template.prefix
+        middle = template.middle
+        tail = template.suffix + terminator
+        obx4_base = str(segment_group.variant_type) + segment_group.variant_identifier
+
+        for segment in segment_group.segments:
+            line_id = segment.variant_identifier_line
+            obx4 = obx4_base if line_id is None else obx4_base + period_separator + line_id
+            write(head + str(line_number) + middle + obx4 + pipe_separator + format_obx5(segment) + tail)
+            line_number += 1
+
+    return line_number
@@ -0,0 +1,149 @@
+"""Assembly of complete HL7 v2 ORU^R01 messages around generated OBX segments"""
+
+from datetime import datetime, timezone
+
+from biocommons.gks_conversion_tool.escaping import escape
+
+pipe_separator: str = "|"
+
+# HL7 v2 segments are terminated by a carriage return
+segment_terminator: str = "\r"
+
+# MSH-2: component, repetition, escape and subcomponent characters
+encoding_characters: str = "^~\\&"
+
+hl7_version: str = "2.5.1"
+
+# OBR-4 for genetic variant results
+genetic_variant_panel: str = "81247-9^Master HL7 genetic variant reporting panel^LN"
+
+
+def hl7_timestamp(when: datetime | None = None) -> str:
+    """Format a datetime (default: now, UTC) as an HL7 DTM, YYYYMMDDHHMMSS."""
+    return (when or datetime.now(timezone.utc)).strftime("%Y%m%d%H%M%S")
+
+
+def build_msh(
+    message_control_id: str,
+    sending_application: str = "GKS-CONVERSION-TOOL",
+    sending_facility: str = "",
+    receiving_application: str = "",
+    receiving_facility: str = "",
+    timestamp: str | None = None,
+    processing_id: str = "P",
+) -> str:
+    """MSH for an ORU^R01. MSH-1 is the field separator itself, so MSH-2 directly follows 'MSH|'."""
+    return pipe_separator.join(
+        (
+            "MSH",
+            encoding_characters,
+            sending_application,
+            sending_facility,
+            receiving_application,
+            receiving_facility,
+            timestamp or hl7_timestamp(),
+            "",
+            "ORU^R01^ORU_R01",
+            message_control_id,
+            processing_id,
+            hl7_version,
+        )
+    )
+
+
+def build_pid(patient_id: str = "", patient_name: str = "") -> str:
+    return pipe_separator.join(("PID", "1", "", patient_id, "", patient_name))
+
+
+def build_obr(filler_order_number: str = "", observation_datetime: str = "") -> str:
+    """OBR for the panel. The filler order number is usually a statement id, so it is escaped."""
+    return pipe_separator.join(
+        ("OBR", "1", "", escape(filler_order_number), genetic_variant_panel, "", "", observation_datetime)
+    )
+
+
+def _build_header(
+    segment_type: str,
+    control_id: str,
+    sending_application: str,
+    sending_facility: str,
+    timestamp: str | None,
+) -> str:
+    """FHS and BHS share a layout: -3/-4 sender, -7 creation time, -11 control ID."""
+    return pipe_separator.join(
+        (
+            segment_type,
+            encoding_characters,
+            sending_application,
+            sending_facility,
+            "",
+            "",
+            timestamp or hl7_timestamp(),
+            "",
+            "",
+            "",
+            control_id,
+        )
+    )
+
+
+def build_fhs(
+    file_control_id: str,
+    sending_application: str = "GKS-CONVERSION-TOOL",
+    sending_facility: str = "",
+    timestamp: str | None = None,
+) -> str:
+    """File header of an HL7 batch file."""
+    return _build_header("FHS", file_control_id, sending_application, sending_facility, timestamp)
+
+
+def build_bhs(
+    batch_control_id: str,
+    sending_application: str = "GKS-CONVERSION-TOOL",
+    sending_facility: str = "",
+    timestamp: str | None = None,
+) -> str:
+    """Batch header; a batch holds any number of messages."""
+    return _build_header("BHS", batch_control_id, sending_application, sending_facility, timestamp)
+
+
+def build_bts(message_count: int) -> str:
+    """Batch trailer; BTS-1 is the number of messages in the batch."""
+    return pipe_separator.join(("BTS", str(message_count)))
+
+
+def build_fts(batch_count: int) -> str:
+    """File trailer; FTS-1 is the number of batches in the file."""
+    return pipe_separator.join(("FTS", str(batch_count)))
+
+
+def build_oru_r01(
+    obx_segments: list[str],
+    message_control_id: str,
+    patient_id: str = "",
+    patient_name: str = "",
+    filler_order_number: str = "",
+    **msh_fields: str,
+) -> str:
+    """
+    Wrap OBX segments (e.g. from generate_all_obx_for_variants) in MSH, PID and OBR
+    segments. Returns the message with every segment terminated by a carriage return.
+
+    Extra keyword arguments are passed on to build_msh.
+    """
+    timestamp = msh_fields.pop("timestamp", None) or hl7_timestamp()
+    segments = [
+        build_msh(message_control_id, timestamp=timestamp, **msh_fields),
+        build_pid(patient_id, patient_name),
+        build_obr(filler_order_number, timestamp),
+        *obx_segments,
+    ]
+    return segment_terminator.join(segments) + segment_terminator
+
+
+def message_control_id(message: str) -> str:
+    """Return MSH-10 of an encoded message."""
+    msh = message.split(segment_terminator, 1)[0]
+    fields = msh.split(pipe_separator)
+    # fields[0] is "MSH" and fields[1] is MSH-2, so MSH-n is fields[n - 1]
+    return fields[9] if len(fields) > 9 else ""  # noqa: PLR2004
@@ -0,0 +1,257 @@
+"""Process-pool batch conversion of VA-Spec Statements to HL7 v2 OBX segments"""
+
+import logging
+import os
+import time
+from collections import deque
+from collections.abc import Callable, Iterable, Iterator
+from concurrent.futures import Future, ProcessPoolExecutor
+from dataclasses import dataclass, field
+from itertools import islice
+from multiprocessing.context import BaseContext
+from typing import TYPE_CHECKING, Any, TextIO, TypeVar
+
+from biocommons.gks_conversion_tool import instrumentation
+from biocommons.gks_conversion_tool.converter import configure_worker, worker_configuration
+from biocommons.gks_conversion_tool.lean import LeanStatement, loads
+from biocommons.gks_conversion_tool.oru import build_oru_r01
+from biocommons.gks_conversion_tool.streaming import (
+    StreamStats,
+    convert_statement_record,
+    log_stats,
+    report_error,
+    segment_terminator,
+)
+
+if TYPE_CHECKING:
+    from biocommons.gks_conversion_tool.sinks import HL7Sink
+
+_logger = logging.getLogger(__name__)
+
+DEFAULT_CHUNK_SIZE = 256
+
+T = TypeVar("T")
+
+
+@dataclass
+class ChunkResult:
+    """
+    Converted output of one chunk of statements.
+
+    OBX segments are joined into a single string in the worker so that only one
+    object per chunk has to be pickled back to the parent process.
+    """
+
+    start_index: int
+    text: str = ""
+    statements: int = 0
+    segments: int = 0
+    errors: list[dict[str, Any]] = field(default_factory=list)
+
+    # instrumentation.snapshot() of this chunk, if metrics were requested
+    metrics: dict[str, dict[str, Any]] | None = None
+
+
+def convert_chunk(
+    start_index: int,
+    texts: list[str],
+    lean: bool = False,
+    metrics: bool = False,
+    terminator: str = segment_terminator,
+    control_id_prefix: str | None = None,
+) -> ChunkResult:
+    """
+    Decode and convert a chunk of Statement JSON texts, as LeanStatements if `lean`
+    is set or as fully validated Statements otherwise.
+
+    Each segment is followed by `terminator`. With a `control_id_prefix`, each
+    statement becomes an ORU^R01 message instead, numbered by its position in the
+    input as in streaming.iter_oru_messages.
+
+    A statement that fails to decode or convert does not stop the chunk; it is
+    recorded in ChunkResult.errors with its position in the input.
+
+    With `metrics`, instrumentation is enabled in this process, reset, and what the
+    chunk recorded is returned in ChunkResult.metrics.
+    """
+    result = ChunkResult(start_index=start_index)
+    if metrics:
+        instrumentation.enable()
+        instrumentation.reset()
+    parts: list[str] = []
+
+    for index, text in enumerate(texts, start=start_index):
+        result.statements += 1
+        statement_id = None
+        try:
+            record = loads(text)
+            statement_id = record.get("id")
+            segments = convert_statement_record(LeanStatement(record) if lean else record)
+        except Exception as e:  # any failure becomes an error record
+            result.errors.append(
+                {"index": index, "id": statement_id, "error": f"{type(e).__name__}: {e}"}
+            )
+            continue
+        if control_id_prefix is not None:
+            parts.append(
+                build_oru_r01(segments, f"{control_id_prefix}{index + 1}", filler_order_number=statement_id or "")
+            )
+        else:
+            for segment in segments:
+                parts.append(segment)
+                parts.append(terminator)
+        result.segments += len(segments)
+
+    result.text = "".join(parts)
+    if metrics:
+        result.metrics = instrumentation.snapshot()
+    return result
+
+
+def iter_chunks(texts: Iterable[str], chunk_size: int) -> Iterator[tuple[int, list[str]]]:
+    """Yield (start_index, chunk) pairs of at most chunk_size texts."""
+    iterator = iter(texts)
+    start_index = 0
+    while chunk := list(islice(iterator, chunk_size)):
+        yield start_index, chunk
+        start_index += len(chunk)
+
+
+def iter_converted_chunks(
+    texts: Iterable[str],
+    workers: int | None = None,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    lean: bool = False,
+    metrics: bool = False,
+    terminator: str = segment_terminator,
+    control_id_prefix: str | None = None,
+    mp_context: BaseContext | None = None,
+) -> Iterator[ChunkResult]:
+    """
+    Convert statements on a process pool and yield chunk results in input order
+    (see convert_chunk for the arguments).
+
+    At most 2 * workers chunks are in flight at a time, so memory stays bounded
+    no matter how large the input is and a slow consumer throttles the reader.
+    """
+    return iter_chunk_results(
+        convert_chunk,
+        texts,
+        workers,
+        chunk_size,
+        lean,
+        metrics,
+        terminator,
+        control_id_prefix,
+        mp_context=mp_context,
+    )
+
+
+def iter_chunk_results(
+    func: Callable[..., T],
+    texts: Iterable[str],
+    workers: int | None,
+    chunk_size: int,
+    *args: Any,
+    mp_context: BaseContext | None = None,
+) -> Iterator[T]:
+    """
+    Run func(start_index, chunk, *args) on a process pool for each chunk of texts
+    and yield the results in input order.
+
+    At most 2 * workers chunks are in flight at a time. `func` must be picklable,
+    i.e. a module-level function. Each worker starts with this process's cache
+    sizes and reference index (see converter.configure_worker), so `mp_context`
+    may use any start method.
+    """
+    workers = workers or os.cpu_count() or 1
+    max_in_flight = workers * 2
+    pending: deque[Future[T]] = deque()
+
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=mp_context,
+        initializer=configure_worker,
+        initargs=worker_configuration(),
+    ) as executor:
+        for start_index, chunk in iter_chunks(texts, chunk_size):
+            pending.append(executor.submit(func, start_index, chunk, *args))
+            if len(pending) >= max_in_flight:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def stream_obx_segments_parallel(
+    texts: Iterable[str],
+    out: TextIO,
+    workers: int | None = None,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    errors_out: TextIO | None = None,
+    lean: bool = False,
+    metrics: bool = False,
+) -> StreamStats:
+    """
+    Parallel counterpart of streaming.stream_obx_segments.
+
+    Takes undecoded Statement JSON texts (see streaming.iter_statement_texts) so
+    that decoding happens in the workers. Output keeps the input order. Each failed
+    statement is written to `errors_out` as one JSON line, or logged if no error
+    stream is given. With `metrics`, the workers' stage metrics are merged into
+    this process's instrumentation.
+    """
+    stats = StreamStats()
+    start = time.perf_counter()
+
+    for chunk in iter_converted_chunks(texts, workers=workers, chunk_size=chunk_size, lean=lean, metrics=metrics):
+        out.write(chunk.text)
+        _merge_chunk(chunk, stats, errors_out)
+
+    stats.elapsed = time.perf_counter() - start
+    log_stats(stats)
+    return stats
+
+
+def stream_to_sink_parallel(
+    texts: Iterable[str],
+    sink: "HL7Sink",
+    workers: int | None = None,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    errors_out: TextIO | None = None,
+    lean: bool = False,
+    metrics: bool = False,
+    control_id_prefix: str | None = None,
+) -> StreamStats:
+    """
+    Like stream_obx_segments_parallel, but writes to a sinks.HL7Sink. Each chunk
+    is written as a whole, so the sink rotates files at chunk boundaries.
+    """
+    stats = StreamStats()
+    start = time.perf_counter()
+
+    for chunk in iter_converted_chunks(
+        texts,
+        workers=workers,
+        chunk_size=chunk_size,
+        lean=lean,
+        metrics=metrics,
+        terminator=sink.terminator,
+        control_id_prefix=control_id_prefix,
+    ):
+        sink.write(chunk.text, messages=chunk.statements - len(chunk.errors), segments=chunk.segments)
+        _merge_chunk(chunk, stats, errors_out)
+
+    stats.elapsed = time.perf_counter() - start
+    log_stats(stats)
+    return stats
+
+
+def _merge_chunk(chunk: ChunkResult, stats: StreamStats, errors_out: TextIO | None) -> None:
+    """Add a chunk's counters, errors and metrics to the run's."""
+    if chunk.metrics:
+        instrumentation.merge(chunk.metrics)
+    stats.statements += chunk.statements
+    stats.segments += chunk.segments
+    stats.errors += len(chunk.errors)
+    for error in chunk.errors:
+        report_error(error, errors_out)
@@ -0,0 +1,286 @@
+"""Validation-only preflight of a corpus of VA-Spec Statements
+
+Checks every statement the way a conversion would fail on it, without building
+any segment objects or OBX strings. Each statement is validated as a full ga4gh
+Statement (or, with lean=True, decoded as a LeanStatement), the same way as a
+conversion with or without --lean, converted to HL7 fields, and those fields are checked against the
+per-VAR-concept rules of the registry: required values, and the value types
+that the OBX segment classes accept.
+
+Most statements pass, so check_fields first makes one pass over the fields that
+are present, comparing exact value types; only a statement that fails it goes
+through the per-rule checks that name the problem. A preflight takes a
+fraction of the time of a conversion in the same mode (see the preflight benchmark).
+
+Every problem found becomes one PreflightIssue (statement index and id, field,
+reason). The field is a VAR concept name such as VARCONCEPT518 for conversion
+and field rule problems, or the path of the offending attribute for Statement
+validation errors.
+"""
+
+import json
+import logging
+import time
+from collections.abc import Callable, Iterable
+from dataclasses import asdict, dataclass, field
+from typing import Any, TextIO
+
+from pydantic import ValidationError
+
+from biocommons.gks_conversion_tool.converter import ConversionError, convert_gks_to_hl7_v2
+from biocommons.gks_conversion_tool.lean import LeanStatement, loads
+from biocommons.gks_conversion_tool.parallel import (
+    DEFAULT_CHUNK_SIZE,
+    iter_chunk_results,
+    iter_chunks,
+)
+from biocommons.gks_conversion_tool.streaming import validate_statement
+from biocommons.gks_conversion_tool.var_concept_registry import (
+    CWE,
+    NM,
+    NR,
+    ST,
+    VAR_CONCEPT_REGISTRY,
+    VARConceptMapping,
+    field_key,
+)
+
+_logger = logging.getLogger(__name__)
+
+# Statement validation errors reported per statement; the rest are counted in the last one
+MAX_VALIDATION_ISSUES = 5
+
+
+@dataclass(frozen=True)
+class PreflightIssue:
+    index: int
+    id: str | None
+    field: str
+    reason: str
+
+
+@dataclass
+class ChunkCheck:
+    """Result of checking one chunk of statements."""
+
+    statements: int = 0
+    failed: int = 0
+    issues: list[PreflightIssue] = field(default_factory=list)
+
+
+@dataclass
+class PreflightReport:
+    statements: int = 0
+    failed: int = 0
+    # field -> number of issues
+    issues_by_field: dict[str, int] = field(default_factory=dict)
+    elapsed: float = 0.0
+
+
+# --- Field rules -------------------------------------------------------------
+
+
+def _is_number(value: Any) -> bool:
+    return isinstance(value, int | float) and not isinstance(value, bool)
+
+
+def _value_rule(mapping: VARConceptMapping) -> Callable[[Any], str | None]:
+    """A check of one present value: returns the reason it would be rejected, or None."""
+    observation_type = mapping.observation_type
+    if observation_type is NR:
+
+        # the converter rejects ranges whose start is after their end (ConversionError)
+        def check_range(value: tuple[Any, Any]) -> str | None:
+            start, end = value
+            if not (_is_number(start) and _is_number(end)):
+                return f"range bounds must be numbers, got {start!r} and {end!r}"
+            return None
+
+        return check_range
+    if observation_type is NM:
+        return lambda value: None if _is_number(value) else f"must be a number, got {value!r}"
+    if observation_type in (ST, CWE):
+        return lambda value: None if isinstance(value, str) else f"must be a string, got {value!r}"
+    msg = f"No preflight rule for observation type {observation_type!r}"
+    raise ValueError(msg)
+
+
+@dataclass(frozen=True)
+class _FieldRule:
+    concept: str
+    keys: tuple[str, ...]
+    required: bool
+    check: Callable[[Any], str | None]
+
+
+def _compile_field_rules() -> tuple[_FieldRule, ...]:
+    """The registry's rules for HL7 field dicts, as returned by convert_gks_to_hl7_v2."""
+    rules = []
+    for mapping in VAR_CONCEPT_REGISTRY:
+        sources = mapping.source if isinstance(mapping.source, tuple) else (mapping.source,)
+        rules.append(
+            _FieldRule(
+                concept=mapping.concept.name,
+                keys=tuple(field_key(source, mapping.concept) for source in sources),
+                required=mapping.required,
+                check=_value_rule(mapping),
+            )
+        )
+    return tuple(rules)
+
+
+FIELD_RULES = _compile_field_rules()
+
+_NUMBER_TYPES = frozenset({int, float})
+_STRING_TYPES = frozenset({str})
+
+
+def _compile_field_types() -> dict[str, frozenset[type]]:
+    """Field key -> the exact value types that certainly pass its rule."""
+    field_types = {}
+    for mapping, rule in zip(VAR_CONCEPT_REGISTRY, FIELD_RULES, strict=True):
+        for key in rule.keys:
+            field_types[key] = _STRING_TYPES if mapping.observation_type in (ST, CWE) else _NUMBER_TYPES
+    return field_types
+
+
+_FIELD_TYPES = _compile_field_types()
+_REQUIRED_KEYS = tuple(key for rule in FIELD_RULES if rule.required for key in rule.keys)
+
+
+def _fields_pass(hl7_fields: dict[str, Any]) -> bool:
+    """
+    Whether the fields certainly pass every rule. False means check_fields has to
+    look closer; it may still find nothing (e.g. for a str subclass).
+    """
+    get = hl7_fields.get
+    for key in _REQUIRED_KEYS:
+        value = get(key)
+        if value is None or value == "":
+            return False
+    field_types = _FIELD_TYPES.get
+    for key, value in hl7_fields.items():
+        if value is not None:
+            types = field_types(key)
+            if types is not None and type(value) not in types:
+                return False
+    return True
+
+
+def check_fields(hl7_fields: dict[str, Any]) -> list[tuple[str, str]]:
+    """Check converted HL7 fields against the registry; returns (VAR concept, reason) pairs."""
+    if _fields_pass(hl7_fields):
+        return []
+    problems = []
+    get = hl7_fields.get
+    for rule in FIELD_RULES:
+        if len(rule.keys) == 1:
+            value = get(rule.keys[0])
+            missing = value is None or value == ""
+        else:
+            value = tuple(get(key) for key in rule.keys)
+            missing = any(bound is None for bound in value)
+        if missing:
+            if rule.required:
+                problems.append((rule.concept, "required value is missing"))
+            continue
+        reason = rule.check(value)
+        if reason is not None:
+            problems.append((rule.concept, reason))
+    return problems
+
+
+# --- Statements --------------------------------------------------------------
+
+
+def _concept_of(error: Exception) -> str:
+    hl7_field = getattr(error, "field", None)
+    return "VARCONCEPT" + hl7_field.partition(".")[0] if hl7_field else "statement"
+
+
+def check_record(record: dict[str, Any], lean: bool = False) -> list[tuple[str, str]]:
+    """All problems with one decoded Statement, as (field, reason) pairs; empty if it would convert."""
+    try:
+        statement = LeanStatement(record) if lean else validate_statement(record)
+    except ValidationError as e:
+        errors = e.errors()
+        problems = [
+            (".".join(map(str, error["loc"])) or "statement", error["msg"])
+            for error in errors[:MAX_VALIDATION_ISSUES]
+        ]
+        if len(errors) > MAX_VALIDATION_ISSUES:
+            problems.append(("statement", f"{len(errors) - MAX_VALIDATION_ISSUES} more validation errors"))
+        return problems
+    except ValueError as e:
+        return [("statement", str(e))]
+
+    try:
+        hl7_fields = convert_gks_to_hl7_v2(statement)
+    except ConversionError as e:
+        return [(_concept_of(e), str(e))]
+    except (AttributeError, TypeError, ValueError) as e:
+        return [("statement", f"{type(e).__name__}: {e}")]
+    return check_fields(hl7_fields)
+
+
+def check_chunk(start_index: int, texts: list[str], lean: bool = False) -> ChunkCheck:
+    """Check a chunk of Statement JSON texts."""
+    result = ChunkCheck(statements=len(texts))
+    for index, text in enumerate(texts, start=start_index):
+        statement_id = None
+        try:
+            record = loads(text)
+            statement_id = record.get("id") if isinstance(record, dict) else None
+            problems = check_record(record, lean) if isinstance(record, dict) else [("statement", "not a JSON object")]
+        except ValueError as e:
+            problems = [("statement", f"invalid JSON: {e}")]
+        if problems:
+            result.failed += 1
+            result.issues += [PreflightIssue(index, statement_id, field, reason) for field, reason in problems]
+    return result
+
+
+def preflight(
+    texts: Iterable[str],
+    out: TextIO | None = None,
+    workers: int | None = 1,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    lean: bool = False,
+) -> PreflightReport:
+    """
+    Check undecoded Statement JSON texts (see streaming.iter_statement_texts) and
+    write one JSON line per issue to `out`, in input order.
+
+    With workers other than 1 the chunks are checked on a process pool (0 or None
+    means one worker per CPU). Statements are read as by a conversion with the
+    same `lean` setting, so a statement passes only if that conversion accepts it.
+    """
+    report = PreflightReport()
+    start = time.perf_counter()
+    if workers == 1:
+        results = (check_chunk(start_index, chunk, lean) for start_index, chunk in iter_chunks(texts, chunk_size))
+    else:
+        results = iter_chunk_results(check_chunk, texts, workers or None, chunk_size, lean)
+
+    for result in results:
+        report.statements += result.statements
+        report.failed += result.failed
+        for issue in result.issues:
+            report.issues_by_field[issue.field] = report.issues_by_field.get(issue.field, 0) + 1
+            if out is not None:
+                out.write(json.dumps(asdict(issue)) + "\n")
+
+    report.elapsed = time.perf_counter() - start
+    log_report(report)
+    return report
+
+
+def log_report(report: PreflightReport) -> None:
+    _logger.info(
+        "Checked %d statements in %.2fs: %d would fail",
+        report.statements,
+        report.elapsed,
+        report.failed,
+    )
+    for issue_field, count in sorted(report.issues_by_field.items(), key=lambda item: -item[1]):
+        _logger.info("  %s: %d issues", issue_field, count)
@@ -0,0 +1,514 @@
+"""Offline reference sequence, gene and cytoband lookups
+
+Some HL7 fields need data that a Statement does not carry: 510 wants a
+chromosome name rather than the NC_ accession of the hgvs.g expression, 514 an
+HGNC ID for the gene symbol, 532 the cytoband at the allele's position,
+516/522/524 a RefSeq accession where the allele only has a refget accession,
+and 572/573 the exons and introns of a transcript that a structural variant covers.
+
+build_reference_index compiles local tables into one binary index file:
+
+  - RefSeq sequences (TSV with a header): accession, chromosome, assembly and
+    optionally refget_accession, e.g. NC_000007.13  7  GRCh37  SQ.IW78mgV5...
+  - HGNC genes: the HGNC complete set, or any TSV with symbol and hgnc_id columns.
+  - Cytobands: UCSC cytoBand.txt files (chrom, start, end, band, stain), one per assembly.
+  - Exons (TSV with a header): transcript, accession (of the genomic sequence),
+    exon (its number), start, end, 0-based with the end excluded. When a
+    variant has no transcript, the first overlapping transcript in this table is used.
+
+ReferenceIndex memory-maps that file, so opening it reads only the section
+table. Keys are kept in sorted string lists and found by binary search; the
+cytobands of all chromosomes are one sorted array of (chromosome rank << 32 |
+start), searched with bisect; transcripts are kept the same way, with a running
+maximum of their ends so that an overlap search can stop early, and the exons of
+each transcript are sorted and searched within its slice of the exon arrays.
+Results are memoized, so repeated lookups are plain dict hits.
+
+Build an index from the command line with
+
+    python -m biocommons.gks_conversion_tool.reference reference.idx \\
+        --refseq refseq.tsv --hgnc hgnc_complete_set.txt --cytoband GRCh38=cytoBand.txt \\
+        --exons exons.tsv
+"""
+
+import argparse
+import csv
+import hashlib
+import logging
+import mmap
+import struct
+import sys
+from array import array
+from bisect import bisect_left, bisect_right
+from collections.abc import Iterable, Iterator
+from pathlib import Path
+from types import TracebackType
+from typing import NamedTuple
+
+_logger = logging.getLogger(__name__)
+
+MAGIC = b"GKSREF01"
+
+# magic, byte order ("<" or ">"), section count
+_HEADER = struct.Struct("8s1sxxxI")
+# name, offset, length
+_SECTION = struct.Struct("24sQQ")
+
+# Lookups remembered per table before the memo is cleared
+MEMO_SIZE = 1 << 16
+
+_BYTE_ORDER = b"<" if sys.byteorder == "little" else b">"
+
+
+class SequenceInfo(NamedTuple):
+    chromosome: str
+    assembly: str
+
+
+class ExonHit(NamedTuple):
+    """The exon and intron numbers of a transcript that an interval overlaps, lowest first."""
+
+    transcript: str
+    exons: tuple[int, int] | None
+    introns: tuple[int, int] | None
+
+
+# --- Reading source tables ---------------------------------------------------
+
+
+def read_refseq_table(path: Path) -> Iterator[tuple[str, str, str, str]]:
+    """Yield (accession, chromosome, assembly, refget accession) rows; missing columns are ""."""
+    with path.open(newline="") as fh:
+        for row in csv.DictReader(fh, delimiter="\t"):
+            yield (
+                row["accession"],
+                row.get("chromosome") or "",
+                row.get("assembly") or "",
+                row.get("refget_accession") or "",
+            )
+
+
+def read_hgnc_table(path: Path) -> Iterator[tuple[str, str]]:
+    """Yield (symbol, HGNC ID) rows of approved genes."""
+    with path.open(newline="") as fh:
+        for row in csv.DictReader(fh, delimiter="\t"):
+            if row.get("status", "Approved") == "Approved" and row["symbol"] and row["hgnc_id"]:
+                yield row["symbol"], row["hgnc_id"]
+
+
+def read_cytobands(path: Path) -> Iterator[tuple[str, int, int, str]]:
+    """Yield (chromosome without 'chr', start, end, band) rows of a UCSC cytoBand file."""
+    with path.open(newline="") as fh:
+        for row in csv.reader(fh, delimiter="\t"):
+            if not row or row[0].startswith("#"):
+                continue
+            chromosome, start, end, band = row[:4]
+            yield chromosome.removeprefix("chr"), int(start), int(end), band
+
+
+def read_exons(path: Path) -> Iterator[tuple[str, str, int, int, int]]:
+    """Yield (transcript, genomic accession, exon number, start, end) rows."""
+    with path.open(newline="") as fh:
+        for row in csv.DictReader(fh, delimiter="\t"):
+            yield row["transcript"], row["accession"], int(row["exon"]), int(row["start"]), int(row["end"])
+
+
+# --- Writing -----------------------------------------------------------------
+
+
+def _string_list(strings: Iterable[str]) -> bytes:
+    """n, n + 1 offsets into the blob, the blob; all offsets uint32."""
+    encoded = [s.encode() for s in strings]
+    offsets = array("I", [0])
+    for s in encoded:
+        offsets.append(offsets[-1] + len(s))
+    return array("I", [len(encoded)]).tobytes() + offsets.tobytes() + b"".join(encoded)
+
+
+def _string_table(name: str, pairs: dict[str, str]) -> dict[str, bytes]:
+    keys = sorted(pairs)
+    return {f"{name}.keys": _string_list(keys), f"{name}.values": _string_list(pairs[k] for k in keys)}
+
+
+def build_reference_index(
+    path: Path,
+    refseq: Path | None = None,
+    hgnc: Path | None = None,
+    cytobands: dict[str, Path] | None = None,
+    exons: Path | None = None,
+) -> Path:
+    """
+    Compile the given tables into an index file at `path` (see the module
+    docstring for the formats). Cytoband files are keyed by assembly name, which
+    must match the assembly column of the RefSeq table.
+    """
+    sections: dict[str, bytes] = {}
+
+    if refseq is not None:
+        sequences = {}
+        refgets = {}
+        for accession, chromosome, assembly, refget_accession in read_refseq_table(refseq):
+            sequences[accession] = f"{chromosome}\t{assembly}"
+            if refget_accession:
+                refgets[refget_accession] = accession
+        sections |= _string_table("sequences", sequences)
+        sections |= _string_table("refget", refgets)
+
+    if hgnc is not None:
+        sections |= _string_table("hgnc", dict(read_hgnc_table(hgnc)))
+
+    if cytobands:
+        bands = sorted(
+            (f"{assembly}:{chromosome}", start, end, band)
+            for assembly, cytoband_path in cytobands.items()
+            for chromosome, start, end, band in read_cytobands(cytoband_path)
+        )
+        ranks = {}
+        for key, *_ in bands:
+            ranks.setdefault(key, len(ranks))
+        sections |= _string_table("chromosomes", {key: str(rank) for key, rank in ranks.items()})
+        sections["bands.starts"] = array("q", [ranks[key] << 32 | start for key, start, _, _ in bands]).tobytes()
+        sections["bands.ends"] = array("q", [end for _, _, end, _ in bands]).tobytes()
+        sections["bands.names"] = _string_list(f"{key.partition(':')[2]}{band}" for key, _, _, band in bands)
+
+    if exons is not None:
+        sections |= _exon_sections(exons)
+
+    header_size = _HEADER.size + _SECTION.size * len(sections)
+    entries = []
+    offset = _align(header_size)
+    for name, data in sections.items():
+        entries.append((name, offset, len(data)))
+        offset = _align(offset + len(data))
+
+    with path.open("wb") as fh:
+        fh.write(_HEADER.pack(MAGIC, _BYTE_ORDER, len(sections)))
+        for name, section_offset, length in entries:
+            fh.write(_SECTION.pack(name.encode(), section_offset, length))
+        for (_, section_offset, _), data in zip(entries, sections.values()):
+            fh.write(b"\0" * (section_offset - fh.tell()))
+            fh.write(data)
+    _logger.info("Wrote reference index %s (%d sections)", path, len(sections))
+    return path
+
+
+def _exon_sections(path: Path) -> dict[str, bytes]:
+    # transcript -> (genomic accession, [(start, end, number)]), in table order
+    transcripts: dict[str, tuple[str, list[tuple[int, int, int]]]] = {}
+    for transcript, accession, number, start, end in read_exons(path):
+        transcripts.setdefault(transcript, (accession, []))[1].append((start, end, number))
+    ranks = {accession: rank for rank, accession in enumerate(sorted({a for a, _ in transcripts.values()}))}
+    priorities = {transcript: priority for priority, transcript in enumerate(transcripts)}
+    for _, rows in transcripts.values():
+        rows.sort()
+    order = sorted(transcripts, key=lambda t: (ranks[transcripts[t][0]], transcripts[t][1][0][0]))
+
+    exon_starts, exon_ends, exon_numbers = array("q"), array("q"), array("q")
+    starts, ends, max_ends, firsts, order_priorities = array("q"), array("q"), array("q"), array("q"), array("q")
+    previous_rank = max_end = None
+    for transcript in order:
+        accession, rows = transcripts[transcript]
+        rank = ranks[accession]
+        firsts.append(len(exon_starts))
+        for start, end, number in rows:
+            exon_starts.append(start)
+            exon_ends.append(end)
+            exon_numbers.append(number)
+        end = max(row[1] for row in rows)
+        starts.append(rank << 32 | rows[0][0])
+        ends.append(end)
+        max_end = end if rank != previous_rank else max(max_end, end)
+        max_ends.append(max_end)
+        order_priorities.append(priorities[transcript])
+        previous_rank = rank
+    firsts.append(len(exon_starts))
+
+    sections = _string_table("exon_accessions", {accession: str(rank) for accession, rank in ranks.items()})
+    sections |= _string_table("transcripts", {transcript: str(i) for i, transcript in enumerate(order)})
+    sections["transcripts.names"] = _string_list(order)
+    for name, values in (
+        ("transcripts.starts", starts),
+        ("transcripts.ends", ends),
+        ("transcripts.max_ends", max_ends),
+        ("transcripts.firsts", firsts),
+        ("transcripts.priorities", order_priorities),
+        ("exons.starts", exon_starts),
+        ("exons.ends", exon_ends),
+        ("exons.numbers", exon_numbers),
+    ):
+        sections[name] = values.tobytes()
+    return sections
+
+
+def _align(offset: int) -> int:
+    return (offset + 7) & ~7
+
+
+# --- Lookups -----------------------------------------------------------------
+
+
+class _StringList:
+    """A read-only sequence of the byte strings in one section, for bisect."""
+
+    __slots__ = ("_blob", "_length", "_offsets")
+
+    def __init__(self, view: memoryview):
+        self._length = view[:4].cast("I")[0]
+        end = 4 * (self._length + 2)
+        self._offsets = view[4:end].cast("I")
+        self._blob = view[end:]
+
+    def __len__(self) -> int:
+        return self._length
+
+    def __getitem__(self, index: int) -> bytes:
+        offsets = self._offsets
+        return self._blob[offsets[index] : offsets[index + 1]].tobytes()
+
+
+class _StringTable:
+    """Sorted keys and their values, with a memo of the keys looked up."""
+
+    def __init__(self, keys: _StringList, values: _StringList):
+        self._keys = keys
+        self._values = values
+        self._memo: dict[str, str | None] = {}
+
+    def get(self, key: str) -> str | None:
+        memo = self._memo
+        value = memo.get(key, memo)
+        if value is not memo:
+            return value
+        encoded = key.encode()
+        index = bisect_left(self._keys, encoded)
+        value = self._values[index].decode() if index < len(self._keys) and self._keys[index] == encoded else None
+        if len(memo) >= MEMO_SIZE:
+            memo.clear()
+        memo[key] = value
+        return value
+
+
+class _EmptyTable:
+    def get(self, key: str) -> None:  # noqa: ARG002
+        return None
+
+
+class ReferenceIndex:
+    """Lookups in an index file written by build_reference_index. Tables that were not built return None."""
+
+    def __init__(self, path: Path | str):
+        self.path = Path(path)
+        with self.path.open("rb") as fh:
+            self._mmap = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+        self._view = memoryview(self._mmap)
+
+        magic, byte_order, count = _HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC:
+            self.close()
+            msg = f"{self.path} is not a reference index"
+            raise ValueError(msg)
+        if byte_order != _BYTE_ORDER:
+            self.close()
+            msg = f"{self.path} was built on a machine with the other byte order; rebuild it here"
+            raise ValueError(msg)
+        self._sections = {}
+        for i in range(count):
+            name, offset, length = _SECTION.unpack_from(self._mmap, _HEADER.size + i * _SECTION.size)
+            self._sections[name.rstrip(b"\0").decode()] = self._view[offset : offset + length]
+
+        self._sequences = self._table("sequences")
+        self._refget = self._table("refget")
+        self._hgnc = self._table("hgnc")
+        self._chromosomes = self._table("chromosomes")
+        self._band_starts = self._array("bands.starts")
+        self._band_ends = self._array("bands.ends")
+        names = self._sections.get("bands.names")
+        self._band_names = _StringList(names) if names is not None else None
+        self._chromosome_bands: dict[tuple[str, str], tuple[int, int, int] | None] = {}
+        self._band_name_memo: dict[int, str] = {}
+
+        self._exon_accessions = self._table("exon_accessions")
+        self._transcripts = self._table("transcripts")
+        names = self._sections.get("transcripts.names")
+        self._transcript_names = _StringList(names) if names is not None else None
+        self._transcript_starts = self._array("transcripts.starts")
+        self._transcript_ends = self._array("transcripts.ends")
+        self._transcript_max_ends = self._array("transcripts.max_ends")
+        self._transcript_firsts = self._array("transcripts.firsts")
+        self._transcript_priorities = self._array("transcripts.priorities")
+        self._exon_starts = self._array("exons.starts")
+        self._exon_ends = self._array("exons.ends")
+        self._exon_numbers = self._array("exons.numbers")
+        self._fingerprint: str | None = None
+
+    @property
+    def fingerprint(self) -> str:
+        """A digest of the index file, computed on first use; equal digests mean equal lookups."""
+        if self._fingerprint is None:
+            self._fingerprint = hashlib.blake2b(self._view, digest_size=16).hexdigest()
+        return self._fingerprint
+
+    def _table(self, name: str) -> _StringTable | _EmptyTable:
+        keys = self._sections.get(f"{name}.keys")
+        if keys is None:
+            return _EmptyTable()
+        return _StringTable(_StringList(keys), _StringList(self._sections[f"{name}.values"]))
+
+    def _array(self, name: str) -> memoryview | None:
+        section = self._sections.get(name)
+        return section.cast("q") if section is not None else None
+
+    def __enter__(self) -> "ReferenceIndex":
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc: BaseException | None,
+        traceback: TracebackType | None,
+    ) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """Drop every view into the file and unmap it."""
+        self._sections = {}
+        self._sequences = self._refget = self._hgnc = self._chromosomes = _EmptyTable()
+        self._band_starts = self._band_ends = self._band_names = None
+        self._exon_accessions = self._transcripts = _EmptyTable()
+        self._transcript_names = self._transcript_starts = self._transcript_ends = None
+        self._transcript_max_ends = self._transcript_firsts = self._transcript_priorities = None
+        self._exon_starts = self._exon_ends = self._exon_numbers = None
+        self._view.release()
+        self._mmap.close()
+
+    def sequence(self, accession: str) -> SequenceInfo | None:
+        """Chromosome and assembly of a RefSeq accession, e.g. NC_000007.13 -> ('7', 'GRCh37')."""
+        value = self._sequences.get(accession)
+        if value is None:
+            return None
+        chromosome, _, assembly = value.partition("\t")
+        return SequenceInfo(chromosome, assembly)
+
+    def accession_for_refget(self, refget_accession: str) -> str | None:
+        """RefSeq accession of a refget accession (SQ.…)."""
+        return self._refget.get(refget_accession)
+
+    def hgnc_id(self, symbol: str) -> str | None:
+        """HGNC ID of an approved gene symbol, e.g. BRAF -> HGNC:1097."""
+        return self._hgnc.get(symbol)
+
+    def cytoband(self, assembly: str, chromosome: str, position: int) -> str | None:
+        """Cytogenetic location of a 0-based position, e.g. ('GRCh37', '7', 140453135) -> 7q34."""
+        bands = self._chromosome_bands.get((assembly, chromosome), self)
+        if bands is self:
+            bands = self._chromosome_bands[assembly, chromosome] = self._find_chromosome_bands(assembly, chromosome)
+        if bands is None:
+            return None
+        base, low, high = bands
+        index = bisect_right(self._band_starts, base | position, low, high) - 1
+        if index < low or position >= self._band_ends[index]:
+            return None
+        name = self._band_name_memo.get(index)
+        if name is None:
+            name = self._band_name_memo[index] = self._band_names[index].decode()
+        return name
+
+    def _find_chromosome_bands(self, assembly: str, chromosome: str) -> tuple[int, int, int] | None:
+        """(rank << 32, first band index, end band index) of a chromosome, or None if it has no bands."""
+        rank = self._chromosomes.get(f"{assembly}:{chromosome}")
+        if rank is None:
+            return None
+        base = int(rank) << 32
+        starts = self._band_starts
+        return base, bisect_left(starts, base), bisect_left(starts, base + (1 << 32))
+
+    def affected_exons(
+        self, accession: str, start: int, end: int, transcript: str | None = None
+    ) -> ExonHit | None:
+        """
+        Exons and introns of `transcript` that the interval [start, end) of the
+        genomic sequence `accession` overlaps. Without a transcript, the first
+        transcript of the exon table that overlaps the interval is used.
+        Returns None if the transcript is unknown or none overlaps.
+        """
+        if transcript is not None:
+            index = self._transcripts.get(transcript)
+            if index is None:
+                return None
+            index = int(index)
+        else:
+            index = self._overlapping_transcript(accession, start, end)
+            if index is None:
+                return None
+            transcript = self._transcript_names[index].decode()
+
+        first, last = self._transcript_firsts[index], self._transcript_firsts[index + 1]
+        starts, ends, numbers = self._exon_starts, self._exon_ends, self._exon_numbers
+        # exons of a transcript are sorted and disjoint, so their ends are sorted too
+        low = bisect_right(ends, start, first, last)
+        high = bisect_left(starts, end, first, last)
+        exons = _number_range(numbers[low], numbers[high - 1]) if low < high else None
+
+        # intron i lies between exons i and i + 1 and is numbered after the lower of the two
+        low = bisect_right(starts, start, first + 1, last) - 1
+        high = bisect_left(ends, end, first, last - 1)
+        introns = (
+            _number_range(min(numbers[low], numbers[low + 1]), min(numbers[high - 1], numbers[high]))
+            if low < high
+            else None
+        )
+        if exons is None and introns is None:
+            return None
+        return ExonHit(transcript, exons, introns)
+
+    def _overlapping_transcript(self, accession: str, start: int, end: int) -> int | None:
+        rank = self._exon_accessions.get(accession)
+        if rank is None:
+            return None
+        base = int(rank) << 32
+        starts, ends, max_ends = self._transcript_starts, self._transcript_ends, self._transcript_max_ends
+        priorities = self._transcript_priorities
+        low = bisect_left(starts, base)
+        # transcripts that start before `end`, walked back while any of them can still reach `start`
+        index = bisect_left(starts, base | end, low) - 1
+        best = None
+        while index >= low and max_ends[index] > start:
+            if ends[index] > start and (best is None or priorities[index] < priorities[best]):
+                best = index
+            index -= 1
+        return best
+
+
+def _number_range(a: int, b: int) -> tuple[int, int]:
+    return (a, b) if a <= b else (b, a)
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Build an offline reference index for gks-to-hl7v2 --reference.")
+    parser.add_argument("output", help="index file to write")
+    parser.add_argument("--refseq", type=Path, help="TSV of accession, chromosome, assembly[, refget_accession]")
+    parser.add_argument("--hgnc", type=Path, help="HGNC complete set (TSV with symbol and hgnc_id columns)")
+    parser.add_argument(
+        "--cytoband",
+        action="append",
+        default=[],
+        metavar="ASSEMBLY=FILE",
+        help="UCSC cytoBand.txt of an assembly, e.g. GRCh38=cytoBand.txt; may be repeated",
+    )
+    parser.add_argument("--exons", type=Path, help="TSV of transcript, accession, exon, start, end")
+    args = parser.parse_args(argv)
+    cytobands = {}
+    for item in args.cytoband:
+        assembly, sep, cytoband_path = item.partition("=")
+        if not sep:
+            parser.error(f"--cytoband expects ASSEMBLY=FILE, got {item!r}")
+        cytobands[assembly] = Path(cytoband_path)
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s %(name)s: %(message)s", stream=sys.stderr)
+    build_reference_index(
+        Path(args.output), refseq=args.refseq, hgnc=args.hgnc, cytobands=cytobands, exons=args.exons
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,157 @@
+"""Assembly of multi-variant patient reports
+
+A report sends every variant of one patient in a single ORU^R01 message. Each
+variant gets its own OBX-4 sub-ID, 2a, 2b, ... 2z, 2aa, 2ab, ..., and OBX-1
+numbers the lines of the whole message instead of restarting at 1 per variant.
+
+ReportBuilder writes each variant's lines to the output as soon as it is
+converted. It keeps only the next line number and the number of variants, so
+an exome-sized report uses no more memory than a single variant. write_report
+collects the OBX lines of all variants before it writes the message header, so
+a run that ends early never leaves a truncated message behind.
+"""
+
+import io
+import logging
+from collections.abc import Iterable
+from dataclasses import dataclass
+from typing import Any, TextIO
+
+from biocommons.gks_conversion_tool.converter import convert_gks_to_hl7_v2
+from biocommons.gks_conversion_tool.lean import LeanStatement
+from biocommons.gks_conversion_tool.obx_templates import write_obx_segments
+from biocommons.gks_conversion_tool.oru import (
+    build_msh,
+    build_obr,
+    build_pid,
+    hl7_timestamp,
+    segment_terminator,
+)
+from biocommons.gks_conversion_tool.streaming import (
+    StreamStats,
+    create_segment_groups,
+    iter_converted_statements,
+    validate_statement,
+)
+from biocommons.gks_conversion_tool.var_concept_registry import VARIANT_INFORMATION_TABLE_LITE
+from biocommons.models import OBXSegmentGroupLite, validate_lite_segment_groups
+
+_logger = logging.getLogger(__name__)
+
+_LETTERS = "abcdefghijklmnopqrstuvwxyz"
+
+
+def variant_identifier(index: int) -> str:
+    """
+    The identifier of the variant at 0-based `index`: a..z, then aa..zz, aaa, ...
+    (bijective base 26, like spreadsheet columns).
+
+    >>> [variant_identifier(i) for i in (0, 25, 26, 27, 701, 702)]
+    ['a', 'z', 'aa', 'ab', 'zz', 'aaa']
+    """
+    if index < 0:
+        msg = f"Variant index must not be negative, got {index}"
+        raise ValueError(msg)
+    letters = []
+    index += 1
+    while index:
+        index, remainder = divmod(index - 1, 26)
+        letters.append(_LETTERS[remainder])
+    return "".join(reversed(letters))
+
+
+@dataclass
+class ReportStats:
+    variants: int = 0
+    segments: int = 0
+    # statements left out of the report because they failed to convert
+    errors: int = 0
+
+
+class ReportBuilder:
+    """
+    Writes the OBX segments of one patient's variants to `out`, allocating the
+    variant identifiers and numbering OBX-1 across the whole report.
+
+    A variant that fails to convert raises before anything of it is written and
+    does not use up an identifier, so the report stays consistent if the caller
+    skips it and carries on.
+    """
+
+    def __init__(self, out: TextIO, terminator: str = segment_terminator, start_line: int = 1):
+        self.out = out
+        self.terminator = terminator
+        self.next_line = start_line
+        self.stats = ReportStats()
+
+    @property
+    def next_variant_identifier(self) -> str:
+        return variant_identifier(self.stats.variants)
+
+    def add_statement(self, record: dict[str, Any] | LeanStatement) -> str:
+        """Convert a Statement (a raw dict is validated first) and write it as the next variant."""
+        statement = validate_statement(record) if isinstance(record, dict) else record
+        identifier = self.next_variant_identifier
+        return self._write(create_segment_groups(convert_gks_to_hl7_v2(statement), identifier), identifier)
+
+    def add_variant_information(self, variant_information: dict[str, Any]) -> str:
+        """Write a variant information dict (as for createVARSegmentsGroupsLite) as the next variant."""
+        identifier = self.next_variant_identifier
+        segment_groups = VARIANT_INFORMATION_TABLE_LITE.build(variant_information, identifier)
+        validate_lite_segment_groups(segment_groups)
+        return self._write(segment_groups, identifier)
+
+    def _write(self, segment_groups: list[OBXSegmentGroupLite], identifier: str) -> str:
+        """Write one variant's groups; returns its identifier."""
+        next_line = write_obx_segments(segment_groups, self.out, self.terminator, self.next_line)
+        self.stats.segments += next_line - self.next_line
+        self.stats.variants += 1
+        self.next_line = next_line
+        return identifier
+
+
+def write_report(
+    records: Iterable[Any],
+    out: TextIO,
+    message_control_id: str,
+    patient_id: str = "",
+    patient_name: str = "",
+    filler_order_number: str = "",
+    errors_out: TextIO | None = None,
+    lean: bool = False,
+    **msh_fields: str,
+) -> ReportStats:
+    """
+    Write one ORU^R01 message for all of a patient's Statements: MSH, PID and OBR,
+    then the OBX segments of every variant, each segment terminated by a carriage
+    return.
+
+    All statements are converted before anything is written. A statement that
+    fails is left out of the report, counted in ReportStats.errors and reported
+    as in streaming.iter_converted_statements (see there for the records
+    accepted and `lean`). Extra keyword arguments are passed on to build_msh.
+    """
+    body = io.StringIO()
+    builder = ReportBuilder(body)
+    stats = StreamStats()
+    for _ in iter_converted_statements(records, stats, errors_out, lean, builder.add_statement):
+        pass
+    builder.stats.errors = stats.errors
+
+    timestamp = msh_fields.pop("timestamp", None) or hl7_timestamp()
+    for segment in (
+        build_msh(message_control_id, timestamp=timestamp, **msh_fields),
+        build_pid(patient_id, patient_name),
+        build_obr(filler_order_number, timestamp),
+    ):
+        out.write(segment)
+        out.write(segment_terminator)
+    out.write(body.getvalue())
+
+    _logger.info(
+        "Wrote a report of %d variants (%d OBX segments, %d statements left out)",
+        builder.stats.variants,
+        builder.stats.segments,
+        builder.stats.errors,
+    )
+    return builder.stats
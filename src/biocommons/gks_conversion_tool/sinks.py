@@ -0,0 +1,264 @@
+"""Buffered, compressed and rotating output files for HL7 v2 messages
+
+An HL7Sink takes whole messages, either one statement's OBX segments or a
+complete ORU^R01 message, and collects their encoded bytes in one large buffer.
+The file is written only when the buffer fills, so a run makes a few large
+writes instead of one per segment. Every segment is terminated by a carriage
+return.
+
+Options:
+  - compression: gzip, or zstd with the zstandard package
+    (pip install 'biocommons-example[zstd]'). By default this is chosen from
+    the file name (.gz, .zst).
+  - rotation: a new file is started once the current one holds `max_messages`
+    messages or `max_bytes` bytes before compression. Files are numbered
+    results.0001.hl7.gz, results.0002.hl7.gz, ...
+  - envelope: each file is one HL7 batch, FHS and BHS ... BTS and FTS. BTS-1
+    counts the messages in the file, and FTS-1 counts its single batch.
+
+A file is only rotated between writes, so a message is never split across files.
+"""
+
+import gzip
+import logging
+import time
+from collections.abc import Iterable, Sequence
+from dataclasses import dataclass
+from pathlib import Path
+from types import TracebackType
+from typing import IO, Any
+
+from biocommons.gks_conversion_tool.oru import (
+    build_bhs,
+    build_bts,
+    build_fhs,
+    build_fts,
+    build_oru_r01,
+    hl7_timestamp,
+    segment_terminator,
+)
+from biocommons.gks_conversion_tool.streaming import (
+    StreamStats,
+    iter_converted_statements,
+    log_stats,
+)
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - depends on the environment
+    zstandard = None
+
+_logger = logging.getLogger(__name__)
+
+# Bytes collected before each write to the file
+DEFAULT_BUFFER_SIZE = 1 << 20
+
+COMPRESSION_SUFFIXES = {".gz": "gzip", ".zst": "zstd"}
+
+# Levels chosen for throughput; gzip's own default of 9 is several times slower
+DEFAULT_LEVELS = {"gzip": 6, "zstd": 3}
+
+
+def compression_for(path: Path) -> str | None:
+    """The compression implied by a file name, or None."""
+    return COMPRESSION_SUFFIXES.get(path.suffix.lower())
+
+
+@dataclass
+class SinkStats:
+    files: int = 0
+    messages: int = 0
+    segments: int = 0
+    # before compression, including envelope segments
+    bytes: int = 0
+
+
+class HL7Sink:
+    """
+    Writes HL7 v2 messages to `path`, or to numbered files next to it when
+    rotating. Use as a context manager, or call close() to write the last
+    envelope trailer and flush.
+    """
+
+    def __init__(
+        self,
+        path: Path | str,
+        compression: str | None = None,
+        max_messages: int | None = None,
+        max_bytes: int | None = None,
+        envelope: bool = False,
+        buffer_size: int = DEFAULT_BUFFER_SIZE,
+        level: int | None = None,
+        sending_application: str = "GKS-CONVERSION-TOOL",
+        sending_facility: str = "",
+    ):
+        self.path = Path(path)
+        self.compression = compression if compression is not None else compression_for(self.path)
+        if self.compression not in (None, *DEFAULT_LEVELS):
+            msg = f"Unknown compression {self.compression!r}; expected one of {', '.join(DEFAULT_LEVELS)}"
+            raise ValueError(msg)
+        if self.compression == "zstd" and zstandard is None:
+            msg = "zstd compression requires the zstandard package (pip install 'biocommons-example[zstd]')"
+            raise ImportError(msg)
+        self.level = level if level is not None else DEFAULT_LEVELS.get(self.compression)
+        self.max_messages = max_messages
+        self.max_bytes = max_bytes
+        self.envelope = envelope
+        self.buffer_size = buffer_size
+        self.sending_application = sending_application
+        self.sending_facility = sending_facility
+        self.terminator = segment_terminator
+        self.stats = SinkStats()
+        self.paths: list[Path] = []
+
+        self._timestamp = hl7_timestamp()
+        self._raw: IO[bytes] | None = None
+        self._stream: IO[bytes] | None = None
+        self._buffer = bytearray()
+        self._file_messages = 0
+        self._file_bytes = 0
+
+    def __enter__(self) -> "HL7Sink":
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc: BaseException | None,
+        traceback: TracebackType | None,
+    ) -> None:
+        self.close()
+
+    @property
+    def rotating(self) -> bool:
+        return bool(self.max_messages or self.max_bytes)
+
+    def write_message(self, segments: Sequence[str]) -> None:
+        """Write one message given as its segments, without terminators."""
+        terminator = self.terminator
+        self.write(terminator.join(segments) + terminator, segments=len(segments))
+
+    def write(self, text: str, messages: int = 1, segments: int = 0) -> None:
+        """
+        Write `messages` whole messages whose segments are already terminated.
+        `segments` is only counted in the stats.
+        """
+        if self._stream is None:
+            self._open_file()
+        self._append(text.encode())
+        self._file_messages += messages
+        self.stats.messages += messages
+        self.stats.segments += segments
+        if len(self._buffer) >= self.buffer_size:
+            self._flush_buffer()
+        if self.rotating and self._is_full():
+            self._close_file()
+
+    def close(self) -> None:
+        if self._stream is None and not self.paths:
+            # nothing was written; still leave an (empty) file behind
+            self._open_file()
+        if self._stream is not None:
+            self._close_file()
+            _logger.info(
+                "Wrote %d messages (%d segments, %d bytes) to %d files",
+                self.stats.messages,
+                self.stats.segments,
+                self.stats.bytes,
+                self.stats.files,
+            )
+
+    # --- Files ---------------------------------------------------------------
+
+    def _file_path(self, number: int) -> Path:
+        """path itself, or with the file number in front of its suffixes when rotating."""
+        if not self.rotating:
+            return self.path
+        # results.hl7.gz -> results, .hl7 and .gz
+        compressed_suffix = self.path.suffix if compression_for(self.path) else ""
+        base = self.path.with_suffix("") if compressed_suffix else self.path
+        return self.path.with_name(f"{base.stem}.{number:04d}{base.suffix}{compressed_suffix}")
+
+    def _open_file(self) -> None:
+        number = self.stats.files + 1
+        path = self._file_path(number)
+        self._raw = path.open("wb")
+        if self.compression == "gzip":
+            self._stream = gzip.GzipFile(fileobj=self._raw, mode="wb", compresslevel=self.level)
+        elif self.compression == "zstd":
+            self._stream = zstandard.ZstdCompressor(level=self.level).stream_writer(self._raw, closefd=False)
+        else:
+            self._stream = self._raw
+        self.paths.append(path)
+        self.stats.files = number
+        self._file_messages = 0
+        self._file_bytes = 0
+
+        if self.envelope:
+            control_id = f"{self._timestamp}.{number}"
+            header = (
+                build_fhs(control_id, self.sending_application, self.sending_facility, self._timestamp),
+                build_bhs(control_id, self.sending_application, self.sending_facility, self._timestamp),
+            )
+            self._append(self._terminated(header))
+        _logger.debug("Opened %s", path)
+
+    def _close_file(self) -> None:
+        if self.envelope:
+            self._append(self._terminated((build_bts(self._file_messages), build_fts(1))))
+        self._flush_buffer()
+        if self._stream is not self._raw:
+            self._stream.close()
+        self._raw.close()
+        self._stream = self._raw = None
+
+    def _is_full(self) -> bool:
+        return (self.max_messages is not None and self._file_messages >= self.max_messages) or (
+            self.max_bytes is not None and self._file_bytes >= self.max_bytes
+        )
+
+    # --- Buffer --------------------------------------------------------------
+
+    def _terminated(self, segments: Iterable[str]) -> bytes:
+        return "".join(segment + self.terminator for segment in segments).encode()
+
+    def _append(self, data: bytes) -> None:
+        self._buffer += data
+        self._file_bytes += len(data)
+        self.stats.bytes += len(data)
+
+    def _flush_buffer(self) -> None:
+        if self._buffer:
+            self._stream.write(self._buffer)
+            self._buffer.clear()
+
+
+def stream_to_sink(
+    records: Iterable[Any],
+    sink: HL7Sink,
+    control_id_prefix: str | None = None,
+    errors_out: IO[str] | None = None,
+    lean: bool = False,
+) -> StreamStats:
+    """
+    Convert each record and write it to `sink` as one message: its OBX segments,
+    or with a `control_id_prefix` an ORU^R01 message as in streaming.iter_oru_messages.
+
+    Failed statements are skipped and reported as in streaming.stream_obx_segments.
+    """
+    stats = StreamStats()
+    start = time.perf_counter()
+
+    for index, statement_id, segments in iter_converted_statements(records, stats, errors_out, lean):
+        if control_id_prefix is None:
+            sink.write_message(segments)
+        else:
+            message = build_oru_r01(
+                segments, message_control_id=f"{control_id_prefix}{index + 1}", filler_order_number=statement_id or ""
+            )
+            sink.write(message, segments=len(segments))
+        stats.segments += len(segments)
+
+    stats.elapsed = time.perf_counter() - start
+    log_stats(stats)
+    return stats
@@ -0,0 +1,249 @@
+"""Streaming batch conversion of VA-Spec Statements to HL7 v2 OBX segments"""
+
+import json
+import logging
+import time
+from collections.abc import Callable, Iterable, Iterator
+from dataclasses import dataclass
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, TextIO
+
+from biocommons.gks_conversion_tool.converter import convert_gks_to_hl7_v2
+from biocommons.gks_conversion_tool.instrumentation import instrumented
+from biocommons.gks_conversion_tool.lean import (
+    LeanStatement,
+    iter_mmap_lines,
+    load_lean_statement,
+    loads,
+)
+from biocommons.gks_conversion_tool.obx_templates import generate_all_obx_for_variants_templated
+from biocommons.gks_conversion_tool.oru import build_oru_r01, hl7_timestamp, segment_terminator
+from biocommons.gks_conversion_tool.var_concept_registry import HL7_FIELDS_TABLE
+from biocommons.models import OBXSegmentGroupLite, validate_lite_segment_groups
+
+if TYPE_CHECKING:
+    from ga4gh.va_spec.base.core import Statement
+
+_logger = logging.getLogger(__name__)
+
+
+@dataclass
+class StreamStats:
+    """Counters reported at the end of a streaming run."""
+
+    statements: int = 0
+    segments: int = 0
+    errors: int = 0
+    elapsed: float = 0.0
+
+    @property
+    def statements_per_second(self) -> float:
+        return self.statements / self.elapsed if self.elapsed else 0.0
+
+
+# --- Input -------------------------------------------------------------------
+
+# Variant tables, read column-wise by the columnar module instead of as Statements
+TABLE_SUFFIXES: frozenset[str] = frozenset({".parquet", ".arrow", ".feather", ".csv", ".tsv"})
+
+# Rows per record batch when reading a variant table
+DEFAULT_TABLE_BATCH_SIZE = 65536
+
+
+def iter_statement_records(source: Path | TextIO) -> Iterator[dict[str, Any]]:
+    """
+    Lazily yield raw Statement dicts from an NDJSON stream, an NDJSON file, or
+    a directory of JSON files (one Statement per file, in sorted filename order).
+
+    Blank lines in NDJSON input are skipped. Nothing is read ahead of the consumer.
+    """
+    for text in iter_statement_texts(source):
+        yield loads(text)
+
+
+def iter_lean_statements(source: Path | TextIO) -> Iterator[LeanStatement]:
+    """
+    Like iter_statement_records, but yields LeanStatement views instead of dicts.
+    NDJSON files are memory-mapped and each line is decoded in place.
+    """
+    for data in iter_statement_data(source):
+        yield load_lean_statement(data)
+
+
+def iter_statement_texts(source: Path | TextIO) -> Iterator[str]:
+    """
+    Same as iter_statement_records, but yields the undecoded JSON text of each Statement.
+
+    Used where decoding should happen somewhere else, e.g. in a worker process.
+    """
+    if isinstance(source, Path):
+        if source.is_dir():
+            for json_path in sorted(source.glob("*.json")):
+                yield json_path.read_text()
+            return
+        with source.open() as fh:
+            yield from _iter_ndjson(fh)
+        return
+    yield from _iter_ndjson(source)
+
+
+def iter_statement_data(source: Path | TextIO) -> Iterator[str | memoryview]:
+    """
+    Like iter_statement_texts, but NDJSON files are memory-mapped and each line is
+    yielded as a memoryview, only valid until the next one is requested.
+    """
+    if isinstance(source, Path) and not source.is_dir():
+        yield from iter_mmap_lines(source)
+        return
+    yield from iter_statement_texts(source)
+
+
+def _iter_ndjson(lines: Iterable[str]) -> Iterator[str]:
+    for line in lines:
+        if stripped := line.strip():
+            yield stripped
+
+
+# --- Conversion --------------------------------------------------------------
+
+@instrumented("create_segment_groups")
+def create_segment_groups(hl7_fields: dict[str, Any], variant_identifier: str) -> list[OBXSegmentGroupLite]:
+    """
+    Build OBX segment groups from the dict returned by convert_gks_to_hl7_v2.
+
+    Fields the converter could not populate are left out rather than emitted empty.
+    Groups use the lightweight models and are validated once, after all are built.
+    """
+    segment_groups = HL7_FIELDS_TABLE.build(hl7_fields, variant_identifier)
+    validate_lite_segment_groups(segment_groups)
+    return segment_groups
+
+
+@instrumented("validate_statement")
+def validate_statement(record: dict[str, Any]) -> "Statement":
+    # Imported on first use: loading the VA-Spec models takes most of the startup time
+    from ga4gh.va_spec.base.core import Statement  # noqa: PLC0415
+
+    return Statement.model_validate(record)
+
+
+def convert_statement_record(record: "dict[str, Any] | LeanStatement | Statement", variant_identifier: str = "a") -> list[str]:
+    """
+    Return the OBX segments for one Statement.
+
+    A raw dict is validated as a full ga4gh Statement first; a Statement or
+    LeanStatement is converted as is.
+    """
+    statement = validate_statement(record) if isinstance(record, dict) else record
+    hl7_fields = convert_gks_to_hl7_v2(statement)
+    return generate_all_obx_for_variants_templated(create_segment_groups(hl7_fields, variant_identifier))
+
+
+def iter_converted_statements(
+    records: Iterable[Any],
+    stats: StreamStats,
+    errors_out: TextIO | None = None,
+    lean: bool = False,
+    convert: Callable[[Any], Any] = convert_statement_record,
+) -> Iterator[tuple[int, Any, Any]]:
+    """
+    Convert each record with `convert` and yield (index, statement id, what it
+    returns: by default the OBX segments), where index is the record's position
+    in the input.
+
+    Records may also be undecoded Statement JSON (see iter_statement_data), which
+    is decoded here, as a LeanStatement if `lean` is set. A record that fails to
+    decode or convert does not stop the run: it is counted in `stats.errors` and
+    reported as in parallel.convert_chunk (see report_error). Every record is
+    counted in `stats.statements`.
+    """
+    for index, item in enumerate(records):
+        stats.statements += 1
+        statement_id = None
+        try:
+            record = loads(item) if isinstance(item, str | bytes | memoryview) else item
+            statement_id = get_statement_id(record)
+            segments = convert(LeanStatement(record) if lean and isinstance(record, dict) else record)
+        except Exception as e:  # any failure becomes an error record
+            stats.errors += 1
+            report_error({"index": index, "id": statement_id, "error": f"{type(e).__name__}: {e}"}, errors_out)
+            continue
+        yield index, statement_id, segments
+
+
+def get_statement_id(record: Any) -> Any:
+    """Return the id of a Statement dict, Statement or LeanStatement, or None."""
+    return record.get("id") if isinstance(record, dict) else getattr(record, "id", None)
+
+
+def report_error(error: dict[str, Any], errors_out: TextIO | None = None) -> None:
+    """Write a failed statement's error record to `errors_out` as one JSON line, or log it."""
+    if errors_out is not None:
+        errors_out.write(json.dumps(error) + "\n")
+    else:
+        _logger.warning("Statement %(index)d (%(id)s) failed: %(error)s", error)
+
+
+# --- Output ------------------------------------------------------------------
+
+
+def stream_obx_segments(
+    records: Iterable[Any], out: TextIO, errors_out: TextIO | None = None, lean: bool = False
+) -> StreamStats:
+    """
+    Convert each record and write its OBX segments to `out` as soon as they are built.
+
+    Only one statement is held in memory at a time. A statement that fails is
+    skipped and written to `errors_out`, or logged (see iter_converted_statements
+    for the records accepted and `lean`). Returns counters and elapsed time so
+    callers can report throughput.
+    """
+    stats = StreamStats()
+    start = time.perf_counter()
+
+    for _, _, segments in iter_converted_statements(records, stats, errors_out, lean):
+        for segment in segments:
+            out.write(segment)
+            out.write(segment_terminator)
+        stats.segments += len(segments)
+
+    stats.elapsed = time.perf_counter() - start
+    log_stats(stats)
+    return stats
+
+
+def iter_oru_messages(
+    records: Iterable[Any],
+    control_id_prefix: str | None = None,
+    stats: StreamStats | None = None,
+    errors_out: TextIO | None = None,
+    lean: bool = False,
+) -> Iterator[str]:
+    """
+    Convert each record into a complete ORU^R01 message, one message per statement.
+
+    Message control IDs are `control_id_prefix` (default: the current time as
+    YYMMDDHHMMSS) followed by the statement's position in the input. A statement's
+    id, if it has one, is sent as the OBR filler order number.
+
+    A statement that fails is skipped, counted in `stats` if given and reported
+    as in iter_converted_statements (see there for the records accepted and `lean`).
+    """
+    prefix = control_id_prefix if control_id_prefix is not None else hl7_timestamp()[2:] + "."
+    stats = stats if stats is not None else StreamStats()
+    for index, statement_id, segments in iter_converted_statements(records, stats, errors_out, lean):
+        stats.segments += len(segments)
+        yield build_oru_r01(
+            segments, message_control_id=f"{prefix}{index + 1}", filler_order_number=statement_id or ""
+        )
+
+
+def log_stats(stats: StreamStats) -> None:
+    _logger.info(
+        "Converted %d statements (%d segments, %d errors) in %.2fs: %.1f statements/s",
+        stats.statements,
+        stats.segments,
+        stats.errors,
+        stats.elapsed,
+        stats.statements_per_second,
+    )
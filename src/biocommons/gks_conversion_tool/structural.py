@@ -0,0 +1,150 @@
+"""Fields of structural and copy-number variants
+
+The ends of a structural variant are often only known to lie within a range.
+VRS gives such a SequenceLocation a Range [low, high] for its start and/or end
+instead of an int, and either bound of a Range may be None (unbounded); in
+Statement JSON a Range is a plain two-element list. A copy-number variant is a
+CopyNumberCount (`copies`, an int or a Range) or a CopyNumberChange
+(`copyChange`, e.g. "gain" or "low-level loss") on such a location.
+
+The bounds of a location give two intervals:
+  - inner: from the highest possible start to the lowest possible end, the
+    region the variant certainly covers (546, and 511 and 545);
+  - outer: from the lowest possible start to the highest possible end, the
+    region it may cover (547).
+A precise end is both its own low and high bound. When the ranges of the two
+ends overlap, the highest possible start can lie after the lowest possible end;
+there is no region the variant certainly covers, so 546 is left out and 511 and
+545 are taken from the outer interval.
+
+The exons and introns that the inner interval overlaps (572, 573) come from the
+exon table of a reference.ReferenceIndex.
+"""
+
+from typing import TYPE_CHECKING, Any, NamedTuple
+
+if TYPE_CHECKING:
+    from ga4gh.vrs.models import SequenceLocation
+
+    from biocommons.gks_conversion_tool.reference import ExonHit, ReferenceIndex
+
+COPY_NUMBER_TYPES = frozenset({"CopyNumberCount", "CopyNumberChange"})
+
+
+class LocationBounds(NamedTuple):
+    outer_start: int | None
+    inner_start: int | None
+    inner_end: int | None
+    outer_end: int | None
+
+    @property
+    def precise(self) -> bool:
+        return self.outer_start == self.inner_start and self.inner_end == self.outer_end
+
+    @property
+    def inner_empty(self) -> bool:
+        """Whether the ends overlap so far that the inner start is after the inner end."""
+        return self.inner_start is not None and self.inner_end is not None and self.inner_start > self.inner_end
+
+    @property
+    def start(self) -> int | None:
+        """The inner start, or the outer one if that is unbounded or the inner interval is empty."""
+        if self.inner_start is None or self.inner_empty:
+            return self.outer_start
+        return self.inner_start
+
+    @property
+    def end(self) -> int | None:
+        """The inner end, or the outer one if that is unbounded or the inner interval is empty."""
+        if self.inner_end is None or self.inner_empty:
+            return self.outer_end
+        return self.inner_end
+
+
+def _bounds(coordinate: Any) -> tuple[int | None, int | None]:
+    """(low, high) of an int, a VRS Range, a [low, high] list or None."""
+    if coordinate is None or type(coordinate) is int:
+        return coordinate, coordinate
+    # ga4gh.vrs.models.Range is a RootModel around the list
+    low, high = getattr(coordinate, "root", coordinate)
+    return low, high
+
+
+def is_structural(variation: Any, location: "SequenceLocation") -> bool:
+    """Whether a variation needs the structural fields: a copy-number variant, or a location with a Range end."""
+    if getattr(variation, "type", None) in COPY_NUMBER_TYPES:
+        return True
+    start, end = location.start, location.end
+    return not ((start is None or type(start) is int) and (end is None or type(end) is int))
+
+
+def location_bounds(location: "SequenceLocation") -> LocationBounds:
+    start_low, start_high = _bounds(location.start)
+    end_low, end_high = _bounds(location.end)
+    return LocationBounds(start_low, start_high, end_low, end_high)
+
+
+def copy_number(variation: Any) -> int | None:
+    """The copies of a CopyNumberCount, if exact (an int or a Range with equal bounds)."""
+    low, high = _bounds(getattr(variation, "copies", None))
+    return low if low is not None and low == high else None
+
+
+def variant_type(variation: Any) -> str | None:
+    """503 for a copy-number variant, e.g. "Copy number gain"; None for other variations."""
+    variation_type = getattr(variation, "type", None)
+    if variation_type == "CopyNumberChange":
+        copy_change = getattr(variation, "copyChange", None)
+        if copy_change:
+            # CopyChange is a str Enum in the full models and a plain str in lean ones
+            return f"Copy number {getattr(copy_change, 'value', copy_change)}"
+    if variation_type in COPY_NUMBER_TYPES:
+        return "Copy number variation"
+    return None
+
+
+def structural_fields(variation: Any, location: "SequenceLocation") -> tuple[int | None, int | None, dict[str, Any]]:
+    """
+    (511.1 start, 511.2 end, the other fields by HL7V2 name) of a structural
+    variation. Fields that are unknown are left out of the dict.
+    """
+    bounds = location_bounds(location)
+    start, end = bounds.start, bounds.end
+    fields: dict[str, Any] = {}
+    if start is not None and end is not None and start <= end:
+        fields["ALLELE_LENGTH"] = end - start
+    if not bounds.precise:
+        if bounds.inner_start is not None and bounds.inner_end is not None and not bounds.inner_empty:
+            fields["STRUCTURAL_INNER_START"] = bounds.inner_start
+            fields["STRUCTURAL_INNER_END"] = bounds.inner_end
+        if bounds.outer_start is not None and bounds.outer_end is not None:
+            fields["STRUCTURAL_OUTER_START"] = bounds.outer_start
+            fields["STRUCTURAL_OUTER_END"] = bounds.outer_end
+    copies = copy_number(variation)
+    if copies is not None:
+        fields["COPY_NUMBER"] = copies
+    kind = variant_type(variation)
+    if kind is not None:
+        fields["VARIANT_TYPE"] = kind
+    return start, end, fields
+
+
+def exon_fields(hit: "ExonHit | None") -> dict[str, Any]:
+    """572 and 573 of an exon lookup, by HL7V2 name."""
+    fields: dict[str, Any] = {}
+    if hit is None:
+        return fields
+    if hit.exons is not None:
+        fields["AFFECTED_EXON_START"], fields["AFFECTED_EXON_END"] = hit.exons
+    if hit.introns is not None:
+        fields["AFFECTED_INTRON_START"], fields["AFFECTED_INTRON_END"] = hit.introns
+    return fields
+
+
+def affected_exons(
+    reference: "ReferenceIndex", accession: str | None, start: int | None, end: int | None, transcript: str | None
+) -> "ExonHit | None":
+    """Look up the exons of [start, end) on `accession`, or None if any of them is unknown."""
+    if accession is None or start is None or end is None or start > end:
+        return None
+    return reference.affected_exons(accession, start, end, transcript)
@@ -0,0 +1,39 @@
+from biocommons.gks_conversion_tool.instrumentation import instrumented
+from biocommons.gks_conversion_tool.var_concept_registry import (
+    VARIANT_INFORMATION_TABLE,
+    VARIANT_INFORMATION_TABLE_LITE,
+)
+from biocommons.models import OBXSegmentGroup, OBXSegmentGroupLite, validate_lite_segment_groups
+
+# This is testing code and can be removed later
+variant_information: dict[str, str] = {}
+variant_information["DNA_CHANGE"] = "c.37556K>T"
+variant_information["TRANSCRIPT_REFERENCE_SEQUENCE"] = "NM_37556.1"
+variant_information["GENE_STUDIED"] = "BRAF"
+variant_information["GENE_ID"] = "HGNC:1097"
+variant_information["GENOMIC_REFERENCE_SEQUENCE_ID"] = "NC_000003.7"
+variant_information["AMINO_ACID_CHANGE"] = "p.Asp123Arg"
+variant_information["PROTEIN_REFERENCE_SEQUENCE"] = "NP_37556.3"
+variant_information["GENOMIC_DNA_CHANGE"] = "g.3755637556K>T"
+variant_information["VARIANT_CLASSIFICATION"] = "Likely Pathogenic"
+
+
+@instrumented("create_var_segments_groups")
+def createVARSegmentsGroups(variant_information: dict[str, str], variant_identifier: str) -> list[OBXSegmentGroup]:
+    """Segment groups for every VAR concept in the registry that variant_information has a value for"""
+    return VARIANT_INFORMATION_TABLE.build(variant_information, variant_identifier)
+
+
+@instrumented("create_var_segments_groups_lite")
+def createVARSegmentsGroupsLite(variant_information: dict[str, str], variant_identifier: str) -> list[OBXSegmentGroupLite]:  # noqa: N802
+    """Same groups as createVARSegmentsGroups, built from the __slots__ classes and validated once at the end"""
+    segment_groups = VARIANT_INFORMATION_TABLE_LITE.build(variant_information, variant_identifier)
+    validate_lite_segment_groups(segment_groups)
+    return segment_groups
+
+
+if __name__ == "__main__":
+    from biocommons.gks_conversion_tool.obx_segment_generator import print_obx_segments
+
+    segments = createVARSegmentsGroups(variant_information=variant_information, variant_identifier="a")
+    print_obx_segments(segments)
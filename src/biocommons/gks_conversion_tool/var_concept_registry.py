@@ -0,0 +1,291 @@
+"""Declarative mapping of VAR concepts to OBX segment groups
+
+VAR_CONCEPT_REGISTRY lists, in OBX order, where each VAR concept's value comes
+from and how it is sent: data type, coding system, and whether it is required.
+compile_registry turns it into a SegmentGroupTable, a flat list of (key,
+builder) pairs resolved once, so emitting a variant is a single loop of dict
+lookups that skips the concepts the variant has no value for.
+
+Two kinds of input are supported:
+  - variant information dicts keyed by HL7V2 names ("DNA_CHANGE"), as used by
+    var_concept_creator.createVARSegmentsGroups
+  - HL7 field dicts keyed by field identifier ("518"), as returned by
+    convert_gks_to_hl7_v2
+"""
+
+from collections.abc import Callable
+from dataclasses import dataclass
+from typing import Any
+
+from biocommons.gks_conversion_tool.converter import HL7V2
+from biocommons.models import (
+    ObservationTypes,
+    OBXSegmentCWE,
+    OBXSegmentCWELite,
+    OBXSegmentGroup,
+    OBXSegmentGroupLite,
+    OBXSegmentNM,
+    OBXSegmentNMLite,
+    OBXSegmentNR,
+    OBXSegmentNRLite,
+    OBXSegmentST,
+    OBXSegmentSTLite,
+    VARConcepts,
+)
+
+ST = ObservationTypes.STRING
+NM = ObservationTypes.NUMERIC
+NR = ObservationTypes.NUMERICRANGE
+CWE = ObservationTypes.CODEABLECONCEPT
+
+
+@dataclass(frozen=True)
+class VARConceptMapping:
+    """
+    How one VAR concept is filled in.
+
+    `source` is the HL7V2 name of the field holding the value, or a (start, end)
+    pair of names for a numeric range. CWE values are sent as code and label
+    with `coding_system` if one is given (the code comes from `code_source` when
+    set, otherwise it is the value itself), and as a label alone otherwise.
+    `default` is sent when a variant information dict has no value. A `required`
+    concept must have a value in every converted statement (see
+    compile_registry's use_required).
+    """
+
+    concept: VARConcepts
+    source: str | tuple[str, str]
+    observation_type: ObservationTypes
+    coding_system: str | None = None
+    code_source: str | None = None
+    required: bool = False
+    default: Any = None
+    # older variant information keys accepted for `source`
+    aliases: tuple[str, ...] = ()
+
+
+VAR_CONCEPT_REGISTRY: tuple[VARConceptMapping, ...] = (
+    VARConceptMapping(VARConcepts.VARCONCEPT503, "VARIANT_TYPE", CWE, default="Simple"),
+    VARConceptMapping(VARConcepts.VARCONCEPT504, "VARIANT_NAME", ST, required=True),
+    VARConceptMapping(VARConcepts.VARCONCEPT509, "GENOME_ASSEMBLY", CWE),
+    VARConceptMapping(VARConcepts.VARCONCEPT510, "CHROMOSOME", CWE),
+    VARConceptMapping(VARConcepts.VARCONCEPT511, ("ALLELE_START", "ALLELE_END"), NR, required=True),
+    VARConceptMapping(VARConcepts.VARCONCEPT513, "DNA_REGION", CWE),
+    VARConceptMapping(VARConcepts.VARCONCEPT514, "GENE_STUDIED", CWE, "HGNC", code_source="GENE_ID"),
+    VARConceptMapping(
+        VARConcepts.VARCONCEPT516,
+        "TRANSCRIPT_REFERENCE_SEQUENCE_ID",
+        CWE,
+        "RefSeq-T",
+        aliases=("TRANSCRIPT_REFERENCE_SEQUENCE",),
+    ),
+    VARConceptMapping(VARConcepts.VARCONCEPT518, "DNA_CHANGE", CWE, "HGVS.c"),
+    VARConceptMapping(VARConcepts.VARCONCEPT520, "AMINO_ACID_CHANGE", CWE, "HGVS.p"),
+    VARConceptMapping(VARConcepts.VARCONCEPT521, "MOLECULAR_CONSEQUENCE", CWE),
+    VARConceptMapping(VARConcepts.VARCONCEPT522, "PROTEIN_REFERENCE_SEQUENCE", ST),
+    VARConceptMapping(VARConcepts.VARCONCEPT524, "GENOMIC_REFERENCE_SEQUENCE_ID", CWE, "RefSeq-G"),
+    VARConceptMapping(VARConcepts.VARCONCEPT526, "REFERENCE_ALLELE", ST),
+    VARConceptMapping(VARConcepts.VARCONCEPT527, "OBSERVED_ALLELE", ST),
+    VARConceptMapping(VARConcepts.VARCONCEPT528, "GENOMIC_DNA_CHANGE", CWE, "HGVS.g"),
+    VARConceptMapping(VARConcepts.VARCONCEPT529, "ALLELE_NAME", ST),
+    VARConceptMapping(VARConcepts.VARCONCEPT530, "ALLELIC_STATE", CWE),
+    VARConceptMapping(VARConcepts.VARCONCEPT532, "CYTOGENETIC_LOCATION", ST),
+    VARConceptMapping(VARConcepts.VARCONCEPT534, "PENETRANCE", CWE),
+    VARConceptMapping(VARConcepts.VARCONCEPT535, "GENETIC_VARIANT_SOURCE", CWE),
+    VARConceptMapping(VARConcepts.VARCONCEPT545, "ALLELE_LENGTH", NM),
+    VARConceptMapping(VARConcepts.VARCONCEPT546, ("STRUCTURAL_INNER_START", "STRUCTURAL_INNER_END"), NR),
+    VARConceptMapping(VARConcepts.VARCONCEPT547, ("STRUCTURAL_OUTER_START", "STRUCTURAL_OUTER_END"), NR),
+    VARConceptMapping(VARConcepts.VARCONCEPT550, "COPY_NUMBER", NM),
+    VARConceptMapping(VARConcepts.VARCONCEPT552, "GENETIC_VARIANT_ASSESSMENT", CWE, default="Detected"),
+    VARConceptMapping(VARConcepts.VARCONCEPT553, "VARIANT_CLASSIFICATION", CWE),
+    VARConceptMapping(VARConcepts.VARCONCEPT554, "INTERPRETATION", CWE),
+    VARConceptMapping(VARConcepts.VARCONCEPT560, "MODE_OF_INHERITANCE", CWE),
+    VARConceptMapping(VARConcepts.VARCONCEPT561, "FUNCTIONAL_EFFECT", CWE),
+    VARConceptMapping(VARConcepts.VARCONCEPT564, "REPEAT_NUCLEOTIDES", ST),
+    VARConceptMapping(VARConcepts.VARCONCEPT565, "REPEAT_NUMBER", NM),
+    VARConceptMapping(VARConcepts.VARCONCEPT572, ("AFFECTED_EXON_START", "AFFECTED_EXON_END"), NR),
+    VARConceptMapping(VARConcepts.VARCONCEPT573, ("AFFECTED_INTRON_START", "AFFECTED_INTRON_END"), NR),
+    VARConceptMapping(VARConcepts.VARCONCEPT575, "INTERPRETATION_NOTE", ST),
+)
+
+
+# --- Compilation -------------------------------------------------------------
+
+# Segment classes by model flavor: (ST, NM, NR, CWE, group)
+_PYDANTIC_CLASSES = (OBXSegmentST, OBXSegmentNM, OBXSegmentNR, OBXSegmentCWE, OBXSegmentGroup)
+_LITE_CLASSES = (OBXSegmentSTLite, OBXSegmentNMLite, OBXSegmentNRLite, OBXSegmentCWELite, OBXSegmentGroupLite)
+
+_MISSING = object()
+
+# (value, code, variant_identifier) -> segment group
+GroupBuilder = Callable[[Any, Any, str], Any]
+
+
+def field_key(name: str, concept: VARConcepts) -> str:
+    """HL7 field identifier of an HL7V2 name; concepts without one are keyed by their number."""
+    return HL7V2.get(name) or concept.name.removeprefix("VARCONCEPT")
+
+
+def _group_builder(mapping: VARConceptMapping, lite: bool) -> GroupBuilder:
+    st, nm, nr, cwe, group = _LITE_CLASSES if lite else _PYDANTIC_CLASSES
+    concept = mapping.concept
+    observation_type = mapping.observation_type
+    coding_system = mapping.coding_system
+
+    if lite:
+
+        def make_group(segment, variant_identifier):
+            return group([segment], observation_type, variant_identifier, concept)
+
+    else:
+
+        def make_group(segment, variant_identifier):
+            return group(
+                segments=[segment],
+                observation_type=observation_type,
+                variant_identifier=variant_identifier,
+                segment_identifier=concept,
+            )
+
+    # only builders with a code_source use the code
+    if observation_type is ST:
+        return lambda value, _code, variant_identifier: make_group(st(value=value), variant_identifier)
+    if observation_type is NM:
+        return lambda value, _code, variant_identifier: make_group(nm(value=value), variant_identifier)
+    if observation_type is NR:
+        return lambda value, _code, variant_identifier: make_group(
+            nr(lower_bound=value[0], upper_bound=value[1]), variant_identifier
+        )
+    if coding_system is None:
+        return lambda value, _code, variant_identifier: make_group(cwe(label=value), variant_identifier)
+    if mapping.code_source is None:
+        return lambda value, _code, variant_identifier: make_group(
+            cwe(code=value, coding_system=coding_system, label=value), variant_identifier
+        )
+    return lambda value, code, variant_identifier: make_group(
+        cwe(code=code, coding_system=coding_system, label=value) if code is not None else cwe(label=value),
+        variant_identifier,
+    )
+
+
+@dataclass(frozen=True)
+class _CompiledEntry:
+    concept: VARConcepts
+    # lookup keys for the value, tried in order; a pair for ranges
+    keys: tuple[str, ...]
+    range_keys: tuple[str, str] | None
+    code_key: str | None
+    required: bool
+    default: Any
+    build: GroupBuilder
+
+
+class SegmentGroupTable:
+    """
+    A compiled registry: builds the segment groups for one variant in a single
+    pass over its entries.
+
+    A concept is skipped when its key is missing from the input or, with
+    skip_empty, when the value is None or "". A skipped required concept raises
+    ValueError.
+    """
+
+    __slots__ = ("entries", "skip_empty")
+
+    def __init__(self, entries: list[_CompiledEntry], skip_empty: bool):
+        self.entries = tuple(entries)
+        self.skip_empty = skip_empty
+
+    def build(self, fields: dict[str, Any], variant_identifier: str) -> list:
+        get = fields.get
+        skip_empty = self.skip_empty
+        groups = []
+
+        for entry in self.entries:
+            range_keys = entry.range_keys
+            if range_keys is None:
+                value = _MISSING
+                for key in entry.keys:
+                    value = get(key, _MISSING)
+                    if value is not _MISSING:
+                        break
+            else:
+                start = get(range_keys[0], _MISSING)
+                end = get(range_keys[1], _MISSING)
+                missing = start is _MISSING or end is _MISSING or (skip_empty and (start is None or end is None))
+                value = _MISSING if missing else (start, end)
+
+            if value is _MISSING or (skip_empty and (value is None or value == "")):
+                if entry.default is not None:
+                    value = entry.default
+                elif entry.required:
+                    msg = f"{entry.concept.name}: required value {entry.keys[0]!r} is missing"
+                    raise ValueError(msg)
+                else:
+                    continue
+
+            code = get(entry.code_key) if entry.code_key is not None else None
+            groups.append(entry.build(value, code, variant_identifier))
+
+        return groups
+
+
+def compile_registry(
+    registry: tuple[VARConceptMapping, ...] = VAR_CONCEPT_REGISTRY,
+    *,
+    keyed_by: str = "name",
+    lite: bool = True,
+    use_defaults: bool = True,
+    skip_empty: bool = False,
+    use_required: bool = True,
+) -> SegmentGroupTable:
+    """
+    Resolve a registry into a SegmentGroupTable.
+
+    keyed_by="name" reads inputs keyed by HL7V2 names (and the mapping's aliases);
+    keyed_by="field" reads inputs keyed by HL7 field identifier. `lite` selects the
+    __slots__ segment classes over the pydantic ones. Without use_defaults,
+    concepts with a default are skipped like any other when absent; without
+    use_required, so are required concepts.
+    """
+    if keyed_by not in ("name", "field"):
+        msg = f"keyed_by must be 'name' or 'field', got {keyed_by!r}"
+        raise ValueError(msg)
+
+    def key_of(name: str, concept: VARConcepts) -> str:
+        return name if keyed_by == "name" else field_key(name, concept)
+
+    def code_key_of(name: str | None) -> str | None:
+        # codes such as GENE_ID have no HL7 field of their own and keep their name
+        return name if name is None or keyed_by == "name" else HL7V2.get(name, name)
+
+    entries = []
+    for mapping in registry:
+        concept = mapping.concept
+        if isinstance(mapping.source, tuple):
+            keys = ()
+            range_keys = (key_of(mapping.source[0], concept), key_of(mapping.source[1], concept))
+        else:
+            keys = (key_of(mapping.source, concept),)
+            if keyed_by == "name":
+                keys += mapping.aliases
+            range_keys = None
+        entries.append(
+            _CompiledEntry(
+                concept=concept,
+                keys=keys or range_keys,
+                range_keys=range_keys,
+                code_key=code_key_of(mapping.code_source),
+                required=mapping.required and use_required,
+                default=mapping.default if use_defaults else None,
+                build=_group_builder(mapping, lite),
+            )
+        )
+    return SegmentGroupTable(entries, skip_empty)
+
+
+# Compiled once: variant information dicts (pydantic and lite groups) and converter output.
+# Variant information describes a variant's annotation only in part, e.g. without its position.
+VARIANT_INFORMATION_TABLE = compile_registry(keyed_by="name", lite=False, use_required=False)
+VARIANT_INFORMATION_TABLE_LITE = compile_registry(keyed_by="name", lite=True, use_required=False)
+HL7_FIELDS_TABLE = compile_registry(keyed_by="field", lite=True, use_defaults=False, skip_empty=True)
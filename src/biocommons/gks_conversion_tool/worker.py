@@ -0,0 +1,100 @@
+"""Long-lived conversion worker for callers that convert one message at a time
+
+Starting a process for every message pays interpreter startup and module
+imports each time. A worker started once with `gks-to-hl7v2 --worker` (stdin
+and stdout) or `gks-to-hl7v2 --socket PATH` (a Unix socket, one connection per
+client) keeps everything loaded and answers requests until its input closes.
+
+The protocol is newline-delimited JSON in both directions. Each request line is
+one VA-Spec Statement, as in NDJSON input. Each response line is
+{"id": ..., "segments": [...]} with the OBX segments, or {"id": ..., "error": "..."}
+if the statement could not be converted. Responses come in request order, one
+per request, and are flushed immediately.
+"""
+
+import contextlib
+import json
+import logging
+import os
+import socketserver
+from pathlib import Path
+from typing import Any, BinaryIO
+
+from biocommons.gks_conversion_tool.lean import LeanStatement, loads
+from biocommons.gks_conversion_tool.streaming import convert_statement_record
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - depends on the environment
+    orjson = None
+
+_logger = logging.getLogger(__name__)
+
+
+def _dumps(response: dict[str, Any]) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(response) + b"\n"
+    return json.dumps(response).encode() + b"\n"  # pragma: no cover
+
+
+def preload(lean: bool = False) -> None:
+    """Import what the first request would otherwise wait for."""
+    if not lean:
+        import ga4gh.va_spec.base.core  # noqa: F401, PLC0415
+
+
+def handle_request(line: bytes | str, lean: bool = False) -> dict[str, Any]:
+    """Convert one request line to its response. Never raises for a bad statement."""
+    statement_id = None
+    try:
+        record = loads(line)
+        statement_id = record.get("id")
+        segments = convert_statement_record(LeanStatement(record) if lean else record)
+    except Exception as e:  # any failure becomes an error response
+        return {"id": statement_id, "error": f"{type(e).__name__}: {e}"}
+    return {"id": statement_id, "segments": segments}
+
+
+def serve_stream(rfile: BinaryIO, wfile: BinaryIO, lean: bool = False) -> int:
+    """Answer requests from `rfile` on `wfile` until end of input; return how many were answered."""
+    answered = 0
+    for line in rfile:
+        if not line.strip():
+            continue
+        wfile.write(_dumps(handle_request(line, lean)))
+        wfile.flush()
+        answered += 1
+    return answered
+
+
+class _RequestHandler(socketserver.StreamRequestHandler):
+    def handle(self) -> None:
+        answered = serve_stream(self.rfile, self.wfile, self.server.lean)
+        _logger.debug("Connection closed after %d requests", answered)
+
+
+class WorkerServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """Unix socket server running serve_stream on each connection, in its own thread."""
+
+    daemon_threads = True
+
+    def __init__(self, path: Path | str, lean: bool = False):
+        self.lean = lean
+        path = Path(path)
+        if path.is_socket():
+            # left behind by a worker that did not shut down cleanly
+            path.unlink()
+        super().__init__(str(path), _RequestHandler)
+
+    def server_close(self) -> None:
+        super().server_close()
+        Path(self.server_address).unlink(missing_ok=True)
+
+
+def serve_unix(path: Path | str, lean: bool = False) -> None:
+    """Serve requests on a Unix socket at `path` until interrupted."""
+    preload(lean)
+    with WorkerServer(path, lean) as server:
+        _logger.info("Worker %d listening on %s", os.getpid(), path)
+        with contextlib.suppress(KeyboardInterrupt):
+            server.serve_forever()
@@ -51,7 +51,7 @@ class VARConcepts(str, Enum):
 class OBXSegmentBase(BaseModel):
     """Common OBX fields (1..5 without the value)."""
 
-    variant_identifier_line: str | None = None           # OBX-5  
+    variant_identifier_line: str | None = None           # OBX-5
 
 
 class OBXSegmentST(OBXSegmentBase):
@@ -74,7 +74,7 @@ class OBXSegmentCWE(OBXSegmentBase):
     label: str | None = None
 
 
-class OBXSegmentNM(OBXSegmentBase): 
+class OBXSegmentNM(OBXSegmentBase):
     '''A class representing a segment with a numeric type'''
 
     observation_type: ObservationTypes = ObservationTypes.NUMERIC
@@ -82,9 +82,9 @@ class OBXSegmentNM(OBXSegmentBase):
     value: float
 
 
-class OBXSegmentNR(OBXSegmentBase): 
+class OBXSegmentNR(OBXSegmentBase):
     '''A class representing a segment with a numeric range type'''
-    
+
     observation_type: ObservationTypes = ObservationTypes.NUMERICRANGE
 
     lower_bound: float
@@ -108,3 +108,145 @@ class OBXSegmentGroup(BaseModel):
     segment_identifier: VARConcepts                      # OBX-4.1
 
     segment_identifier_system: str = "EPICGENOMICS"      # OBX 4.3
+
+
+# Lightweight segment classes for the hot path. They have the same attributes as the pydantic
+# models above, so the OBX generators accept either, but they do no validation when created.
+# Build a whole list of groups and then call validate_lite_segment_groups on it once.
+
+class OBXSegmentBaseLite:
+    '''__slots__ counterpart of OBXSegmentBase'''
+
+    __slots__ = ("variant_identifier_line",)
+
+    def __init__(self, variant_identifier_line: str | None = None):
+        self.variant_identifier_line = variant_identifier_line
+
+
+class OBXSegmentSTLite(OBXSegmentBaseLite):
+    '''__slots__ counterpart of OBXSegmentST'''
+
+    __slots__ = ("value",)
+
+    observation_type = ObservationTypes.STRING
+
+    def __init__(self, value: str, variant_identifier_line: str | None = None):
+        self.variant_identifier_line = variant_identifier_line
+        self.value = value
+
+
+class OBXSegmentCWELite(OBXSegmentBaseLite):
+    '''__slots__ counterpart of OBXSegmentCWE'''
+
+    __slots__ = ("code", "coding_system", "label")
+
+    observation_type = ObservationTypes.CODEABLECONCEPT
+
+    def __init__(self, code: str | None = None, coding_system: str | None = None, label: str | None = None, variant_identifier_line: str | None = None):
+        self.variant_identifier_line = variant_identifier_line
+        self.code = code
+        self.coding_system = coding_system
+        self.label = label
+
+
+class OBXSegmentNMLite(OBXSegmentBaseLite):
+    '''__slots__ counterpart of OBXSegmentNM. The value is stored as a float, as pydantic would.'''
+
+    __slots__ = ("value",)
+
+    observation_type = ObservationTypes.NUMERIC
+
+    def __init__(self, value: float, variant_identifier_line: str | None = None):
+        self.variant_identifier_line = variant_identifier_line
+        self.value = float(value)
+
+
+class OBXSegmentNRLite(OBXSegmentBaseLite):
+    '''__slots__ counterpart of OBXSegmentNR. Bounds are stored as floats, as pydantic would.'''
+
+    __slots__ = ("lower_bound", "upper_bound")
+
+    observation_type = ObservationTypes.NUMERICRANGE
+
+    def __init__(self, lower_bound: float, upper_bound: float, variant_identifier_line: str | None = None):
+        self.variant_identifier_line = variant_identifier_line
+        self.lower_bound = float(lower_bound)
+        self.upper_bound = float(upper_bound)
+
+
+class OBXSegmentGroupLite:
+    '''__slots__ counterpart of OBXSegmentGroup'''
+
+    __slots__ = (
+        "observation_type",
+        "segment_identifier",
+        "segment_identifier_system",
+        "segment_type",
+        "segments",
+        "variant_identifier",
+        "variant_type",
+    )
+
+    def __init__(
+        self,
+        segments: list[OBXSegmentBaseLite],
+        observation_type: ObservationTypes,
+        variant_identifier: str,
+        segment_identifier: VARConcepts,
+        segment_type: str = "OBX",
+        variant_type: int = 2,
+        segment_identifier_system: str = "EPICGENOMICS",
+    ):
+        self.segments = segments
+        self.segment_type = segment_type
+        self.observation_type = observation_type
+        self.variant_type = variant_type
+        self.variant_identifier = variant_identifier
+        self.segment_identifier = segment_identifier
+        self.segment_identifier_system = segment_identifier_system
+
+
+_LITE_STRING_FIELDS: dict[type, tuple[str, ...]] = {
+    OBXSegmentSTLite: ("value",),
+    OBXSegmentCWELite: ("code", "coding_system", "label"),
+    OBXSegmentNMLite: (),
+    OBXSegmentNRLite: (),
+}
+
+
+def validate_lite_segment_groups(segment_groups: list[OBXSegmentGroupLite]) -> None:
+    '''Apply the OBXSegmentGroup/OBXSegment* field rules and the CWE code/label rule to a whole list of lite groups.
+    Raises ValueError on the first problem found.'''
+    # ValueError for wrong types as well, as pydantic raises for OBXSegmentGroup
+    for group in segment_groups:
+        if not isinstance(group.observation_type, ObservationTypes):
+            msg = f"observation_type must be an ObservationTypes, got {group.observation_type!r}"
+            raise ValueError(msg)  # noqa: TRY004
+        if not isinstance(group.segment_identifier, VARConcepts):
+            msg = f"segment_identifier must be a VARConcepts, got {group.segment_identifier!r}"
+            raise ValueError(msg)  # noqa: TRY004
+        if not isinstance(group.variant_identifier, str):
+            msg = f"variant_identifier must be a string, got {group.variant_identifier!r}"
+            raise ValueError(msg)  # noqa: TRY004
+
+        for segment in group.segments:
+            string_fields = _LITE_STRING_FIELDS.get(type(segment))
+            if string_fields is None:
+                msg = f"{type(segment).__name__} is not a lite OBX segment"
+                raise ValueError(msg)
+            if segment.variant_identifier_line is not None and not isinstance(segment.variant_identifier_line, str):
+                msg = f"{group.segment_identifier.name}: variant_identifier_line must be a string"
+                raise ValueError(msg)
+            for field_name in string_fields:
+                value = getattr(segment, field_name)
+                if value is not None and not isinstance(value, str):
+                    msg = f"{group.segment_identifier.name}: {field_name} must be a string, got {value!r}"
+                    raise ValueError(msg)
+            if type(segment) is OBXSegmentSTLite and segment.value is None:
+                msg = f"{group.segment_identifier.name}: value is required"
+                raise ValueError(msg)
+            if type(segment) is OBXSegmentCWELite and segment.label is None and (
+                segment.code is None or segment.coding_system is None
+            ):
+                msg = f"{group.segment_identifier.name}: Codeable concepts must have either a code and coding system or a label"
+                raise ValueError(msg)
@@ -0,0 +1,78 @@
+"""Shared test configuration
+
+Hypothesis runs derandomized by default, so the property-based tests check the
+same examples on every run and a failure always reproduces. Set
+HYPOTHESIS_PROFILE=explore to search with fresh random examples and more of them.
+"""
+
+import os
+import time
+from collections.abc import Callable
+from typing import Any
+
+import pytest
+from hypothesis import HealthCheck, settings
+
+settings.register_profile(
+    "deterministic",
+    derandomize=True,
+    deadline=None,
+    max_examples=100,
+    suppress_health_check=[HealthCheck.too_slow, HealthCheck.data_too_large],
+)
+settings.register_profile(
+    "explore",
+    deadline=None,
+    max_examples=2000,
+    suppress_health_check=[HealthCheck.too_slow, HealthCheck.data_too_large],
+)
+settings.load_profile(os.environ.get("HYPOTHESIS_PROFILE", "deterministic"))
+
+
+class DifferentialTimings:
+    """Total time spent in the reference and the optimized path of each comparison."""
+
+    def __init__(self):
+        # comparison -> path -> [calls, seconds]
+        self.totals: dict[str, dict[str, list[float]]] = {}
+
+    def run(self, comparison: str, path: str, function: Callable[..., Any], *args: Any) -> tuple[str, Any]:
+        """
+        Call `function` and time it. Returns ("ok", result), or ("error", the
+        exception's type and message) so that both paths can be compared on failures too.
+        """
+        start = time.perf_counter()
+        try:
+            outcome = ("ok", function(*args))
+        except Exception as e:  # any failure is an outcome to compare
+            outcome = ("error", (type(e).__name__, str(e)))
+        total = self.totals.setdefault(comparison, {}).setdefault(path, [0, 0.0])
+        total[0] += 1
+        total[1] += time.perf_counter() - start
+        return outcome
+
+    def report(self) -> list[str]:
+        lines = []
+        for comparison, paths in self.totals.items():
+            per_call = {path: seconds / calls * 1e6 for path, (calls, seconds) in paths.items()}
+            line = f"{comparison}: " + ", ".join(f"{path} {us:.1f} us/call" for path, us in per_call.items())
+            if per_call.get("optimized") and "reference" in per_call:
+                line += f" ({per_call['reference'] / per_call['optimized']:.1f}x)"
+            lines.append(line)
+        return lines
+
+
+_timings_key = pytest.StashKey[DifferentialTimings]()
+
+
+@pytest.fixture(scope="session")
+def differential_timings(request) -> DifferentialTimings:
+    return request.config.stash.setdefault(_timings_key, DifferentialTimings())
+
+
+def pytest_terminal_summary(terminalreporter, config) -> None:
+    timings = config.stash.get(_timings_key, None)
+    if timings is not None and timings.totals:
+        terminalreporter.section("differential timings (reference vs optimized)")
+        for line in timings.report():
+            terminalreporter.write_line(line)
@@ -0,0 +1,56 @@
+import sys
+import threading
+
+from biocommons.gks_conversion_tool.cache import LRUCache
+
+
+def test_lru_cache_evicts_least_recently_used():
+    cache = LRUCache(maxsize=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1
+    cache.put("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert cache.stats() == {"hits": 3, "misses": 1, "size": 2, "maxsize": 2}
+
+
+def test_lru_cache_resize_and_disable():
+    cache = LRUCache(maxsize=3)
+    for key in "abc":
+        cache.put(key, key)
+    cache.resize(1)
+    assert len(cache) == 1
+    assert cache.get("c") == "c"
+    cache.resize(0)
+    cache.put("d", "d")
+    assert len(cache) == 0
+
+
+def test_lru_cache_is_thread_safe():
+    # evictions by other threads between a lookup and its move to the end used to raise KeyError
+    cache = LRUCache(maxsize=2)
+    errors = []
+
+    def hammer(offset):
+        try:
+            for i in range(20_000):
+                key = (i + offset) % 3
+                if cache.get(key) is None:
+                    cache.put(key, key)
+        except Exception as e:  # any failure fails the test below
+            errors.append(e)
+
+    switch_interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    try:
+        threads = [threading.Thread(target=hammer, args=(offset,)) for offset in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        sys.setswitchinterval(switch_interval)
+    assert errors == []
+    assert len(cache) == 2
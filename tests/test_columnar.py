@@ -0,0 +1,101 @@
+import io
+
+import pytest
+
+pa = pytest.importorskip("pyarrow")
+
+import pyarrow.csv  # noqa: E402
+import pyarrow.feather  # noqa: E402
+import pyarrow.parquet as pq  # noqa: E402
+
+from biocommons.gks_conversion_tool import columnar  # noqa: E402
+from biocommons.gks_conversion_tool.cli import main  # noqa: E402
+from biocommons.gks_conversion_tool.columnar import (  # noqa: E402
+    convert_batch,
+    plan_columns,
+    stream_table_obx_segments,
+)
+from biocommons.gks_conversion_tool.obx_templates import (  # noqa: E402
+    generate_all_obx_for_variants_templated,
+)
+from biocommons.gks_conversion_tool.var_concept_creator import (  # noqa: E402
+    createVARSegmentsGroupsLite,
+    variant_information,
+)
+from biocommons.gks_conversion_tool.var_concept_registry import VARConceptMapping  # noqa: E402
+
+ROWS = [
+    variant_information,
+    {
+        "GENE_STUDIED": "KRAS",
+        "DNA_CHANGE": "c.35G>T",
+        "ALLELE_START": 25245349,
+        "ALLELE_END": 25245350,
+        "COPY_NUMBER": 3,
+        "GENETIC_VARIANT_ASSESSMENT": "Not detected",
+    },
+    {"VARIANT_NAME": "no gene id", "GENE_STUDIED": "TP53", "GENE_ID": "", "ALLELE_START": 7, "ALLELE_END": None},
+]
+
+
+def expected_text(rows):
+    lines = []
+    for row in rows:
+        present = {key: value for key, value in row.items() if value not in (None, "")}
+        lines += generate_all_obx_for_variants_templated(createVARSegmentsGroupsLite(present, "a"))
+    return "".join(line + "\r" for line in lines)
+
+
+def table(rows):
+    keys = sorted({key for row in rows for key in row})
+    return pa.Table.from_pylist([{key: row.get(key) for key in keys} for row in rows])
+
+
+def test_convert_batch_matches_segment_groups():
+    batch = table(ROWS).to_batches()[0]
+    text, segments = convert_batch(batch, plan_columns())
+    assert text == expected_text(ROWS)
+    assert segments == text.count("\r")
+
+
+@pytest.mark.parametrize("suffix", [".parquet", ".arrow", ".csv", ".tsv"])
+def test_stream_table_obx_segments(tmp_path, suffix):
+    path = tmp_path / f"variants{suffix}"
+    data = table(ROWS * 3)
+    if suffix == ".parquet":
+        pq.write_table(data, path)
+    elif suffix == ".arrow":
+        pyarrow.feather.write_feather(data, path)
+    else:
+        delimiter = "\t" if suffix == ".tsv" else ","
+        pyarrow.csv.write_csv(data, path, pyarrow.csv.WriteOptions(delimiter=delimiter, quoting_style="none"))
+
+    out = io.StringIO()
+    stats = stream_table_obx_segments(path, out, batch_size=2)
+    assert out.getvalue() == expected_text(ROWS * 3)
+    assert stats.statements == 9
+
+
+def test_required_concept_missing():
+    plans = plan_columns()
+    plan = next(plan for plan in plans if plan.mapping.source == "DNA_CHANGE")
+    mapping = VARConceptMapping(plan.mapping.concept, "DNA_CHANGE", plan.mapping.observation_type, "HGVS.c", required=True)
+    plans[plans.index(plan)] = columnar._ColumnPlan(mapping, True, plan.prefix, plan.middle, plan.suffix)
+    batch = table([{"DNA_CHANGE": "c.1A>T"}, {"DNA_CHANGE": None}]).to_batches()[0]
+    with pytest.raises(ValueError, match="VARCONCEPT518.*row 1"):
+        convert_batch(batch, plans)
+
+
+def test_cli_table_input(tmp_path):
+    path = tmp_path / "variants.parquet"
+    pq.write_table(table(ROWS), path)
+    output_path = tmp_path / "out.hl7"
+    assert main([str(path), "-o", str(output_path)]) == 0
+    assert output_path.read_bytes().decode() == expected_text(ROWS)
+
+
+def test_convert_batch_escapes_delimiters():
+    rows = [{"VARIANT_NAME": "a|b", "DNA_CHANGE": "c.1799T>A^G", "GENE_STUDIED": "BRAF", "GENE_ID": "HGNC&1097"}]
+    text, _ = convert_batch(table(rows).to_batches()[0], plan_columns())
+    assert text == expected_text(rows)
+    assert "c.1799T>A\\S\\G" in text
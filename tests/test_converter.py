@@ -0,0 +1,140 @@
+import json
+from pathlib import Path
+
+import pytest
+from ga4gh.va_spec.base.core import Statement
+
+from biocommons.gks_conversion_tool import converter
+from biocommons.gks_conversion_tool.converter import (
+    ConversionError,
+    _find_genomic_allele_and_location,
+    _parse_hgvs_g,
+    _split_hgvs,
+    build_member_index,
+    cache_stats,
+    clear_caches,
+    configure_caches,
+    convert_gks_to_hl7_v2,
+)
+from biocommons.gks_conversion_tool.lean import LeanStatement
+
+STATEMENT_PATH = Path(__file__).parent / "data" / "braf_v600e_statement.json"
+
+
+@pytest.fixture
+def statement():
+    return Statement.model_validate(json.loads(STATEMENT_PATH.read_text()))
+
+
+@pytest.fixture(autouse=True)
+def fresh_caches():
+    clear_caches()
+    yield
+    configure_caches(hgvs_g_maxsize=4096, allele_maxsize=4096)
+    clear_caches()
+
+
+def test_convert_gks_to_hl7_v2(statement):
+    assert convert_gks_to_hl7_v2(statement) == {
+        "504": "BRAF V600E",
+        "510": "NC_000007.13",
+        "511.1": 140453135,
+        "511.2": 140453136,
+        "516": "NM_004333.6",
+        "518": "c.1799T>A",
+        "520": "p.Val600Glu",
+        "522": "NP_004324.2",
+        "524": "NC_000007.13",
+        "528": "g.140453136A>T",
+    }
+
+
+@pytest.mark.parametrize("lean", [False, True])
+def test_missing_required_values(lean):
+    record = json.loads(STATEMENT_PATH.read_text())
+    record["proposition"]["subjectVariant"]["name"] = ""
+    with pytest.raises(ConversionError, match="subjectVariant.name") as error:
+        convert_gks_to_hl7_v2(LeanStatement(record) if lean else Statement.model_validate(record))
+    assert error.value.field == "504"
+
+    record = json.loads(STATEMENT_PATH.read_text())
+    for member in record["proposition"]["subjectVariant"]["members"]:
+        member.get("location", {}).pop("start", None)
+    with pytest.raises(ConversionError, match="no start or end") as error:
+        convert_gks_to_hl7_v2(LeanStatement(record) if lean else Statement.model_validate(record))
+    assert error.value.field == "511.1"
+
+
+def test_repeated_allele_uses_cache(statement, monkeypatch):
+    first = convert_gks_to_hl7_v2(statement)
+    monkeypatch.setattr(converter, "_convert_allele", None)
+    assert convert_gks_to_hl7_v2(statement) == first
+    assert cache_stats()["allele"]["hits"] == 1
+
+
+def test_allele_cache_is_keyed_by_expression(statement):
+    convert_gks_to_hl7_v2(statement)
+    record = json.loads(STATEMENT_PATH.read_text())
+    for member in record["proposition"]["subjectVariant"]["members"]:
+        for expression in member.get("expressions", []):
+            if expression["syntax"] == "hgvs.g":
+                expression["value"] = "NC_000007.14:g.140753336A>T"
+    # same allele id, other expression
+    fields = convert_gks_to_hl7_v2(Statement.model_validate(record))
+    assert fields["524"] == "NC_000007.14"
+    assert fields["528"] == "g.140753336A>T"
+    assert cache_stats()["allele"]["hits"] == 0
+
+
+def test_disabled_allele_cache(statement):
+    configure_caches(allele_maxsize=0)
+    convert_gks_to_hl7_v2(statement)
+    convert_gks_to_hl7_v2(statement)
+    assert cache_stats()["allele"] == {"hits": 0, "misses": 2, "size": 0, "maxsize": 0}
+    assert cache_stats()["hgvs_g"]["hits"] == 1
+
+
+@pytest.mark.parametrize(
+    ("hgvs_g", "expected"),
+    [
+        ("NC_000007.13:g.140453136A>T", ("NC_000007.13", "g.140453136A>T")),
+        ("chr7:g.140453136A>T", ("7", "g.140453136A>T")),
+        ("7:g.140453136A>T", ("7", "g.140453136A>T")),
+        ("chrX:g.100del", ("X", "g.100del")),
+    ],
+)
+def test_parse_hgvs_g(hgvs_g, expected):
+    assert _parse_hgvs_g(hgvs_g) == expected
+
+
+@pytest.mark.parametrize("hgvs_g", ["NC_000007.13", "NM_004333.6:c.1799T>A", ":g.1A>T"])
+def test_parse_hgvs_g_rejects(hgvs_g):
+    with pytest.raises(ValueError, match="Not an hgvs.g expression"):
+        _parse_hgvs_g(hgvs_g)
+
+
+def test_build_member_index(statement):
+    index = build_member_index(statement.proposition.subjectVariant.members)
+    assert sorted(index.by_molecule_type) == ["genomic", "mRNA", "protein"]
+    assert sorted(index.by_syntax) == ["hgvs.c", "hgvs.g", "hgvs.p"]
+    allele, location = _find_genomic_allele_and_location(index)
+    assert location.start == 140453135
+    assert index.by_allele_syntax[(id(allele), "hgvs.g")].value == "NC_000007.13:g.140453136A>T"
+
+
+def test_build_member_index_keeps_member_order(statement):
+    members = statement.proposition.subjectVariant.members
+    genomic = members[0]
+    index = build_member_index([genomic.model_copy(deep=True) for _ in range(500)])
+    assert len(index.by_molecule_type["genomic"]) == 500
+    assert _find_genomic_allele_and_location(index)[0] is index.by_molecule_type["genomic"][0][0]
+
+
+def test_build_member_index_without_genomic_member():
+    assert _find_genomic_allele_and_location(build_member_index([])) is None
+
+
+def test_split_hgvs():
+    assert _split_hgvs("NM_004333.6:c.1799T>A", "c.") == ("NM_004333.6", "c.1799T>A")
+    with pytest.raises(ValueError, match="Not a c. HGVS expression"):
+        _split_hgvs("NP_004324.2:p.Val600Glu", "c.")
@@ -0,0 +1,75 @@
+import json
+from pathlib import Path
+
+import pytest
+from hypothesis import given
+from hypothesis import strategies as st
+
+from biocommons.gks_conversion_tool.converter import clear_caches, convert_gks_to_hl7_v2
+from biocommons.gks_conversion_tool.escaping import escape, unescape
+from biocommons.gks_conversion_tool.hl7_parser import parse_obx_segments
+from biocommons.gks_conversion_tool.obx_segment_generator import generate_obx5
+from biocommons.gks_conversion_tool.obx_templates import format_obx5
+from biocommons.gks_conversion_tool.streaming import convert_statement_record, validate_statement
+from biocommons.models import OBXSegmentCWELite, OBXSegmentSTLite
+
+STATEMENT_PATH = Path(__file__).parent / "data" / "braf_v600e_statement.json"
+
+
+@pytest.mark.parametrize(
+    ("value", "escaped"),
+    [
+        ("a|b", "a\\F\\b"),
+        ("c.1799T>A^G", "c.1799T>A\\S\\G"),
+        ("x&y~z", "x\\T\\y\\R\\z"),
+        ("back\\slash", "back\\E\\slash"),
+        ("two\r\nlines", "two\\X0D\\\\X0A\\lines"),
+        ("\\F\\", "\\E\\F\\E\\"),
+    ],
+)
+def test_escape_round_trip(value, escaped):
+    assert escape(value) == escaped
+    assert unescape(escaped) == value
+
+
+@given(st.text(alphabet=st.characters(exclude_categories=("Cs",)) | st.sampled_from("|^&~\\\r\n")))
+def test_unescape_undoes_escape(value):
+    escaped = escape(value)
+    assert not set("|^&~\r\n") & set(escaped)
+    assert unescape(escaped) == value
+
+
+def test_clean_values_are_not_copied():
+    value = "".join(["NM_004333.6:", "c.1799T>A"])
+    assert escape(value) is value
+    assert unescape(value) is value
+
+
+def test_unescape_leaves_other_sequences():
+    assert unescape("\\H\\bold\\N\\ caf\\XC3A9\\") == "\\H\\bold\\N\\ café"
+
+
+@pytest.mark.parametrize("format_value", [generate_obx5, format_obx5])
+def test_obx5_is_escaped(format_value):
+    assert format_value(OBXSegmentSTLite("a|b")) == "a\\F\\b"
+    assert format_value(OBXSegmentCWELite(label="x^y")) == "^x\\S\\y"
+    assert (
+        format_value(OBXSegmentCWELite(code="c.1A>C^G", coding_system="HGVS.c", label="c.1A>C^G"))
+        == "c.1A>C\\S\\G^c.1A>C\\S\\G^HGVS.c"
+    )
+
+
+def test_special_characters_round_trip():
+    record = json.loads(STATEMENT_PATH.read_text())
+    record["proposition"]["subjectVariant"]["name"] = "BRAF|V600E^x&y~z\\"
+    transcript = record["proposition"]["subjectVariant"]["members"][1]
+    transcript["expressions"][0]["value"] = "NM_004333.6:c.1799T>A^G"
+    clear_caches()
+    expected = convert_gks_to_hl7_v2(validate_statement(record))
+
+    segments = convert_statement_record(record)
+    assert all(segment.count("|") == 21 for segment in segments)
+    (variant,) = parse_obx_segments(segments)
+    assert variant.fields == expected
+    assert variant.fields["504"] == "BRAF|V600E^x&y~z\\"
+    assert variant.fields["518"] == "c.1799T>A^G"
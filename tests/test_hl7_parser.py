@@ -0,0 +1,121 @@
+import io
+import json
+from pathlib import Path
+
+import pytest
+from ga4gh.va_spec.base.core import Statement
+
+from biocommons.gks_conversion_tool.converter import clear_caches, convert_gks_to_hl7_v2
+from biocommons.gks_conversion_tool.hl7_parser import (
+    build_allele,
+    build_statement,
+    parse_hl7,
+    parse_obx_segments,
+)
+from biocommons.gks_conversion_tool.obx_templates import generate_all_obx_for_variants_templated
+from biocommons.gks_conversion_tool.oru import build_oru_r01
+from biocommons.gks_conversion_tool.streaming import (
+    convert_statement_record,
+    create_segment_groups,
+    stream_obx_segments,
+)
+from biocommons.gks_conversion_tool.var_concept_creator import (
+    createVARSegmentsGroupsLite,
+    variant_information,
+)
+from biocommons.gks_conversion_tool.var_concept_registry import CWE, VAR_CONCEPT_REGISTRY, field_key
+
+STATEMENT_PATH = Path(__file__).parent / "data" / "braf_v600e_statement.json"
+
+
+@pytest.fixture
+def statement_record():
+    return json.loads(STATEMENT_PATH.read_text())
+
+
+@pytest.fixture
+def expected_fields(statement_record):
+    clear_caches()
+    return convert_gks_to_hl7_v2(Statement.model_validate(statement_record))
+
+
+def test_parse_obx_lines(statement_record, expected_fields):
+    (variant,) = parse_obx_segments(convert_statement_record(statement_record))
+    assert variant.variant_identifier == "a"
+    assert variant.message_control_id is None
+    assert variant.fields == expected_fields
+
+
+def test_parse_batch_file(tmp_path, statement_record, expected_fields):
+    segments = convert_statement_record(statement_record)
+    messages = [build_oru_r01(segments, f"MSG{n}", timestamp="20240101120000") for n in (1, 2)]
+    batch = "FHS|^~\\&\rBHS|^~\\&\r" + "".join(messages) + "BTS|2\rFTS|1\r"
+    path = tmp_path / "batch.hl7"
+    path.write_text(batch, newline="")
+
+    variants = list(parse_hl7(path))
+    assert [v.message_control_id for v in variants] == ["MSG1", "MSG2"]
+    assert all(v.fields == expected_fields for v in variants)
+
+
+def test_bare_obx_stream_splits_records(statement_record):
+    out = io.StringIO()
+    stream_obx_segments([statement_record, statement_record], out)
+    assert len(list(parse_hl7(io.StringIO(out.getvalue())))) == 2
+
+
+def test_groups_by_variant_identifier():
+    text = (
+        "OBX|1|ST|VARCONCEPT504^Variant Name^EPICGENOMICS|2a|BRAF V600E\n"
+        "OBX|2|ST|VARCONCEPT504^Variant Name^EPICGENOMICS|2b|KRAS G12D\n"
+        "OBX|3|CWE|VARCONCEPT514^Gene Studied^EPICGENOMICS|2a.1|HGNC:1097^BRAF^HGNC~HGNC:1098^X^HGNC\n"
+        "OBX|4|NM|VARCONCEPT550^Copy Number^EPICGENOMICS|2b|2.5\n"
+        "OBX|5|ST|12345-6^Not a VAR concept^LN|2a|ignored\n"
+    )
+    a, b = parse_hl7(text)
+    assert a.fields == {"504": "BRAF V600E", "514": ["BRAF", "X"], "GENE_ID": ["HGNC:1097", "HGNC:1098"]}
+    assert b.fields == {"504": "KRAS G12D", "550": 2.5}
+
+
+def test_round_trip_gene(statement_record):
+    statement_record["proposition"]["geneContextQualifier"] = {"conceptType": "Gene", "name": "BRAF"}
+    clear_caches()
+    hl7_fields = convert_gks_to_hl7_v2(Statement.model_validate(statement_record))
+    hl7_fields["GENE_ID"] = "HGNC:1097"
+    (variant,) = parse_obx_segments(generate_all_obx_for_variants_templated(create_segment_groups(hl7_fields, "a")))
+    assert variant.fields == hl7_fields
+    assert (variant.fields["514"], variant.fields["GENE_ID"]) == ("BRAF", "HGNC:1097")
+
+
+def test_round_trip_coded_values():
+    (variant,) = parse_obx_segments(generate_all_obx_for_variants_templated(createVARSegmentsGroupsLite(variant_information, "a")))
+    coded = [mapping for mapping in VAR_CONCEPT_REGISTRY if mapping.observation_type is CWE and mapping.coding_system]
+    for mapping in coded:
+        if mapping.source in variant_information:
+            assert variant.fields[field_key(mapping.source, mapping.concept)] == variant_information[mapping.source]
+        if mapping.code_source in variant_information:
+            assert variant.fields[mapping.code_source] == variant_information[mapping.code_source]
+    assert (variant.fields["514"], variant.fields["GENE_ID"]) == ("BRAF", "HGNC:1097")
+
+
+def test_code_alone_is_the_value():
+    (variant,) = parse_hl7("OBX|1|CWE|VARCONCEPT514^Gene Studied^EPICGENOMICS|2a|HGNC:1097^^HGNC\n")
+    assert variant.fields == {"514": "HGNC:1097", "GENE_ID": "HGNC:1097"}
+
+
+def test_round_trip_statement(statement_record, expected_fields):
+    (variant,) = parse_obx_segments(convert_statement_record(statement_record))
+    statement = build_statement(variant.fields, {"conceptType": "Disease", "name": "Melanoma"})
+
+    allele = statement.proposition.subjectVariant.members[0].root
+    assert (allele.location.start, allele.location.end) == (140453135, 140453136)
+    assert allele.state.sequence.root == "T"
+    assert statement.direction == "neutral"
+
+    clear_caches()
+    assert convert_gks_to_hl7_v2(statement) == expected_fields
+
+
+def test_build_allele_needs_a_state():
+    with pytest.raises(ValueError, match="allele state"):
+        build_allele({"511.1": 1, "511.2": 4, "528": "g.2_4dup"})
@@ -0,0 +1,49 @@
+import subprocess
+import sys
+
+import pytest
+
+import biocommons.gks_conversion_tool as package
+from biocommons.gks_conversion_tool.converter import convert_gks_to_hl7_v2
+
+# Cumulative import time of the CLI module, in microseconds. Importing the
+# GA4GH models alone takes longer than this on a typical machine.
+IMPORT_TIME_BUDGET_US = 750_000
+
+
+def import_times(module: str) -> dict[str, int]:
+    """Cumulative import time in microseconds of each module loaded by `import module`, from python -X importtime."""
+    result = subprocess.run(  # noqa: S603 - this interpreter with a fixed module name
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line.split("|")
+        times[name.strip()] = int(cumulative)
+    return times
+
+
+def test_package_import_loads_no_submodules():
+    times = import_times("biocommons.gks_conversion_tool")
+    assert [name for name in times if name.startswith("biocommons.gks_conversion_tool.")] == []
+
+
+def test_cli_import_defers_ga4gh_models():
+    times = import_times("biocommons.gks_conversion_tool.cli")
+    assert [name for name in times if name.startswith("ga4gh")] == []
+    assert "asyncio" not in times
+    assert "pyarrow" not in times
+    assert times["biocommons.gks_conversion_tool.cli"] < IMPORT_TIME_BUDGET_US
+
+
+def test_lazy_exports():
+    assert package.convert_gks_to_hl7_v2 is convert_gks_to_hl7_v2
+    assert set(package.__all__) <= set(dir(package))
+    assert sorted(package.__all__) == sorted(package._EXPORTS)
+    with pytest.raises(AttributeError, match="no_such_name"):
+        package.no_such_name  # noqa: B018
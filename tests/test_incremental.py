@@ -0,0 +1,152 @@
+import copy
+import io
+import json
+from pathlib import Path
+
+import pytest
+
+from biocommons.gks_conversion_tool.cli import main
+from biocommons.gks_conversion_tool.converter import configure_reference
+from biocommons.gks_conversion_tool.incremental import (
+    CONVERSION_VERSION,
+    ResultStore,
+    content_key,
+    stream_obx_segments_incremental,
+)
+from biocommons.gks_conversion_tool.lean import LeanStatement
+from biocommons.gks_conversion_tool.reference import ReferenceIndex, build_reference_index
+from biocommons.gks_conversion_tool.streaming import convert_statement_record
+
+STATEMENT_PATH = Path(__file__).parent / "data" / "braf_v600e_statement.json"
+
+
+@pytest.fixture
+def statement_record():
+    return json.loads(STATEMENT_PATH.read_text())
+
+
+def run(records, store_path, changed_only=False):
+    out = io.StringIO()
+    with ResultStore(store_path) as store:
+        stream_obx_segments_incremental(records, out, store, changed_only=changed_only)
+    return out.getvalue(), store.stats
+
+
+def test_content_key_ignores_key_order():
+    assert content_key({"a": 1, "b": [1, 2]}) == content_key({"b": [1, 2], "a": 1})
+    assert content_key({"a": 1}) != content_key({"a": 2})
+
+
+def test_reused_output_matches_fresh_conversion(tmp_path, statement_record):
+    expected = "".join(s + "\r" for s in convert_statement_record(statement_record))
+
+    first, stats = run([statement_record], tmp_path / "store.db")
+    assert (stats.converted, stats.reused) == (1, 0)
+    second, stats = run([statement_record], tmp_path / "store.db")
+    assert (stats.converted, stats.reused) == (0, 1)
+    assert first == second == expected
+
+
+def test_changed_subject_variant_is_converted_again(tmp_path, statement_record):
+    run([statement_record], tmp_path / "store.db")
+
+    changed = copy.deepcopy(statement_record)
+    changed["proposition"]["subjectVariant"]["name"] = "BRAF p.V600E"
+    output, stats = run([changed, statement_record], tmp_path / "store.db")
+    assert (stats.converted, stats.reused) == (1, 1)
+    assert "|BRAF p.V600E|" in output
+
+
+def test_changed_gene_is_converted_again(tmp_path, statement_record):
+    statement_record["proposition"]["geneContextQualifier"] = {"conceptType": "Gene", "name": "BRAF"}
+    run([statement_record], tmp_path / "store.db")
+
+    changed = copy.deepcopy(statement_record)
+    changed["proposition"]["geneContextQualifier"]["name"] = "KRAS"
+    output, stats = run([changed], tmp_path / "store.db")
+    assert (stats.converted, stats.reused) == (1, 0)
+    assert output == "".join(s + "\r" for s in convert_statement_record(changed))
+    assert "|^KRAS|" in output
+
+
+def test_fields_are_kept_per_reference_index(tmp_path, statement_record):
+    (tmp_path / "hgnc.tsv").write_text("symbol\thgnc_id\nBRAF\tHGNC:1097\n")
+    index_path = build_reference_index(tmp_path / "reference.idx", hgnc=tmp_path / "hgnc.tsv")
+    statement_record["proposition"]["geneContextQualifier"] = {"conceptType": "Gene", "name": "BRAF"}
+    run([statement_record], tmp_path / "store.db")
+
+    with ReferenceIndex(index_path) as index:
+        configure_reference(index)
+        try:
+            output, stats = run([statement_record], tmp_path / "store.db")
+        finally:
+            configure_reference(None)
+    assert (stats.converted, stats.reused) == (1, 0)
+    assert "|HGNC:1097^BRAF^HGNC|" in output
+
+    output, stats = run([statement_record], tmp_path / "store.db")
+    assert (stats.converted, stats.reused) == (0, 1)
+    assert "HGNC:1097" not in output
+
+
+def test_changed_only_skips_unchanged_statements(tmp_path, statement_record):
+    run([statement_record], tmp_path / "store.db", changed_only=True)
+
+    output, stats = run([LeanStatement(statement_record)], tmp_path / "store.db", changed_only=True)
+    assert output == ""
+    assert (stats.emitted, stats.unchanged) == (0, 1)
+
+    # a new classification alone does not change the OBX output of the variant
+    reclassified = copy.deepcopy(statement_record)
+    reclassified["classification"] = {"primaryCoding": {"code": "likely pathogenic", "system": "ACMG"}}
+    output, stats = run([reclassified], tmp_path / "store.db", changed_only=True)
+    assert (stats.reused, stats.unchanged) == (1, 1)
+
+
+def test_store_is_cleared_for_another_conversion_version(tmp_path, statement_record):
+    run([statement_record], tmp_path / "store.db")
+    with ResultStore(tmp_path / "store.db") as store:
+        store._db.execute("UPDATE meta SET value = 'old' WHERE name = 'conversion_version'")
+
+    _, stats = run([statement_record], tmp_path / "store.db")
+    assert (stats.converted, stats.reused) == (1, 0)
+    with ResultStore(tmp_path / "store.db") as store:
+        assert store._db.execute("SELECT value FROM meta").fetchone()[0] == CONVERSION_VERSION
+
+
+def test_cli_store(tmp_path, statement_record):
+    ndjson_path = tmp_path / "statements.ndjson"
+    ndjson_path.write_text(json.dumps(statement_record) + "\n")
+    store_path = tmp_path / "store.db"
+    output_path = tmp_path / "out.hl7"
+
+    assert main([str(ndjson_path), "-o", str(output_path), "--store", str(store_path), "--changed-only"]) == 0
+    assert output_path.read_text().startswith("OBX|1|ST|")
+    assert main([str(ndjson_path), "-o", str(output_path), "--store", str(store_path), "--changed-only"]) == 0
+    assert output_path.read_text() == ""
+
+
+def test_cli_store_rejects_workers(tmp_path):
+    with pytest.raises(SystemExit):
+        main(["-", "--store", str(tmp_path / "store.db"), "-j", "2"])
+
+
+def test_failed_statements_are_skipped(tmp_path, statement_record):
+    errors_out = io.StringIO()
+    with ResultStore(tmp_path / "store.db") as store:
+        stats = stream_obx_segments_incremental(
+            [statement_record, {"id": "bad"}, statement_record], io.StringIO(), store, errors_out=errors_out
+        )
+    assert (stats.statements, stats.errors) == (3, 1)
+    assert json.loads(errors_out.getvalue())["error"] == "ValueError: Statement has no proposition.subjectVariant"
+
+
+def test_reused_fields_are_validated(tmp_path, statement_record):
+    run([statement_record], tmp_path / "store.db")
+
+    invalid = copy.deepcopy(statement_record)
+    del invalid["direction"]
+    with ResultStore(tmp_path / "store.db") as store:
+        stats = stream_obx_segments_incremental([invalid], io.StringIO(), store)
+    assert stats.errors == 1
+    assert store.stats.reused == 0
@@ -0,0 +1,104 @@
+import json
+from pathlib import Path
+
+import pytest
+
+from biocommons.gks_conversion_tool import converter, instrumentation
+from biocommons.gks_conversion_tool.cli import main
+from biocommons.gks_conversion_tool.parallel import convert_chunk
+from biocommons.gks_conversion_tool.streaming import convert_statement_record
+
+STATEMENT_PATH = Path(__file__).parent / "data" / "braf_v600e_statement.json"
+
+
+@pytest.fixture
+def statement_record():
+    return json.loads(STATEMENT_PATH.read_text())
+
+
+@pytest.fixture(autouse=True)
+def clean_instrumentation():
+    instrumentation.reset()
+    yield
+    instrumentation.disable()
+    instrumentation.reset()
+
+
+def test_disabled_leaves_functions_untouched(statement_record):
+    original = converter.convert_gks_to_hl7_v2
+    instrumentation.enable()
+    assert converter.convert_gks_to_hl7_v2 is not original
+    instrumentation.disable()
+    assert converter.convert_gks_to_hl7_v2 is original
+
+    convert_statement_record(statement_record)
+    assert instrumentation.snapshot()["convert"]["count"] == 0
+
+
+def test_records_stages(statement_record):
+    instrumentation.enable()
+    convert_statement_record(statement_record)
+    convert_statement_record(statement_record)
+    metrics = instrumentation.snapshot()
+
+    for stage in ("validate_statement", "convert", "index_members", "create_segment_groups", "generate_obx_templated"):
+        assert metrics[stage]["count"] == 2, stage
+        assert metrics[stage]["buckets"]["+Inf"] == 2
+    assert metrics["convert"]["sum"] > 0
+
+
+def test_errors_by_var_concept(statement_record, monkeypatch):
+    def reject(_segment_groups):
+        msg = "VARCONCEPT553: Codeable concepts must have either a code and coding system or a label"
+        raise ValueError(msg)
+
+    monkeypatch.setattr("biocommons.gks_conversion_tool.streaming.validate_lite_segment_groups", reject)
+    instrumentation.enable()
+    with pytest.raises(ValueError, match="VARCONCEPT553"):
+        convert_statement_record(statement_record)
+    assert instrumentation.snapshot()["create_segment_groups"]["errors"] == {"VARCONCEPT553": 1}
+
+
+def test_conversion_errors_by_field(statement_record):
+    for member in statement_record["proposition"]["subjectVariant"]["members"]:
+        for expression in member.get("expressions", []):
+            if expression["syntax"] == "hgvs.c":
+                expression["value"] = "c.1799T>A"
+    converter.clear_caches()
+    instrumentation.enable()
+    with pytest.raises(converter.ConversionError):
+        convert_statement_record(statement_record)
+    metrics = instrumentation.snapshot()
+    assert metrics["convert"]["errors"] == {"VARCONCEPT518": 1}
+    assert metrics["split_hgvs"]["errors"] == {"VARCONCEPT518": 1}
+
+
+def test_prometheus_export(statement_record):
+    instrumentation.enable()
+    convert_statement_record(statement_record)
+    text = instrumentation.to_prometheus()
+    assert "# TYPE gks_conversion_stage_duration_seconds histogram" in text
+    assert 'gks_conversion_stage_duration_seconds_count{stage="convert"} 1' in text
+    assert 'gks_conversion_stage_duration_seconds_bucket{stage="convert",le="+Inf"} 1' in text
+
+
+def test_merge_chunk_metrics(statement_record):
+    result = convert_chunk(0, [json.dumps(statement_record)] * 3, metrics=True)
+    instrumentation.disable()
+    instrumentation.reset()
+    instrumentation.merge(result.metrics)
+    instrumentation.merge(result.metrics)
+    assert instrumentation.snapshot()["convert"]["count"] == 6
+
+
+def test_cli_metrics_and_profile(tmp_path, statement_record):
+    source = tmp_path / "statements.ndjson"
+    source.write_text(json.dumps(statement_record) + "\n")
+    metrics_path = tmp_path / "metrics.json"
+    profile_path = tmp_path / "run.pstats"
+
+    main([str(source), "-o", str(tmp_path / "out.hl7"), "--metrics", str(metrics_path), "--profile", str(profile_path)])
+
+    assert json.loads(metrics_path.read_text())["convert"]["count"] == 1
+    assert profile_path.stat().st_size > 0
+    assert not instrumentation.enabled()
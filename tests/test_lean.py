@@ -0,0 +1,60 @@
+import io
+import json
+from pathlib import Path
+
+import pytest
+from ga4gh.va_spec.base.core import Statement
+
+from biocommons.gks_conversion_tool.converter import convert_gks_to_hl7_v2
+from biocommons.gks_conversion_tool.lean import LeanStatement, iter_mmap_lines, load_lean_statement
+from biocommons.gks_conversion_tool.streaming import iter_lean_statements, stream_obx_segments
+
+STATEMENT_PATH = Path(__file__).parent / "data" / "braf_v600e_statement.json"
+
+
+@pytest.fixture
+def statement_text():
+    return json.dumps(json.loads(STATEMENT_PATH.read_text()))
+
+
+def test_lean_statement_converts_like_full_statement(statement_text):
+    lean = load_lean_statement(statement_text.encode())
+    assert convert_gks_to_hl7_v2(lean) == convert_gks_to_hl7_v2(Statement.model_validate_json(statement_text))
+
+
+def test_lean_statement_to_statement(statement_text):
+    lean = load_lean_statement(statement_text)
+    assert isinstance(lean.to_statement(), Statement)
+    assert lean.id == "stmt:1"
+
+
+def test_lean_statement_requires_subject_variant():
+    with pytest.raises(ValueError, match="subjectVariant"):
+        LeanStatement({"id": "x", "proposition": {}})
+
+
+def test_lean_statement_tolerates_missing_location_and_expressions():
+    lean = LeanStatement({"proposition": {"subjectVariant": {"members": [{"id": "a", "location": "iri:loc"}, {}]}}})
+    assert [member.location for member in lean.proposition.subjectVariant.members] == [None, None]
+    assert lean.proposition.subjectVariant.members[1].expressions == []
+
+
+def test_iter_mmap_lines(tmp_path, statement_text):
+    path = tmp_path / "statements.ndjson"
+    path.write_text(f"{statement_text}\n\n  \r\n{statement_text}")
+    lines = [load_lean_statement(line).id for line in iter_mmap_lines(path)]
+    assert lines == ["stmt:1", "stmt:1"]
+
+
+def test_iter_mmap_lines_empty_file(tmp_path):
+    path = tmp_path / "empty.ndjson"
+    path.write_text("")
+    assert list(iter_mmap_lines(path)) == []
+
+
+def test_stream_lean_statements(tmp_path, statement_text):
+    path = tmp_path / "statements.ndjson"
+    path.write_text(f"{statement_text}\n{statement_text}\n")
+    stats = stream_obx_segments(iter_lean_statements(path), io.StringIO())
+    assert stats.statements == 2
+    assert stats.segments == 18
@@ -0,0 +1,80 @@
+import pytest
+
+from biocommons.gks_conversion_tool.obx_segment_generator import (
+    generate_all_obx_for_variants,
+    generate_obx5,
+)
+from biocommons.gks_conversion_tool.obx_templates import generate_all_obx_for_variants_templated
+from biocommons.gks_conversion_tool.var_concept_creator import (
+    createVARSegmentsGroups,
+    createVARSegmentsGroupsLite,
+    variant_information,
+)
+from biocommons.models import (
+    ObservationTypes,
+    OBXSegmentCWELite,
+    OBXSegmentGroupLite,
+    OBXSegmentNMLite,
+    OBXSegmentNRLite,
+    OBXSegmentSTLite,
+    VARConcepts,
+    validate_lite_segment_groups,
+)
+
+
+def _group(*segments):
+    return OBXSegmentGroupLite(list(segments), ObservationTypes.CODEABLECONCEPT, "a", VARConcepts.VARCONCEPT514)
+
+
+def test_lite_groups_match_pydantic_groups():
+    expected = generate_all_obx_for_variants(createVARSegmentsGroups(variant_information, "a"))
+    lite_groups = createVARSegmentsGroupsLite(variant_information, "a")
+    assert generate_all_obx_for_variants(lite_groups) == expected
+    assert generate_all_obx_for_variants_templated(lite_groups) == expected
+
+
+def test_lite_segments_use_slots():
+    segment = OBXSegmentCWELite(label="Simple")
+    assert not hasattr(segment, "__dict__")
+    with pytest.raises(AttributeError):
+        segment.unexpected = 1
+
+
+@pytest.mark.parametrize(
+    ("segment", "obx5"),
+    [
+        (OBXSegmentSTLite("NP_37556.3"), "NP_37556.3"),
+        (OBXSegmentNMLite(3), "3.0"),
+        (OBXSegmentNRLite(1, 2.5), "1.0^2.5"),
+        (OBXSegmentCWELite(label="Simple"), "^Simple"),
+        (OBXSegmentCWELite(code="123", coding_system="HGNC", label="BRAF"), "123^BRAF^HGNC"),
+    ],
+)
+def test_generate_obx5_accepts_lite_segments(segment, obx5):
+    assert generate_obx5(segment) == obx5
+
+
+@pytest.mark.parametrize(
+    "segment",
+    [
+        OBXSegmentCWELite(),
+        OBXSegmentCWELite(code="123"),
+        OBXSegmentCWELite(label=123),
+        OBXSegmentSTLite(None),
+    ],
+)
+def test_validate_lite_segment_groups_rejects(segment):
+    with pytest.raises(ValueError, match="VARCONCEPT514"):
+        validate_lite_segment_groups([_group(segment)])
+
+
+def test_validate_lite_segment_groups_rejects_bad_group():
+    group = _group(OBXSegmentCWELite(label="BRAF"))
+    group.segment_identifier = "514"
+    with pytest.raises(ValueError, match="segment_identifier"):
+        validate_lite_segment_groups([group])
+
+
+def test_lite_segment_groups_validate_inputs():
+    with pytest.raises(ValueError, match="VARCONCEPT553"):
+        createVARSegmentsGroupsLite({**variant_information, "VARIANT_CLASSIFICATION": None}, "a")
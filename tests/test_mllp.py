@@ -0,0 +1,209 @@
+import asyncio
+import json
+from pathlib import Path
+
+import pytest
+
+from biocommons.gks_conversion_tool.cli import main
+from biocommons.gks_conversion_tool.mllp import (
+    END_BLOCK,
+    START_BLOCK,
+    MLLPClient,
+    MLLPConnection,
+    MLLPError,
+    MLLPNackError,
+    encode_frame,
+    parse_ack,
+    read_frame,
+)
+from biocommons.gks_conversion_tool.oru import build_oru_r01, message_control_id
+
+STATEMENT_PATH = Path(__file__).parent / "data" / "braf_v600e_statement.json"
+
+
+class StubServer:
+    """
+    A local MLLP receiver. `responses` maps a control ID to the ACK codes to send for
+    successive deliveries of that message (default AA). ACKs for a batch of pipelined
+    messages are sent in reverse order to check that the client matches them by ID.
+    """
+
+    def __init__(self, responses=None, drop_first_connection=False):
+        self.responses = {k: list(v) for k, v in (responses or {}).items()}
+        self.drop_first_connection = drop_first_connection
+        self.received: list[str] = []
+        self.connections = 0
+        self.max_pipelined = 0
+
+    async def handle(self, reader, writer):
+        self.connections += 1
+        if self.drop_first_connection and self.connections == 1:
+            await read_frame(reader)
+            writer.close()
+            return
+        try:
+            while True:
+                batch = [await read_frame(reader)]
+                await asyncio.sleep(0.01)
+                while END_BLOCK in reader._buffer:  # everything already pipelined behind it
+                    batch.append(await read_frame(reader))
+                self.max_pipelined = max(self.max_pipelined, len(batch))
+                for message in reversed(batch):
+                    self.received.append(message)
+                    control_id = message_control_id(message)
+                    codes = self.responses.get(control_id)
+                    code = codes.pop(0) if codes else "AA"
+                    writer.write(encode_frame(f"MSH|^~\\&|STUB|||||||ACK|{control_id}|P|2.5.1\rMSA|{code}|{control_id}\r"))
+                await writer.drain()
+        except asyncio.IncompleteReadError:
+            writer.close()
+
+    async def __aenter__(self):
+        self.server = await asyncio.start_server(self.handle, "127.0.0.1", 0)
+        self.port = self.server.sockets[0].getsockname()[1]
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.server.close()
+
+
+def _message(control_id: str) -> str:
+    return build_oru_r01(["OBX|1|ST|X^Y^Z|2a|value"], message_control_id=control_id, timestamp="20260101000000")
+
+
+def test_build_oru_r01():
+    message = _message("42")
+    segments = message.split("\r")
+    assert segments[0] == "MSH|^~\\&|GKS-CONVERSION-TOOL||||20260101000000||ORU^R01^ORU_R01|42|P|2.5.1"
+    assert [segment[:3] for segment in segments] == ["MSH", "PID", "OBR", "OBX", ""]
+    assert message_control_id(message) == "42"
+
+
+def test_encode_and_parse_ack():
+    assert encode_frame("A") == START_BLOCK + b"A" + END_BLOCK
+    ack = parse_ack("MSH|^~\\&\rMSA|AE|7|bad thing\r")
+    assert (ack.code, ack.control_id, ack.text, ack.accepted) == ("AE", "7", "bad thing", False)
+    with pytest.raises(MLLPError, match="MSA"):
+        parse_ack("MSH|^~\\&\r")
+
+
+def test_send_all_pipelines_and_matches_acks():
+    async def run():
+        async with StubServer() as server, MLLPClient(
+            "127.0.0.1", server.port, connections=2, max_in_flight=8
+        ) as client:
+            stats = await client.send_all(_message(str(i)) for i in range(40))
+            return server, stats
+
+    server, stats = asyncio.run(run())
+    assert stats.sent == 40
+    assert stats.failed == 0
+    assert server.connections == 2
+    assert server.max_pipelined > 1
+    assert sorted(int(message_control_id(m)) for m in server.received) == list(range(40))
+
+
+def test_send_retries_retryable_nack():
+    async def run():
+        async with StubServer(responses={"1": ["AE", "AA"]}) as server, MLLPClient(
+            "127.0.0.1", server.port, backoff=0
+        ) as client:
+            ack = await client.send(_message("1"))
+            return ack, client.stats
+
+    ack, stats = asyncio.run(run())
+    assert ack.accepted
+    assert stats.retries == 1
+
+
+def test_send_does_not_retry_reject():
+    async def run():
+        async with StubServer(responses={"1": ["AR"]}) as server, MLLPClient(
+            "127.0.0.1", server.port, backoff=0
+        ) as client:
+            with pytest.raises(MLLPNackError, match="AR"):
+                await client.send(_message("1"))
+            return server
+
+    assert len(asyncio.run(run()).received) == 1
+
+
+def test_send_reconnects_after_dropped_connection():
+    async def run():
+        async with StubServer(drop_first_connection=True) as server, MLLPClient(
+            "127.0.0.1", server.port, connections=1, backoff=0
+        ) as client:
+            ack = await client.send(_message("1"))
+            return ack, server
+
+    ack, server = asyncio.run(run())
+    assert ack.accepted
+    assert server.connections == 2
+
+
+def test_send_gives_up_when_unreachable():
+    async def run():
+        server = await asyncio.start_server(lambda *_: None, "127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        server.close()
+        await server.wait_closed()
+        async with MLLPClient("127.0.0.1", port, max_attempts=2, backoff=0) as client:
+            with pytest.raises(MLLPError):
+                await client.send(_message("1"))
+            return client.stats
+
+    assert asyncio.run(run()).failed == 1
+
+
+def test_client_needs_an_attempt():
+    with pytest.raises(ValueError, match="max_attempts must be at least 1"):
+        MLLPClient("127.0.0.1", 2575, max_attempts=0)
+
+
+def test_send_on_connection_closed_while_waiting_to_write():
+    async def run():
+        async with StubServer() as server:
+            connection = MLLPConnection("127.0.0.1", server.port)
+            await connection.connect()
+            async with connection._write_lock:
+                send = asyncio.create_task(connection.send(_message("1")))
+                await asyncio.sleep(0)
+                connection._close_writer()  # as the ACK reader does when the connection drops
+            with pytest.raises(MLLPError, match="closed"):
+                await send
+            await connection.close()
+
+    asyncio.run(run())
+
+
+def test_cli_mllp(tmp_path):
+    ndjson_path = tmp_path / "statements.ndjson"
+    ndjson_path.write_text((json.dumps(json.loads(STATEMENT_PATH.read_text())) + "\n") * 3)
+
+    async def run():
+        async with StubServer() as server:
+            exit_code = await asyncio.to_thread(main, [str(ndjson_path), "--mllp", f"127.0.0.1:{server.port}"])
+            return exit_code, server
+
+    exit_code, server = asyncio.run(run())
+    assert exit_code == 0
+    assert len(server.received) == 3
+    assert "OBR|1||stmt:1|81247-9" in server.received[0]
+
+
+def test_cli_mllp_skips_failed_statements(tmp_path):
+    ndjson_path = tmp_path / "statements.ndjson"
+    statement = json.dumps(json.loads(STATEMENT_PATH.read_text()))
+    ndjson_path.write_text(f"{statement}\n{{not json\n{statement}\n")
+    errors_path = tmp_path / "errors.ndjson"
+
+    async def run():
+        async with StubServer() as server:
+            argv = [str(ndjson_path), "--mllp", f"127.0.0.1:{server.port}", "--errors", str(errors_path)]
+            exit_code = await asyncio.to_thread(main, argv)
+            return exit_code, server
+
+    exit_code, server = asyncio.run(run())
+    assert exit_code == 1
+    assert sorted(message_control_id(message).rpartition(".")[2] for message in server.received) == ["1", "3"]
+    assert json.loads(errors_path.read_text())["index"] == 1
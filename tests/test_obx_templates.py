@@ -0,0 +1,83 @@
+import io
+
+import pytest
+
+from biocommons.gks_conversion_tool.obx_segment_generator import (
+    generate_all_obx_for_variants,
+    generate_obx5,
+)
+from biocommons.gks_conversion_tool.obx_templates import (
+    format_obx5,
+    generate_all_obx_for_variants_templated,
+    get_obx_template,
+    write_obx_segments,
+)
+from biocommons.gks_conversion_tool.var_concept_creator import (
+    createVARSegmentsGroups,
+    variant_information,
+)
+from biocommons.models import (
+    ObservationTypes,
+    OBXSegmentCWE,
+    OBXSegmentGroup,
+    OBXSegmentNM,
+    OBXSegmentNR,
+    OBXSegmentST,
+    VARConcepts,
+)
+
+
+@pytest.fixture
+def segment_groups():
+    groups = createVARSegmentsGroups(variant_information, variant_identifier="b")
+    groups.append(
+        OBXSegmentGroup(
+            segments=[
+                OBXSegmentNR(lower_bound=1, upper_bound=2, variant_identifier_line="1"),
+                OBXSegmentNR(lower_bound=3, upper_bound=4, variant_identifier_line="2"),
+            ],
+            observation_type=ObservationTypes.NUMERICRANGE,
+            variant_identifier="b",
+            segment_identifier=VARConcepts.VARCONCEPT511,
+        )
+    )
+    return groups
+
+
+def test_templated_matches_reference(segment_groups):
+    assert generate_all_obx_for_variants_templated(segment_groups) == generate_all_obx_for_variants(segment_groups)
+
+
+def test_write_obx_segments_matches_reference(segment_groups):
+    out = io.StringIO()
+    next_line = write_obx_segments(segment_groups, out, terminator="\r")
+    expected = generate_all_obx_for_variants(segment_groups)
+    assert out.getvalue() == "".join(segment + "\r" for segment in expected)
+    assert next_line == len(expected) + 1
+
+
+def test_get_obx_template_is_cached():
+    args = ("OBX", ObservationTypes.STRING, VARConcepts.VARCONCEPT522, "EPICGENOMICS")
+    template = get_obx_template(*args)
+    assert get_obx_template(*args) is template
+    assert template.middle == "|ST|VARCONCEPT522^Protein Reference Sequence^EPICGENOMICS|"
+
+
+@pytest.mark.parametrize(
+    "segment",
+    [
+        OBXSegmentST(value="NP_37556.3"),
+        OBXSegmentNM(value=3),
+        OBXSegmentNR(lower_bound=1.5, upper_bound=2),
+        OBXSegmentCWE(label="Simple"),
+        OBXSegmentCWE(code="123", coding_system="HGNC"),
+        OBXSegmentCWE(code="123", coding_system="HGNC", label="BRAF"),
+    ],
+)
+def test_format_obx5_matches_generate_obx5(segment):
+    assert format_obx5(segment) == generate_obx5(segment)
+
+
+def test_format_obx5_cwe_requires_code_or_label():
+    with pytest.raises(ValueError, match="Codeable concepts"):
+        format_obx5(OBXSegmentCWE())
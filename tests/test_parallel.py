@@ -0,0 +1,93 @@
+import io
+import json
+from multiprocessing import get_context
+from pathlib import Path
+
+from biocommons.gks_conversion_tool.cli import main
+from biocommons.gks_conversion_tool.converter import (
+    cache_stats,
+    configure_caches,
+    configure_reference,
+)
+from biocommons.gks_conversion_tool.parallel import (
+    convert_chunk,
+    iter_chunk_results,
+    iter_chunks,
+    iter_converted_chunks,
+    stream_obx_segments_parallel,
+)
+from biocommons.gks_conversion_tool.reference import ReferenceIndex, build_reference_index
+from biocommons.gks_conversion_tool.streaming import convert_statement_record
+
+STATEMENT_PATH = Path(__file__).parent / "data" / "braf_v600e_statement.json"
+
+
+def _statement_text(name: str) -> str:
+    record = json.loads(STATEMENT_PATH.read_text())
+    record["proposition"]["subjectVariant"]["name"] = name
+    return json.dumps(record)
+
+
+def test_iter_chunks():
+    chunks = list(iter_chunks(map(str, range(5)), chunk_size=2))
+    assert chunks == [(0, ["0", "1"]), (2, ["2", "3"]), (4, ["4"])]
+
+
+def test_convert_chunk_records_errors():
+    result = convert_chunk(10, [_statement_text("v1"), "{not json", '{"id": "bad"}', _statement_text("v2")])
+    assert result.statements == 4
+    assert result.segments == 18
+    assert [(e["index"], e["id"]) for e in result.errors] == [(11, None), (12, "bad")]
+    assert result.errors[1]["error"].startswith("ValidationError")
+
+
+def test_stream_obx_segments_parallel_keeps_order():
+    texts = [_statement_text(f"variant {i}") for i in range(50)]
+    out = io.StringIO()
+    errors_out = io.StringIO()
+    stats = stream_obx_segments_parallel(
+        [*texts[:25], "{}", *texts[25:]], out, workers=2, chunk_size=3, errors_out=errors_out
+    )
+
+    expected = "".join(
+        segment + "\r" for text in texts for segment in convert_statement_record(json.loads(text))
+    )
+    assert out.getvalue() == expected
+    assert stats.statements == 51
+    assert stats.errors == 1
+    assert json.loads(errors_out.getvalue())["index"] == 25
+
+
+def test_cli_parallel(tmp_path):
+    ndjson_path = tmp_path / "statements.ndjson"
+    ndjson_path.write_text(_statement_text("v1") + "\n{}\n")
+    output_path = tmp_path / "out.hl7"
+    errors_path = tmp_path / "errors.ndjson"
+    assert main([str(ndjson_path), "-o", str(output_path), "-j", "2", "--errors", str(errors_path)]) == 1
+    assert output_path.read_bytes().count(b"\r") == 9
+    assert json.loads(errors_path.read_text())["index"] == 1
+
+
+def _allele_cache_size(_start_index: int, _texts: list[str]) -> int:
+    return cache_stats()["allele"]["maxsize"]
+
+
+def test_spawned_workers_are_configured(tmp_path):
+    (tmp_path / "hgnc.tsv").write_text("hgnc_id\tsymbol\tstatus\nHGNC:1097\tBRAF\tApproved\n")
+    index_path = build_reference_index(tmp_path / "genes.idx", hgnc=tmp_path / "hgnc.tsv")
+    record = json.loads(STATEMENT_PATH.read_text())
+    record["proposition"]["geneContextQualifier"] = {"conceptType": "Gene", "name": "BRAF"}
+    spawn = get_context("spawn")
+
+    with ReferenceIndex(index_path) as index:
+        configure_reference(index)
+        configure_caches(allele_maxsize=7)
+        try:
+            chunks = list(iter_converted_chunks([json.dumps(record)], workers=1, mp_context=spawn))
+            sizes = list(iter_chunk_results(_allele_cache_size, ["{}"], 1, 1, mp_context=spawn))
+        finally:
+            configure_reference(None)
+            configure_caches(allele_maxsize=4096)
+
+    assert "|HGNC:1097^BRAF^HGNC|" in chunks[0].text
+    assert sizes == [7]
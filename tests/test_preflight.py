@@ -0,0 +1,169 @@
+import io
+import json
+from pathlib import Path
+
+import pytest
+
+from biocommons.gks_conversion_tool.cli import main
+from biocommons.gks_conversion_tool.converter import (
+    ConversionError,
+    clear_caches,
+    convert_gks_to_hl7_v2,
+)
+from biocommons.gks_conversion_tool.lean import LeanStatement
+from biocommons.gks_conversion_tool.preflight import (
+    check_chunk,
+    check_fields,
+    check_record,
+    preflight,
+)
+from biocommons.gks_conversion_tool.streaming import validate_statement
+
+STATEMENT_PATH = Path(__file__).parent / "data" / "braf_v600e_statement.json"
+
+
+@pytest.fixture
+def statement_record():
+    return json.loads(STATEMENT_PATH.read_text())
+
+
+def _members(record):
+    return record["proposition"]["subjectVariant"]["members"]
+
+
+def _without_genomic_allele(record):
+    members = _members(record)
+    members[:] = [m for m in members if m["location"]["sequenceReference"]["moleculeType"] != "genomic"]
+    return record
+
+
+def _with_expression(record, syntax, value):
+    for member in _members(record):
+        for expression in member.get("expressions", []):
+            if expression["syntax"] == syntax:
+                expression["value"] = value
+    return record
+
+
+@pytest.mark.parametrize("lean", [False, True])
+def test_valid_statement_has_no_issues(statement_record, lean):
+    assert check_record(statement_record, lean) == []
+
+
+def test_missing_genomic_allele(statement_record):
+    problems = check_record(_without_genomic_allele(statement_record))
+    assert [field for field, _ in problems] == ["VARCONCEPT511"]
+
+
+def test_bad_hgvs_expression_is_reported_on_its_concept(statement_record):
+    problems = check_record(_with_expression(statement_record, "hgvs.c", "c.1799T>A"), lean=True)
+    assert [field for field, _ in problems] == ["VARCONCEPT518"]
+
+
+def test_conversion_error_field(statement_record):
+    # the allele fields of this allele id may be cached by earlier tests
+    clear_caches()
+    with pytest.raises(ConversionError) as excinfo:
+        convert_gks_to_hl7_v2(LeanStatement(_with_expression(statement_record, "hgvs.g", "NC_000007.13 140453136A>T")))
+    assert excinfo.value.field == "528"
+
+
+def test_validation_errors_are_reported_by_path(statement_record):
+    del statement_record["proposition"]["subjectVariant"]["members"][0]["location"]["start"]
+    statement_record["direction"] = "sideways"
+    fields = [field for field, _ in check_record(statement_record, lean=False)]
+    assert "direction" in fields
+    assert len(fields) <= 6
+
+
+def test_check_fields(statement_record):
+    hl7_fields = convert_gks_to_hl7_v2(LeanStatement(statement_record))
+    assert check_fields(hl7_fields) == []
+    hl7_fields["511.1"] = "140453135"
+    hl7_fields["504"] = 600
+    problems = dict(check_fields(hl7_fields))
+    assert "must be numbers" in problems["VARCONCEPT511"]
+    assert "must be a string" in problems["VARCONCEPT504"]
+
+
+def test_missing_variant_name(statement_record):
+    statement_record["proposition"]["subjectVariant"]["name"] = ""
+    [(concept, reason)] = check_record(statement_record)
+    assert concept == "VARCONCEPT504"
+    assert "subjectVariant.name is missing" in reason
+
+
+@pytest.mark.parametrize("lean", [False, True])
+def test_inverted_location_fails_conversion_and_preflight(statement_record, lean):
+    clear_caches()
+    location = _members(statement_record)[0]["location"]
+    location["start"], location["end"] = location["end"] + 10, location["start"]
+    statement = LeanStatement(statement_record) if lean else validate_statement(statement_record)
+    with pytest.raises(ConversionError, match="after its end"):
+        convert_gks_to_hl7_v2(statement)
+    assert [field for field, _ in check_record(statement_record, lean)] == ["VARCONCEPT511"]
+
+
+@pytest.mark.parametrize("member", ["not an allele", {"expressions": [1]}])
+def test_malformed_members_are_reported(statement_record, member):
+    bad = json.loads(json.dumps(statement_record))
+    _members(bad).append(member)
+    texts = [json.dumps(statement_record), json.dumps(bad), json.dumps(statement_record)]
+    out = io.StringIO()
+    report = preflight(texts, out, lean=True)
+    assert (report.statements, report.failed) == (3, 1)
+    issues = [json.loads(line) for line in out.getvalue().splitlines()]
+    assert [(issue["index"], issue["field"]) for issue in issues] == [(1, "statement")]
+
+
+def test_check_chunk_indexes_issues(statement_record):
+    text = json.dumps(statement_record)
+    result = check_chunk(10, [text, "{not json", "[]", json.dumps(_without_genomic_allele(statement_record))])
+    assert result.statements == 4
+    assert result.failed == 3
+    assert [(issue.index, issue.field) for issue in result.issues] == [
+        (11, "statement"),
+        (12, "statement"),
+        (13, "VARCONCEPT511"),
+    ]
+    assert result.issues[-1].id == "stmt:1"
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_preflight_writes_issues_in_order(statement_record, workers):
+    good = json.dumps(statement_record)
+    bad = json.dumps(_without_genomic_allele(json.loads(good)))
+    texts = [good] * 20 + [bad] + [good] * 10 + ["{}"]
+    out = io.StringIO()
+    report = preflight(texts, out, workers=workers, chunk_size=3)
+
+    issues = [json.loads(line) for line in out.getvalue().splitlines()]
+    assert issues[0]["index"] == 20
+    assert {issue["index"] for issue in issues} == {20, 31}
+    assert report.statements == 32
+    assert report.failed == 2
+    assert report.issues_by_field["VARCONCEPT511"] == 1
+
+
+def test_cli_preflight(tmp_path, statement_record):
+    ndjson_path = tmp_path / "statements.ndjson"
+    output_path = tmp_path / "issues.ndjson"
+    ndjson_path.write_text(json.dumps(statement_record) + "\n")
+    assert main([str(ndjson_path), "-o", str(output_path), "--preflight"]) == 0
+    assert output_path.read_text() == ""
+
+    ndjson_path.write_text(json.dumps(_without_genomic_allele(json.loads(json.dumps(statement_record)))) + "\n")
+    assert main([str(ndjson_path), "-o", str(output_path), "--preflight"]) == 1
+    assert json.loads(output_path.read_text())["field"] == "VARCONCEPT511"
+
+    # like conversion, only full validation rejects a value the converter does not read
+    statement_record["direction"] = "sideways"
+    ndjson_path.write_text(json.dumps(statement_record) + "\n")
+    assert main([str(ndjson_path), "-o", str(output_path), "--preflight"]) == 1
+    assert json.loads(output_path.read_text())["field"] == "direction"
+    assert main([str(ndjson_path), "-o", str(output_path), "--preflight", "--lean"]) == 0
+
+
+def test_cli_preflight_rejects_report():
+    with pytest.raises(SystemExit):
+        main(["-", "--preflight", "--report"])
@@ -0,0 +1,147 @@
+import json
+from pathlib import Path
+
+import pytest
+
+from biocommons.gks_conversion_tool.cli import main
+from biocommons.gks_conversion_tool.converter import configure_reference, convert_gks_to_hl7_v2
+from biocommons.gks_conversion_tool.lean import LeanStatement
+from biocommons.gks_conversion_tool.reference import ReferenceIndex, build_reference_index
+from biocommons.gks_conversion_tool.streaming import validate_statement
+
+STATEMENT_PATH = Path(__file__).parent / "data" / "braf_v600e_statement.json"
+
+REFSEQ = """\
+accession\tchromosome\tassembly\trefget_accession
+NC_000007.13\t7\tGRCh37\tSQ.IW78mgV5Cqf6M24hy52hPjyyo5tCCd86
+NC_000007.14\t7\tGRCh38\t
+NM_004333.6\t\t\tSQ.aKMPEJgmlZXt_F6gRY5cUG3THH2n-GUa
+NP_004324.2\t\t\tSQ.cQvw4UsHHRRlogxbWCB8W-mKD4AraM9y
+"""
+
+HGNC = """\
+hgnc_id\tsymbol\tstatus
+HGNC:1097\tBRAF\tApproved
+HGNC:6407\tKRAS\tApproved
+HGNC:99999\tOLD1\tEntry Withdrawn
+"""
+
+CYTOBANDS = """\
+chr7\t0\t139000000\tq33\tgneg
+chr7\t139000000\t141000000\tq34\tgpos25
+chr7\t141000000\t159138663\tq35\tgneg
+chr8\t0\t2200000\tp23.3\tgneg
+"""
+
+
+@pytest.fixture
+def index_path(tmp_path):
+    (tmp_path / "refseq.tsv").write_text(REFSEQ)
+    (tmp_path / "hgnc.tsv").write_text(HGNC)
+    (tmp_path / "cytoBand.txt").write_text(CYTOBANDS)
+    return build_reference_index(
+        tmp_path / "reference.idx",
+        refseq=tmp_path / "refseq.tsv",
+        hgnc=tmp_path / "hgnc.tsv",
+        cytobands={"GRCh37": tmp_path / "cytoBand.txt"},
+    )
+
+
+@pytest.fixture
+def reference(index_path):
+    with ReferenceIndex(index_path) as index:
+        configure_reference(index)
+        yield index
+        configure_reference(None)
+
+
+@pytest.fixture
+def statement_record():
+    record = json.loads(STATEMENT_PATH.read_text())
+    record["proposition"]["geneContextQualifier"] = {"conceptType": "Gene", "name": "BRAF"}
+    return record
+
+
+def test_lookups(reference):
+    assert reference.sequence("NC_000007.13") == ("7", "GRCh37")
+    assert reference.sequence("NC_000099.1") is None
+    assert reference.accession_for_refget("SQ.aKMPEJgmlZXt_F6gRY5cUG3THH2n-GUa") == "NM_004333.6"
+    assert reference.hgnc_id("BRAF") == "HGNC:1097"
+    assert reference.hgnc_id("OLD1") is None
+
+
+@pytest.mark.parametrize(
+    ("assembly", "chromosome", "position", "band"),
+    [
+        ("GRCh37", "7", 0, "7q33"),
+        ("GRCh37", "7", 138999999, "7q33"),
+        ("GRCh37", "7", 139000000, "7q34"),
+        ("GRCh37", "7", 159138662, "7q35"),
+        ("GRCh37", "7", 159138663, None),
+        ("GRCh37", "8", 10, "8p23.3"),
+        ("GRCh37", "9", 10, None),
+        ("GRCh38", "7", 10, None),
+    ],
+)
+def test_cytoband(reference, assembly, chromosome, position, band):
+    assert reference.cytoband(assembly, chromosome, position) == band
+
+
+def test_partial_index(tmp_path):
+    (tmp_path / "hgnc.tsv").write_text(HGNC)
+    with ReferenceIndex(build_reference_index(tmp_path / "genes.idx", hgnc=tmp_path / "hgnc.tsv")) as index:
+        assert index.hgnc_id("KRAS") == "HGNC:6407"
+        assert index.sequence("NC_000007.13") is None
+        assert index.cytoband("GRCh37", "7", 0) is None
+
+
+def test_not_an_index(tmp_path):
+    path = tmp_path / "other.idx"
+    path.write_bytes(b"\0" * 64)
+    with pytest.raises(ValueError, match="not a reference index"):
+        ReferenceIndex(path)
+
+
+@pytest.mark.usefixtures("reference")
+@pytest.mark.parametrize("lean", [False, True])
+def test_converter_uses_reference(statement_record, lean):
+    statement = LeanStatement(statement_record) if lean else validate_statement(statement_record)
+    fields = convert_gks_to_hl7_v2(statement)
+    assert fields["509"] == "GRCh37"
+    assert fields["510"] == "7"
+    assert fields["514"] == "BRAF"
+    assert fields["GENE_ID"] == "HGNC:1097"
+    assert fields["532"] == "7q34"
+    assert fields["524"] == "NC_000007.13"
+
+
+@pytest.mark.usefixtures("reference")
+def test_refget_only_alleles_get_accessions(statement_record):
+    for member in statement_record["proposition"]["subjectVariant"]["members"]:
+        member.pop("expressions", None)
+    fields = convert_gks_to_hl7_v2(LeanStatement(statement_record))
+    assert fields["524"] == "NC_000007.13"
+    assert fields["516"] == "NM_004333.6"
+    assert fields["522"] == "NP_004324.2"
+    assert fields["510"] == "7"
+
+
+def test_converter_without_reference(statement_record):
+    fields = convert_gks_to_hl7_v2(LeanStatement(statement_record))
+    assert fields["510"] == "NC_000007.13"
+    assert fields["514"] == "BRAF"
+    assert "GENE_ID" not in fields
+    assert "532" not in fields
+
+
+def test_cli_reference(tmp_path, index_path, statement_record):
+    ndjson_path = tmp_path / "statements.ndjson"
+    output_path = tmp_path / "out.hl7"
+    ndjson_path.write_text(json.dumps(statement_record) + "\n")
+    try:
+        assert main([str(ndjson_path), "-o", str(output_path), "--reference", str(index_path)]) == 0
+    finally:
+        configure_reference(None)
+    output = output_path.read_text()
+    assert "|HGNC:1097^BRAF^HGNC|" in output
+    assert "VARCONCEPT532^Cytogenetic Location^EPICGENOMICS|2a|7q34|" in output
@@ -0,0 +1,93 @@
+import io
+import json
+from pathlib import Path
+
+import pytest
+
+from biocommons.gks_conversion_tool.cli import main
+from biocommons.gks_conversion_tool.lean import LeanStatement
+from biocommons.gks_conversion_tool.report import ReportBuilder, variant_identifier, write_report
+from biocommons.gks_conversion_tool.var_concept_creator import variant_information
+
+STATEMENT_PATH = Path(__file__).parent / "data" / "braf_v600e_statement.json"
+
+
+@pytest.fixture
+def statement_record():
+    return json.loads(STATEMENT_PATH.read_text())
+
+
+@pytest.mark.parametrize(
+    ("index", "expected"),
+    [(0, "a"), (1, "b"), (25, "z"), (26, "aa"), (27, "ab"), (51, "az"), (52, "ba"), (701, "zz"), (702, "aaa")],
+)
+def test_variant_identifier(index, expected):
+    assert variant_identifier(index) == expected
+
+
+def test_variant_identifier_negative():
+    with pytest.raises(ValueError, match="negative"):
+        variant_identifier(-1)
+
+
+def test_report_builder_numbers_lines_across_variants(statement_record):
+    out = io.StringIO()
+    builder = ReportBuilder(out, terminator="\n")
+    identifiers = [builder.add_statement(statement_record) for _ in range(27)]
+    identifiers.append(builder.add_variant_information(variant_information))
+
+    assert identifiers[:3] == ["a", "b", "c"]
+    assert identifiers[-2:] == ["aa", "ab"]
+    lines = out.getvalue().splitlines()
+    assert [int(line.split("|")[1]) for line in lines] == list(range(1, len(lines) + 1))
+    assert lines[9].startswith("OBX|10|ST|VARCONCEPT504^Variant Name^EPICGENOMICS|2b|")
+    assert lines[-1].split("|")[4] == "2ab"
+    assert builder.stats.variants == 28
+    assert builder.stats.segments == len(lines)
+
+
+def test_report_builder_failed_variant_uses_no_identifier(statement_record):
+    out = io.StringIO()
+    builder = ReportBuilder(out)
+    builder.add_statement(LeanStatement(statement_record))
+    written = out.getvalue()
+    with pytest.raises(ValueError):  # noqa: PT011
+        builder.add_variant_information({**variant_information, "VARIANT_CLASSIFICATION": None})
+    assert out.getvalue() == written
+    assert builder.add_statement(statement_record) == "b"
+    assert out.getvalue()[len(written):].startswith("OBX|10|")
+
+
+def test_write_report(statement_record):
+    out = io.StringIO()
+    stats = write_report([statement_record] * 3, out, "CTRL1", patient_id="P1", timestamp="20250101120000")
+    segments = out.getvalue().split("\r")
+    assert segments[-1] == ""
+    assert segments[0].split("|")[9] == "CTRL1"
+    assert segments[1] == "PID|1||P1||"
+    assert segments[2].startswith("OBR|1|")
+    assert [segment.split("|")[4] for segment in segments[3:-1:9]] == ["2a", "2b", "2c"]
+    assert stats.segments == len(segments) - 4 == 27
+
+
+def test_write_report_leaves_out_failed_statements(statement_record):
+    out = io.StringIO()
+    errors_out = io.StringIO()
+    stats = write_report(
+        [statement_record, {"id": "bad"}, statement_record], out, "CTRL1", errors_out=errors_out
+    )
+    assert (stats.variants, stats.errors) == (2, 1)
+    segments = out.getvalue().split("\r")
+    assert segments[0].startswith("MSH|")
+    assert [segment.split("|")[4] for segment in segments[3:-1:9]] == ["2a", "2b"]
+    assert json.loads(errors_out.getvalue())["id"] == "bad"
+
+
+def test_cli_report(tmp_path, statement_record):
+    ndjson_path = tmp_path / "statements.ndjson"
+    ndjson_path.write_text((json.dumps(statement_record) + "\n") * 2)
+    output_path = tmp_path / "report.hl7"
+    assert main([str(ndjson_path), "-o", str(output_path), "--report", "--patient-id", "P1"]) == 0
+    segments = output_path.read_bytes().decode().split("\r")
+    assert segments[0].startswith("MSH|")
+    assert segments[-2].startswith("OBX|18|")
@@ -0,0 +1,127 @@
+import gzip
+import json
+from pathlib import Path
+
+import pytest
+
+from biocommons.gks_conversion_tool.cli import main
+from biocommons.gks_conversion_tool.hl7_parser import parse_hl7_file
+from biocommons.gks_conversion_tool.lean import LeanStatement
+from biocommons.gks_conversion_tool.parallel import stream_to_sink_parallel
+from biocommons.gks_conversion_tool.sinks import HL7Sink, stream_to_sink
+from biocommons.gks_conversion_tool.streaming import convert_statement_record
+
+STATEMENT_PATH = Path(__file__).parent / "data" / "braf_v600e_statement.json"
+
+
+@pytest.fixture
+def statement_record():
+    return json.loads(STATEMENT_PATH.read_text())
+
+
+def _segments(path: Path) -> list[str]:
+    data = gzip.decompress(path.read_bytes()) if path.suffix == ".gz" else path.read_bytes()
+    text = data.decode()
+    assert "\n" not in text
+    assert text.endswith("\r")
+    return text.split("\r")[:-1]
+
+
+def test_buffered_writes_match_segments(tmp_path, statement_record):
+    segments = convert_statement_record(statement_record)
+    path = tmp_path / "out.hl7"
+    with HL7Sink(path, buffer_size=100) as sink:
+        for _ in range(3):
+            sink.write_message(segments)
+
+    assert _segments(path) == segments * 3
+    assert sink.stats.messages == 3
+    assert sink.stats.segments == 3 * len(segments)
+    assert sink.stats.bytes == path.stat().st_size
+
+
+def test_envelope_counts(tmp_path, statement_record):
+    path = tmp_path / "out.hl7"
+    with HL7Sink(path, envelope=True) as sink:
+        stream_to_sink([LeanStatement(statement_record)] * 4, sink, control_id_prefix="T.")
+
+    segments = _segments(path)
+    assert segments[0].startswith("FHS|^~\\&|GKS-CONVERSION-TOOL|")
+    assert segments[1].startswith("BHS|^~\\&|GKS-CONVERSION-TOOL|")
+    assert segments[-2:] == ["BTS|4", "FTS|1"]
+    assert sum(segment.startswith("MSH|") for segment in segments) == 4
+    variants = list(parse_hl7_file(path))
+    assert [variant.message_control_id for variant in variants] == ["T.1", "T.2", "T.3", "T.4"]
+
+
+def test_rotation_by_messages(tmp_path, statement_record):
+    segments = convert_statement_record(statement_record)
+    with HL7Sink(tmp_path / "out.hl7.gz", max_messages=2, envelope=True) as sink:
+        for _ in range(5):
+            sink.write_message(segments)
+
+    assert [path.name for path in sink.paths] == ["out.0001.hl7.gz", "out.0002.hl7.gz", "out.0003.hl7.gz"]
+    assert [_segments(path)[-2] for path in sink.paths] == ["BTS|2", "BTS|2", "BTS|1"]
+    assert sink.stats.files == 3
+
+
+def test_rotation_by_size(tmp_path, statement_record):
+    segments = convert_statement_record(statement_record)
+    message_size = len("\r".join(segments)) + 1
+    with HL7Sink(tmp_path / "out.hl7", max_bytes=message_size * 2) as sink:
+        for _ in range(5):
+            sink.write_message(segments)
+
+    assert [len(_segments(path)) for path in sink.paths] == [2 * len(segments)] * 2 + [len(segments)]
+
+
+def test_empty_sink_writes_empty_batch(tmp_path):
+    path = tmp_path / "out.hl7"
+    HL7Sink(path, envelope=True).close()
+    assert _segments(path)[-2:] == ["BTS|0", "FTS|1"]
+
+
+def test_zstd(tmp_path, statement_record):
+    zstandard = pytest.importorskip("zstandard")
+    segments = convert_statement_record(statement_record)
+    path = tmp_path / "out.hl7.zst"
+    with HL7Sink(path) as sink:
+        sink.write_message(segments)
+    text = zstandard.ZstdDecompressor().stream_reader(path.open("rb")).read().decode()
+    assert text == "\r".join(segments) + "\r"
+
+
+def test_unknown_compression(tmp_path):
+    with pytest.raises(ValueError, match="Unknown compression"):
+        HL7Sink(tmp_path / "out.hl7", compression="lzma")
+
+
+def test_parallel_sink_matches_single_process(tmp_path, statement_record):
+    texts = [json.dumps(statement_record)] * 7 + ["{}"]
+    with HL7Sink(tmp_path / "single.hl7", envelope=True) as single:
+        stream_to_sink([json.loads(text) for text in texts[:-1]], single, control_id_prefix="T.")
+    with HL7Sink(tmp_path / "parallel.hl7", envelope=True) as parallel:
+        stats = stream_to_sink_parallel(texts, parallel, workers=2, chunk_size=3, control_id_prefix="T.")
+
+    assert stats.errors == 1
+    assert parallel.stats.messages == 7
+
+    def without_timestamps(path):
+        return [segment.split("|")[:5] + segment.split("|")[7:] for segment in _segments(path)]
+
+    assert without_timestamps(tmp_path / "parallel.hl7")[2:] == without_timestamps(tmp_path / "single.hl7")[2:]
+
+
+def test_cli_rotating_gzip(tmp_path, statement_record):
+    ndjson_path = tmp_path / "statements.ndjson"
+    ndjson_path.write_text((json.dumps(statement_record) + "\n") * 5)
+    assert main([str(ndjson_path), "-o", str(tmp_path / "out.hl7.gz"), "--rotate-messages", "2", "--envelope"]) == 0
+
+    paths = sorted(tmp_path.glob("out.*.hl7.gz"))
+    assert len(paths) == 3
+    assert [_segments(path)[-2] for path in paths] == ["BTS|2", "BTS|2", "BTS|1"]
+
+
+def test_cli_sink_requires_output_file():
+    with pytest.raises(SystemExit):
+        main(["-", "--envelope"])
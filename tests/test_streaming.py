@@ -0,0 +1,113 @@
+import io
+import json
+from pathlib import Path
+
+import pytest
+
+from biocommons.gks_conversion_tool.cli import main
+from biocommons.gks_conversion_tool.streaming import (
+    convert_statement_record,
+    iter_statement_records,
+    stream_obx_segments,
+)
+
+STATEMENT_PATH = Path(__file__).parent / "data" / "braf_v600e_statement.json"
+
+
+@pytest.fixture
+def statement_record():
+    return json.loads(STATEMENT_PATH.read_text())
+
+
+def test_convert_statement_record(statement_record):
+    segments = convert_statement_record(statement_record)
+    assert segments == [
+        "OBX|1|ST|VARCONCEPT504^Variant Name^EPICGENOMICS|2a|BRAF V600E||||||||||||||||",
+        "OBX|2|CWE|VARCONCEPT510^Chromosome^EPICGENOMICS|2a|^NC_000007.13||||||||||||||||",
+        "OBX|3|NR|VARCONCEPT511^Allele Start/end^EPICGENOMICS|2a|140453135.0^140453136.0||||||||||||||||",
+        "OBX|4|CWE|VARCONCEPT516^Transcript Reference Sequence ID^EPICGENOMICS|2a|NM_004333.6^NM_004333.6^RefSeq-T||||||||||||||||",
+        "OBX|5|CWE|VARCONCEPT518^DNA Change^EPICGENOMICS|2a|c.1799T>A^c.1799T>A^HGVS.c||||||||||||||||",
+        "OBX|6|CWE|VARCONCEPT520^Amino Acid Change^EPICGENOMICS|2a|p.Val600Glu^p.Val600Glu^HGVS.p||||||||||||||||",
+        "OBX|7|ST|VARCONCEPT522^Protein Reference Sequence^EPICGENOMICS|2a|NP_004324.2||||||||||||||||",
+        "OBX|8|CWE|VARCONCEPT524^Genomic Reference Sequence ID^EPICGENOMICS|2a|NC_000007.13^NC_000007.13^RefSeq-G||||||||||||||||",
+        "OBX|9|CWE|VARCONCEPT528^Genomic DNA Change^EPICGENOMICS|2a|g.140453136A>T^g.140453136A>T^HGVS.g||||||||||||||||",
+    ]
+
+
+def test_iter_statement_records_ndjson_skips_blank_lines(statement_record):
+    ndjson = io.StringIO(json.dumps(statement_record) + "\n\n" + json.dumps(statement_record) + "\n")
+    assert len(list(iter_statement_records(ndjson))) == 2
+
+
+def test_iter_statement_records_directory(tmp_path, statement_record):
+    for name in ("b.json", "a.json"):
+        (tmp_path / name).write_text(json.dumps({**statement_record, "id": name}))
+    (tmp_path / "ignored.txt").write_text("not json")
+    assert [r["id"] for r in iter_statement_records(tmp_path)] == ["a.json", "b.json"]
+
+
+def test_stream_obx_segments(statement_record):
+    out = io.StringIO()
+    stats = stream_obx_segments([statement_record] * 5, out)
+    assert stats.statements == 5
+    assert stats.segments == 45
+    assert out.getvalue().count("\r") == 45
+    assert stats.statements_per_second > 0
+
+
+@pytest.mark.parametrize("lean", [False, True])
+def test_stream_obx_segments_reports_errors(statement_record, lean):
+    text = json.dumps(statement_record)
+    out = io.StringIO()
+    errors_out = io.StringIO()
+    stats = stream_obx_segments([text, "{not json", '{"id": "bad"}', text], out, errors_out=errors_out, lean=lean)
+    assert stats.statements == 4
+    assert stats.errors == 2
+    assert out.getvalue().count("\r") == 18
+    errors = [json.loads(line) for line in errors_out.getvalue().splitlines()]
+    assert [(e["index"], e["id"]) for e in errors] == [(1, None), (2, "bad")]
+
+
+def test_stream_obx_segments_logs_errors(statement_record, caplog):
+    stats = stream_obx_segments([statement_record, {"id": "bad"}], io.StringIO())
+    assert stats.errors == 1
+    assert "Statement 1 (bad) failed: ValidationError" in caplog.text
+
+
+def test_cli(tmp_path, statement_record):
+    ndjson_path = tmp_path / "statements.ndjson"
+    ndjson_path.write_text(json.dumps(statement_record) + "\n")
+    output_path = tmp_path / "out.hl7"
+    assert main([str(ndjson_path), "-o", str(output_path)]) == 0
+    assert output_path.read_text().startswith("OBX|1|ST|")
+
+
+@pytest.mark.parametrize("options", [[], ["--lean"], ["--compress", "gzip"]])
+def test_cli_errors(tmp_path, statement_record, options):
+    ndjson_path = tmp_path / "statements.ndjson"
+    ndjson_path.write_text(json.dumps(statement_record) + "\n{}\n")
+    errors_path = tmp_path / "errors.ndjson"
+    assert main([str(ndjson_path), "-o", str(tmp_path / "out.hl7"), "--errors", str(errors_path), *options]) == 1
+    assert json.loads(errors_path.read_text())["index"] == 1
+
+
+@pytest.mark.parametrize("options", [["--report"], ["--store", "store.db"]])
+def test_cli_errors_in_report_and_store_modes(tmp_path, statement_record, options):
+    ndjson_path = tmp_path / "statements.ndjson"
+    ndjson_path.write_text("{}\n" + json.dumps(statement_record) + "\n")
+    errors_path = tmp_path / "errors.ndjson"
+    options = [str(tmp_path / option) if option.endswith(".db") else option for option in options]
+    assert main([str(ndjson_path), "-o", str(tmp_path / "out.hl7"), "--errors", str(errors_path), *options]) == 1
+    assert json.loads(errors_path.read_text())["index"] == 0
+
+
+def test_cli_fails_when_no_statement_converts(tmp_path, statement_record):
+    # a pretty-printed JSON file read as NDJSON
+    json_path = tmp_path / "statement.json"
+    json_path.write_text(json.dumps(statement_record, indent=2))
+    assert main([str(json_path), "-o", str(tmp_path / "out.hl7")]) == 1
+
+
+def test_cli_rejects_errors_where_unused(tmp_path):
+    with pytest.raises(SystemExit):
+        main(["-", "--preflight", "--errors", str(tmp_path / "errors.ndjson")])
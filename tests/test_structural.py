@@ -0,0 +1,210 @@
+import json
+import random
+from pathlib import Path
+
+import pytest
+
+from biocommons.gks_conversion_tool.converter import (
+    clear_caches,
+    configure_reference,
+    convert_gks_to_hl7_v2,
+)
+from biocommons.gks_conversion_tool.lean import LeanStatement
+from biocommons.gks_conversion_tool.reference import ExonHit, ReferenceIndex, build_reference_index
+from biocommons.gks_conversion_tool.streaming import convert_statement_record, validate_statement
+from biocommons.gks_conversion_tool.structural import location_bounds
+
+STATEMENT_PATH = Path(__file__).parent / "data" / "braf_v600e_statement.json"
+
+REFSEQ = """\
+accession\tchromosome\tassembly\trefget_accession
+NC_000007.13\t7\tGRCh37\tSQ.IW78mgV5Cqf6M24hy52hPjyyo5tCCd86
+"""
+
+# NM_A and NM_C overlap; NM_B is numbered from its 3' end, like a minus-strand transcript
+EXONS = """\
+transcript\taccession\texon\tstart\tend
+NM_A.1\tNC_000007.13\t1\t100\t200
+NM_A.1\tNC_000007.13\t2\t300\t400
+NM_A.1\tNC_000007.13\t3\t500\t600
+NM_B.1\tNC_000007.13\t3\t1000\t1100
+NM_B.1\tNC_000007.13\t2\t1200\t1300
+NM_B.1\tNC_000007.13\t1\t1400\t1500
+NM_C.1\tNC_000007.13\t1\t150\t250
+"""
+
+
+@pytest.fixture
+def index_path(tmp_path):
+    (tmp_path / "refseq.tsv").write_text(REFSEQ)
+    (tmp_path / "exons.tsv").write_text(EXONS)
+    return build_reference_index(
+        tmp_path / "reference.idx", refseq=tmp_path / "refseq.tsv", exons=tmp_path / "exons.tsv"
+    )
+
+
+@pytest.fixture
+def reference(index_path):
+    with ReferenceIndex(index_path) as index:
+        configure_reference(index)
+        yield index
+        configure_reference(None)
+
+
+def cnv_record(start, end, **variation):
+    record = json.loads(STATEMENT_PATH.read_text())
+    subject_variant = record["proposition"]["subjectVariant"]
+    subject_variant["name"] = "deletion"
+    subject_variant["members"] = [
+        {
+            "id": "ga4gh:CX.test",
+            "location": {
+                "type": "SequenceLocation",
+                "sequenceReference": {
+                    "type": "SequenceReference",
+                    "refgetAccession": "SQ.IW78mgV5Cqf6M24hy52hPjyyo5tCCd86",
+                    "moleculeType": "genomic",
+                },
+                "start": start,
+                "end": end,
+            },
+            "expressions": [{"syntax": "hgvs.g", "value": "NC_000007.13:g.(?_1001)_(1500_?)del"}],
+        }
+        | variation
+    ]
+    return record
+
+
+@pytest.mark.parametrize(
+    ("start", "end", "bounds"),
+    [
+        (10, 20, (10, 10, 20, 20)),
+        ([5, 10], [20, 25], (5, 10, 20, 25)),
+        ([None, 10], [20, None], (None, 10, 20, None)),
+        (None, [20, 25], (None, None, 20, 25)),
+    ],
+)
+def test_location_bounds(start, end, bounds):
+    state = {"type": "LiteralSequenceExpression", "sequence": ""}
+    statement = validate_statement(cnv_record(start, end, type="Allele", state=state))
+    assert location_bounds(statement.proposition.subjectVariant.members[0].root.location) == bounds
+
+
+@pytest.mark.parametrize("lean", [False, True])
+def test_copy_number_change(lean):
+    clear_caches()
+    record = cnv_record([None, 1000], [1500, 1600], type="CopyNumberChange", copyChange="low-level loss")
+    fields = convert_gks_to_hl7_v2(LeanStatement(record) if lean else validate_statement(record))
+    assert fields["503"] == "Copy number low-level loss"
+    assert (fields["511.1"], fields["511.2"]) == (1000, 1500)
+    assert fields["545"] == 500
+    assert (fields["546.1"], fields["546.2"]) == (1000, 1500)
+    # the outer start is unbounded
+    assert "547.1" not in fields
+    assert "550" not in fields
+
+
+@pytest.mark.parametrize("lean", [False, True])
+def test_copy_number_count(lean):
+    clear_caches()
+    record = cnv_record([900, 1000], [1500, 1600], type="CopyNumberCount", copies=3)
+    fields = convert_gks_to_hl7_v2(LeanStatement(record) if lean else validate_statement(record))
+    assert fields["503"] == "Copy number variation"
+    assert fields["550"] == 3
+    assert (fields["546.1"], fields["546.2"], fields["547.1"], fields["547.2"]) == (1000, 1500, 900, 1600)
+
+    clear_caches()
+    record = cnv_record(1000, 1500, type="CopyNumberCount", copies=[3, None])
+    fields = convert_gks_to_hl7_v2(LeanStatement(record) if lean else validate_statement(record))
+    # a precise location has no inner/outer ranges, and a copy number range no single value
+    assert not {"546.1", "547.1", "550"} & fields.keys()
+
+
+@pytest.mark.parametrize("lean", [False, True])
+def test_overlapping_ends_use_the_outer_interval(lean):
+    clear_caches()
+    record = cnv_record([100, 300], [200, 400], type="CopyNumberChange", copyChange="gain")
+    fields = convert_gks_to_hl7_v2(LeanStatement(record) if lean else validate_statement(record))
+    assert (fields["511.1"], fields["511.2"]) == (100, 400)
+    assert fields["545"] == 300
+    assert (fields["547.1"], fields["547.2"]) == (100, 400)
+    # no region is certainly covered
+    assert "546.1" not in fields
+
+    segments = convert_statement_record(record)
+    assert any("VARCONCEPT511" in segment and "|100.0^400.0|" in segment for segment in segments)
+    assert not any("VARCONCEPT546" in segment for segment in segments)
+
+
+@pytest.mark.parametrize(
+    ("start", "end", "transcript", "hit"),
+    [
+        (250, 350, None, ExonHit("NM_A.1", (2, 2), (1, 1))),
+        (210, 290, None, ExonHit("NM_A.1", None, (1, 1))),
+        (50, 650, None, ExonHit("NM_A.1", (1, 3), (1, 2))),
+        (150, 160, None, ExonHit("NM_A.1", (1, 1), None)),
+        (150, 160, "NM_C.1", ExonHit("NM_C.1", (1, 1), None)),
+        (1050, 1450, None, ExonHit("NM_B.1", (1, 3), (1, 2))),
+        (1150, 1190, None, ExonHit("NM_B.1", None, (2, 2))),
+        (200, 300, "NM_A.1", ExonHit("NM_A.1", None, (1, 1))),
+        (700, 800, None, None),
+        (0, 100, None, None),
+        (150, 160, "NM_X.1", None),
+    ],
+)
+def test_affected_exons(reference, start, end, transcript, hit):
+    assert reference.affected_exons("NC_000007.13", start, end, transcript) == hit
+
+
+def test_affected_exons_matches_a_scan(reference):
+    exons = {}
+    for line in EXONS.splitlines()[1:]:
+        transcript, _, number, start, end = line.split("\t")
+        exons.setdefault(transcript, []).append((int(start), int(end), int(number)))
+
+    def scan(transcript, start, end):
+        rows = sorted(exons[transcript])
+        hit_exons = [n for s, e, n in rows if s < end and e > start]
+        hit_introns = [
+            min(a[2], b[2]) for a, b in zip(rows, rows[1:], strict=False) if a[1] < end and b[0] > start
+        ]
+        if not hit_exons and not hit_introns:
+            return None
+        return ExonHit(
+            transcript,
+            (min(hit_exons), max(hit_exons)) if hit_exons else None,
+            (min(hit_introns), max(hit_introns)) if hit_introns else None,
+        )
+
+    rng = random.Random(0)  # noqa: S311 - reproducible test data
+    for _ in range(2000):
+        start = rng.randrange(0, 1700)
+        end = start + rng.randrange(1, 400)
+        for transcript in exons:
+            assert reference.affected_exons("NC_000007.13", start, end, transcript) == scan(transcript, start, end)
+        # without a transcript, the first overlapping one in table order
+        overlapping = [t for t, rows in exons.items() if min(rows)[0] < end and max(r[1] for r in rows) > start]
+        expected = scan(overlapping[0], start, end) if overlapping else None
+        assert reference.affected_exons("NC_000007.13", start, end) == expected
+
+
+@pytest.mark.usefixtures("reference")
+def test_converter_uses_exons():
+    clear_caches()
+    record = cnv_record([900, 1050], [1450, 1600], type="CopyNumberChange", copyChange="loss")
+    fields = convert_gks_to_hl7_v2(validate_statement(record))
+    assert fields["509"] == "GRCh37"
+    assert fields["516"] == "NM_B.1"
+    assert (fields["572.1"], fields["572.2"]) == (1, 3)
+    assert (fields["573.1"], fields["573.2"]) == (1, 2)
+
+    segments = convert_statement_record(record)
+    assert any("Copy number loss" in segment for segment in segments)
+    assert any("VARCONCEPT572" in segment and "|1.0^3.0|" in segment for segment in segments)
+
+
+@pytest.mark.usefixtures("reference")
+def test_simple_allele_is_unchanged():
+    clear_caches()
+    fields = convert_gks_to_hl7_v2(validate_statement(json.loads(STATEMENT_PATH.read_text())))
+    assert not {"503", "545", "572.1"} & fields.keys()
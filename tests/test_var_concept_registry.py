@@ -0,0 +1,57 @@
+import pytest
+
+from biocommons.gks_conversion_tool.obx_templates import generate_all_obx_for_variants_templated
+from biocommons.gks_conversion_tool.var_concept_creator import createVARSegmentsGroups
+from biocommons.gks_conversion_tool.var_concept_registry import (
+    HL7_FIELDS_TABLE,
+    VAR_CONCEPT_REGISTRY,
+    VARConceptMapping,
+    compile_registry,
+)
+from biocommons.models import ObservationTypes, VARConcepts
+
+
+def test_registry_covers_var_concepts():
+    concepts = [mapping.concept for mapping in VAR_CONCEPT_REGISTRY]
+    assert len(concepts) == len(set(concepts))
+    # 505 has no agreed format yet
+    assert set(VARConcepts) - set(concepts) == {VARConcepts.VARCONCEPT505}
+
+
+def test_absent_fields_are_skipped():
+    groups = createVARSegmentsGroups({"DNA_CHANGE": "c.1799T>A"}, "a")
+    assert [group.segment_identifier for group in groups] == [
+        VARConcepts.VARCONCEPT503,
+        VARConcepts.VARCONCEPT518,
+        VARConcepts.VARCONCEPT552,
+    ]
+
+
+def test_hl7_fields_table():
+    groups = HL7_FIELDS_TABLE.build(
+        {"504": "BRAF V600E", "511.1": 10, "511.2": 11, "516": None, "550": 0, "514": "BRAF", "575": ""}, "b"
+    )
+    assert generate_all_obx_for_variants_templated(groups) == [
+        "OBX|1|ST|VARCONCEPT504^Variant Name^EPICGENOMICS|2b|BRAF V600E||||||||||||||||",
+        "OBX|2|NR|VARCONCEPT511^Allele Start/end^EPICGENOMICS|2b|10.0^11.0||||||||||||||||",
+        "OBX|3|CWE|VARCONCEPT514^Gene Studied^EPICGENOMICS|2b|^BRAF||||||||||||||||",
+        "OBX|4|NM|VARCONCEPT550^Copy Number^EPICGENOMICS|2b|0.0||||||||||||||||",
+    ]
+
+
+def test_required_concept():
+    table = compile_registry(
+        (VARConceptMapping(VARConcepts.VARCONCEPT553, "VARIANT_CLASSIFICATION", ObservationTypes.CODEABLECONCEPT, required=True),)
+    )
+    assert len(table.build({"VARIANT_CLASSIFICATION": "Benign"}, "a")) == 1
+    with pytest.raises(ValueError, match="VARCONCEPT553"):
+        table.build({}, "a")
+
+
+def test_registry_required_concepts():
+    required = {mapping.concept for mapping in VAR_CONCEPT_REGISTRY if mapping.required}
+    assert required == {VARConcepts.VARCONCEPT504, VARConcepts.VARCONCEPT511}
+    with pytest.raises(ValueError, match="VARCONCEPT511"):
+        HL7_FIELDS_TABLE.build({"504": "BRAF V600E", "511.1": 10, "511.2": None}, "a")
+    # variant information describes a variant only in part
+    assert createVARSegmentsGroups({"DNA_CHANGE": "c.1799T>A"}, "a")
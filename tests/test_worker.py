@@ -0,0 +1,58 @@
+import io
+import json
+import socket
+import threading
+from pathlib import Path
+
+import pytest
+
+from biocommons.gks_conversion_tool.streaming import convert_statement_record
+from biocommons.gks_conversion_tool.worker import WorkerServer, handle_request, serve_stream
+
+STATEMENT_PATH = Path(__file__).parent / "data" / "braf_v600e_statement.json"
+
+
+@pytest.fixture
+def statement_record():
+    return json.loads(STATEMENT_PATH.read_text())
+
+
+def test_handle_request_error_does_not_raise():
+    response = handle_request('{"id": "s1"}')
+    assert response["id"] == "s1"
+    assert response["error"].startswith("ValidationError: ")
+    assert handle_request("not json")["id"] is None
+
+
+@pytest.mark.parametrize("lean", [False, True])
+def test_serve_stream(statement_record, lean):
+    request = json.dumps(statement_record).encode() + b"\n"
+    rfile = io.BytesIO(request + b"\n" + b'{"id": "bad"}\n' + request)
+    wfile = io.BytesIO()
+
+    assert serve_stream(rfile, wfile, lean=lean) == 3
+    responses = [json.loads(line) for line in wfile.getvalue().splitlines()]
+    expected = convert_statement_record(statement_record)
+    assert responses[0] == {"id": statement_record.get("id"), "segments": expected}
+    assert responses[1]["id"] == "bad"
+    assert "error" in responses[1]
+    assert responses[2] == responses[0]
+
+
+def test_unix_socket_worker(tmp_path, statement_record):
+    path = tmp_path / "worker.sock"
+    with WorkerServer(path, lean=True) as server:
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        try:
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+                client.connect(str(path))
+                stream = client.makefile("rwb")
+                for _ in range(2):
+                    stream.write(json.dumps(statement_record).encode() + b"\n")
+                    stream.flush()
+                    response = json.loads(stream.readline())
+                    assert response["segments"][0].startswith("OBX|1|ST|")
+        finally:
+            server.shutdown()
+    assert not path.exists()